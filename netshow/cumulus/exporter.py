@@ -0,0 +1,405 @@
+# pylint: disable=E0611
+""" Module for exporting port counters, link state and STP state
+as OpenMetrics text, for scraping by Prometheus.
+Collection runs in the background, a scrape only copies the last result.
+"""
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from netshowlib.cumulus import common
+from netshowlib.cumulus import counters
+from netshowlib.cumulus import iface as cumulus_iface
+from netshowlib.cumulus import mstpd
+from netshow.cumulus.common import _
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    import socketserver
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    import SocketServer as socketserver
+
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+LISTEN_ADDRESS = '127.0.0.1'
+DEFAULT_PORT = 9364
+# seconds between collections
+COLLECT_INTERVAL = 15
+# ethtool statistic groups exported on top of the summary counters
+COUNTER_GROUPS = ['octets', 'drops']
+STP_STATES = ['discarding', 'learning', 'forwarding']
+STP_ROLES = ['root', 'designated', 'alternate', 'backup', 'disabled']
+
+
+def escape_label(value):
+    """
+    :return: label value escaped for the OpenMetrics text format
+    """
+    return str(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')
+
+
+def metric_family(name, metric_type, helptext, samples):
+    """
+    :param samples: list of (suffix, labels hash, value). suffix is added \
+        to ``name``, for example ``_total`` for counters
+    :return: lines of one metric family. Empty if there are no samples
+    """
+    if not samples:
+        return []
+    _lines = ['# TYPE %s %s' % (name, metric_type),
+              '# HELP %s %s' % (name, helptext)]
+    for _suffix, _labels, _value in samples:
+        _labelstr = ','.join(['%s="%s"' % (x, escape_label(y))
+                              for x, y in _labels.items()])
+        _lines.append('%s%s{%s} %s' % (name, _suffix, _labelstr, _value))
+    return _lines
+
+
+def counters_metrics(counters_cache):
+    """
+    :param counters_cache: counters hash from :meth:`counters.cacheinfo`
+    :return: metric lines for port packet, error, octet and drop counters
+    """
+    _packets = []
+    _errors = []
+    _octets = []
+    _drops = []
+    for _port in sorted(counters_cache.keys()):
+        for _dir in ('rx', 'tx'):
+            _dir_counters = counters_cache[_port].get(_dir) or {}
+            for _name in sorted(_dir_counters.keys()):
+                _labels = OrderedDict([('port', _port), ('direction', _dir)])
+                _sample = ('_total', _labels, _dir_counters[_name])
+                if _name in ('unicast', 'multicast', 'broadcast'):
+                    _labels['type'] = _name
+                    _packets.append(_sample)
+                elif _name == 'errors':
+                    _errors.append(_sample)
+                elif _name == 'octets':
+                    _octets.append(_sample)
+                else:
+                    _labels['type'] = _name
+                    _drops.append(_sample)
+    return metric_family('netshow_port_packets', 'counter',
+                         'Packets received or sent on a port', _packets) + \
+        metric_family('netshow_port_errors', 'counter',
+                      'Packet errors on a port', _errors) + \
+        metric_family('netshow_port_octets', 'counter',
+                      'Octets received or sent on a port', _octets) + \
+        metric_family('netshow_port_drops', 'counter',
+                      'Packets dropped or discarded on a port', _drops)
+
+
+def iface_metrics(ifaces):
+    """
+    :param ifaces: list of :class:`cumulus.iface <netshowlib.cumulus.iface.Iface>`
+    :return: metric lines for port link state and speed
+    """
+    _admin = []
+    _oper = []
+    _speed = []
+    for _iface in ifaces:
+        _labels = OrderedDict([('port', _iface.name)])
+        _linkstate = _iface.linkstate
+        _admin.append(('', _labels, 1 if _linkstate > 0 else 0))
+        _oper.append(('', _labels, 1 if _linkstate == 2 else 0))
+        if _linkstate == 2:
+            try:
+                _speed.append(('', _labels, int(_iface.speed) * 1000000))
+            except (TypeError, ValueError):
+                pass
+    return metric_family('netshow_port_admin_up', 'gauge',
+                         '1 if the port is admin up', _admin) + \
+        metric_family('netshow_port_oper_up', 'gauge',
+                      '1 if the port link is up', _oper) + \
+        metric_family('netshow_port_speed_bits_per_second', 'gauge',
+                      'Speed of ports with link up', _speed)
+
+
+def _stateset(name, labels, current, known):
+    """
+    :return: stateset samples with ``current`` set to 1
+    """
+    _states = list(known)
+    if current and current not in _states:
+        _states.append(current)
+    _samples = []
+    for _state in _states:
+        _labels = OrderedDict(labels)
+        _labels[name] = _state
+        _samples.append(('', _labels, 1 if _state == current else 0))
+    return _samples
+
+
+def mstpd_metrics(bridgehash):
+    """
+    :param bridgehash: hash from :meth:`mstpd.cacheinfo`
+    :return: metric lines for STP bridge and port state
+    """
+    _topology_changes = []
+    _states = []
+    _roles = []
+    _bpdus = []
+    _transitions = []
+    for _bridgename in sorted(bridgehash.get('bridge', {}).keys()):
+        _bridge = bridgehash['bridge'][_bridgename]
+        _bridge_labels = OrderedDict([('bridge', _bridgename)])
+        if _bridge.get('topology_change_count', '').isdigit():
+            _topology_changes.append(
+                ('_total', _bridge_labels,
+                 int(_bridge.get('topology_change_count'))))
+        _ifaces = _bridge.get('ifaces') or {}
+        for _port in sorted(_ifaces.keys()):
+            _portinfo = _ifaces[_port]
+            _labels = OrderedDict([('bridge', _bridgename), ('port', _port)])
+            _states += _stateset('netshow_stp_port_state', _labels,
+                                 _portinfo.get('state'), STP_STATES)
+            _roles += _stateset('netshow_stp_port_role', _labels,
+                                _portinfo.get('role'), STP_ROLES)
+            for _dir in ('rx', 'tx'):
+                _value = _portinfo.get('num_%s_bpdu' % (_dir), '')
+                if _value.isdigit():
+                    _dir_labels = OrderedDict(_labels)
+                    _dir_labels['direction'] = _dir
+                    _bpdus.append(('_total', _dir_labels, int(_value)))
+            for _key, _state in (('num_transition_fwd', 'forwarding'),
+                                 ('num_transition_blk', 'blocking')):
+                _value = _portinfo.get(_key, '')
+                if _value.isdigit():
+                    _state_labels = OrderedDict(_labels)
+                    _state_labels['state'] = _state
+                    _transitions.append(('_total', _state_labels,
+                                         int(_value)))
+    return metric_family('netshow_stp_topology_changes', 'counter',
+                         'STP topology changes of a bridge',
+                         _topology_changes) + \
+        metric_family('netshow_stp_port_state', 'stateset',
+                      'STP state of a bridge port', _states) + \
+        metric_family('netshow_stp_port_role', 'stateset',
+                      'STP role of a bridge port', _roles) + \
+        metric_family('netshow_stp_port_bpdus', 'counter',
+                      'BPDUs received or sent on a bridge port', _bpdus) + \
+        metric_family('netshow_stp_port_transitions', 'counter',
+                      'STP state transitions of a bridge port', _transitions)
+
+
+def collect_counters():
+    """
+    :return: counter metric lines. All ports are read in one pass
+    """
+    return counters_metrics(counters.cacheinfo(groups=COUNTER_GROUPS))
+
+
+def collect_iface():
+    """
+    :return: link state metric lines of physical ports
+    """
+    return iface_metrics([cumulus_iface.Iface(x)
+                          for x in sorted(cumulus_iface.portname_list())
+                          if common.is_phy(x)])
+
+
+def collect_mstpd():
+    """
+    :return: STP metric lines
+    """
+    return mstpd_metrics(mstpd.cacheinfo())
+
+
+COLLECTORS = OrderedDict([
+    ('counters', collect_counters),
+    ('iface', collect_iface),
+    ('mstpd', collect_mstpd)
+])
+
+
+class Exporter(object):
+    """
+    Class responsible for collecting metrics on a schedule and keeping
+    the last result ready to be scraped.
+    """
+    def __init__(self, interval=COLLECT_INTERVAL, collectors=None):
+        self.interval = interval
+        self.collectors = collectors or COLLECTORS
+        # encoded once per collection. a scrape only copies it
+        self.payload = b'# EOF\n'
+        self._stop = threading.Event()
+        self._thread = None
+
+    def collect(self):
+        """
+        run all collectors and replace the payload. A collector that fails,
+        for any reason, is reported with ``netshow_collector_success`` 0.
+        """
+        _lines = []
+        _durations = []
+        _success = []
+        # bridges may have changed since the last collection
+        common.new_generation()
+        for _name, _collector in self.collectors.items():
+            _start = time.time()
+            _ok = 1
+            try:
+                _lines += _collector()
+            # interfaces and bridges can go away while they are read, so
+            # any error only fails this collector
+            # pylint: disable=W0703
+            except Exception:
+                _ok = 0
+            _labels = OrderedDict([('collector', _name)])
+            _durations.append(('', _labels, round(time.time() - _start, 6)))
+            _success.append(('', _labels, _ok))
+        _lines += metric_family('netshow_collector_duration_seconds', 'gauge',
+                                'Seconds the last collection took',
+                                _durations)
+        _lines += metric_family('netshow_collector_success', 'gauge',
+                                '1 if the last collection worked', _success)
+        _lines += metric_family('netshow_collection_timestamp_seconds',
+                                'gauge', 'Time of the last collection',
+                                [('', OrderedDict(), round(time.time(), 3))])
+        _lines.append('# EOF')
+        # a single assignment, so scrapes never see a half built payload
+        self.payload = ('\n'.join(_lines) + '\n').encode('utf-8')
+
+    def start(self):
+        """
+        collect once, then keep collecting every ``interval`` seconds
+        in a background thread.
+        """
+        self.collect()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # a failed collection must not stop the exporter. the
+            # collection timestamp metric shows the payload is stale
+            # pylint: disable=W0703
+            try:
+                self.collect()
+            except Exception:
+                pass
+
+    def stop(self):
+        """
+        stop background collection
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    serves the exporter payload of the server on ``/metrics``
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        _payload = self.server.exporter.payload
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(_payload)))
+        self.end_headers()
+        self.wfile.write(_payload)
+
+    def log_message(self, *args):
+        """
+        do not log every scrape
+        """
+        pass
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    """
+    HTTP server listening on a unix socket
+    """
+    pass
+
+
+class ShowExporter(object):
+    """
+    Class responsible for running the OpenMetrics exporter
+    """
+    def __init__(self, cl):
+        self.port = DEFAULT_PORT
+        if cl.get('--port'):
+            self.port = cl.get('<port>')
+        self.socket_path = None
+        if cl.get('--socket'):
+            self.socket_path = cl.get('<path>')
+        self.interval = COLLECT_INTERVAL
+        if cl.get('--interval'):
+            self.interval = cl.get('<seconds>')
+        self.exporter = None
+        self.server = None
+
+    def check_options(self):
+        """
+        :return: error message if command line options are not valid
+        """
+        try:
+            self.interval = float(self.interval)
+        except (TypeError, ValueError):
+            self.interval = 0
+        if self.interval <= 0:
+            return _('collection interval must be a number of seconds')
+        if self.socket_path is not None:
+            if not self.socket_path:
+                return _('unix socket path is required')
+            return None
+        try:
+            self.port = int(self.port)
+        except (TypeError, ValueError):
+            self.port = 0
+        if not 0 < self.port < 65536:
+            return _('port must be a number between 1 and 65535')
+        return None
+
+    def create_server(self):
+        """
+        :return: http server on the unix socket, or on the local port
+        """
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.server = UnixHTTPServer(self.socket_path, MetricsHandler)
+        else:
+            self.server = HTTPServer((LISTEN_ADDRESS, self.port),
+                                     MetricsHandler)
+        self.server.exporter = self.exporter
+        return self.server
+
+    def run(self):
+        """
+        serve metrics until interrupted
+        :return: empty string so caller can print the result like other commands
+        """
+        _error = self.check_options()
+        if _error:
+            return _error
+        self.exporter = Exporter(self.interval)
+        try:
+            self.create_server()
+        except (socket.error, OSError) as _err:
+            return _('unable to start exporter') + ': ' + str(_err)
+        # every collection queries mstpd. reuse one control socket
+        mstpd.keep_connection_open()
+        self.exporter.start()
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.exporter.stop()
+            mstpd.keep_connection_open(False)
+            self.server.server_close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        return ''
@@ -8,7 +8,6 @@ from netshowlib import netshowlib as nn
 from netshowlib.cumulus import iface as cumulus_iface
 from netshow.linux import print_iface as linux_printiface
 from tabulate import tabulate
-from netshowlib.linux import common as linux_common
 from netshow.cumulus.common import _
 import inflection
 
@@ -65,10 +64,9 @@ class PrintIface(linux_printiface.PrintIface):
         :return list of vlan trunk  info for vlan aware bridge
         """
         _strlist = []
-        _strlist.append(_('vlans') + ': ' + ','.join(
-            linux_common.create_range('', self.iface.vlan_list)))
-        _strlist.append(_('native') + ': ' + ','.join(
-            linux_common.create_range('', self.iface.native_vlan)))
+        # vlan lists of vlan aware ports are already ranges
+        _strlist.append(_('vlans') + ': ' + ','.join(self.iface.vlan_list))
+        _strlist.append(_('native') + ': ' + ','.join(self.iface.native_vlan))
         return _strlist
 
     def access_summary_vlan_aware(self):
@@ -171,7 +169,7 @@ class PrintIface(linux_printiface.PrintIface):
         if self.iface.vlan_filtering:
             _vlanlist = self.iface.vlan_list
             _header = [_("all vlans on l2 port")]
-            _table = [[', '.join(linux_common.create_range('', _vlanlist))]]
+            _table = [[', '.join(_vlanlist)]]
             _str += tabulate(_table, _header, numalign='left') + self.new_line()
             _header = [_("untagged vlans")]
             _table = [[', '.join(self.iface.native_vlan)]]
@@ -183,8 +181,7 @@ class PrintIface(linux_printiface.PrintIface):
                 # if vlan aware and bridgelist is not empty, then assume
                 # all vlans have that stp state
                 if self.iface.vlan_filtering:
-                    _table = [[', '.join(linux_common.create_range(
-                        '', _vlanlist))]]
+                    _table = [[', '.join(_vlanlist)]]
                 else:
                     _table = [self._pretty_vlanlist(_bridgelist)]
 
@@ -6,9 +6,13 @@
 """
 Usage:
     netshow system [--json | -j ]
-    netshow counters [errors] [all] [--json | -j | -l | --legend ]
+    netshow counters [errors] [all] [--rate] [<interval>] [--since | --since-last] [<baseline>] [--top] [<count>] [--sort] [errors | ucast | mcast | bcast | rate] [--group] [drops | pfc | octets] [--json | -j | -l | --legend ] [--watch] [<seconds>]
+    netshow exporter [--port] [<port>] [--socket] [<path>] [--interval] [<seconds>]
+    netshow asicports [--json | -j ]
+    netshow asic resources [--json | -j ]
+    netshow vlan [<vlanid>] [--json | -j ]
     netshow lldp [--json | -j | -l | --legend ]
-    netshow interface [<iface>] [all] [--mac | -m ] [--oneline | -1 | --json | -j | -l | --legend ]
+    netshow interface [<iface>] [all] [--mac | -m ] [--oneline | -1 | --json | -j | -l | --legend ] [--watch] [<seconds>]
     netshow access [all] [--mac | -m ] [--oneline | -1  | --json | -j | -l | --legend ]
     netshow bridges [all] [--mac | -m ] [--oneline | -1  | --json | -j | -l | --legend ]
     netshow bonds [all] [--mac | -m ] [--oneline | -1  | --json | -j | -l | --legend ]
@@ -22,6 +26,12 @@ Usage:
 Help:
     * default is to show intefaces only in the UP state.
     counters                  summary of physical port counters.
+    counters --rate <interval>  packets and errors per second, measured over <interval> seconds
+    counters --since-last     counters since the last 'netshow counters --since-last'
+    counters --since <baseline>  counters since the named baseline. saves it if it does not exist
+    counters --top <count>    only the <count> ports with the most errors, or most of the --sort field
+    counters --group <group>  drops, pfc or octets counters, read in the same pass as the summary counters
+    exporter                  serve counters, link and STP state as OpenMetrics for Prometheus
     interface                 summary info of all interfaces
     access                    summary of physical ports with l2 or l3 config
     bonds                     summary of bonds
@@ -33,7 +43,11 @@ Help:
     phy                       summary of physical ports
     trunks                    summary of trunk interfaces
     lldp                      physical device neighbor information
-    interface <iface>         list summary of a single interface
+    interface <iface>         list summary of a single interface. asic port names like xe11 also work
+    asicports                 kernel port, asic port and initial speed of all ports
+    asic resources            hardware host, route, MAC and ACL table usage
+    vlan                      tagged and untagged bridge ports of each vlan
+    vlan <vlanid>             tagged and untagged bridge ports of a single vlan
     system                    system information
 
 Options:
@@ -41,6 +55,16 @@ Options:
     --mac      show inteface MAC in output
     --version  netshow software version
     --oneline  output each entry on one line
+    --rate     show counters as rates per second. default interval is 1 second
+    --since    show counters since a named baseline was saved
+    --since-last  show counters since the last run with this option
+    --top      only show the top ports. default sort field is errors
+    --sort     field used by --top. errors, ucast, mcast, bcast or rate(requires --rate)
+    --group    counter group to show. drops, pfc or octets
+    --port     local TCP port the exporter listens on. default is 9364
+    --socket   unix socket the exporter listens on instead of a TCP port
+    --interval  seconds between exporter collections. default is 15 seconds
+    --watch    stay running and refresh output every <seconds>. default is 1 second
     -1         alias for --oneline
     --json     print output in json
     -l         alias for --legend
@@ -54,6 +78,9 @@ from netshow.cumulus.show_counters import ShowCounters
 from netshow.cumulus.show_system import ShowSystem
 from netshow.cumulus.show_interfaces import ShowInterfaces
 from netshow.cumulus.show_neighbors import ShowNeighbors
+from netshow.cumulus.exporter import ShowExporter
+from netshow.cumulus.show_asicports import ShowAsicPorts, ShowAsicResources
+from netshow.cumulus.show_vlan import ShowVlan
 
 
 def interface_related(_nd):
@@ -91,6 +118,18 @@ def run():
         elif _nd.get('counters'):
             _showcounters = ShowCounters(_nd)
             print(_showcounters.run())
+        elif _nd.get('resources'):
+            _showresources = ShowAsicResources(_nd)
+            print(_showresources.run())
+        elif _nd.get('asicports'):
+            _showasicports = ShowAsicPorts(_nd)
+            print(_showasicports.run())
+        elif _nd.get('exporter'):
+            _showexporter = ShowExporter(_nd)
+            print(_showexporter.run())
+        elif _nd.get('vlan'):
+            _showvlan = ShowVlan(_nd)
+            print(_showvlan.run())
         elif _nd.get('--version') or _nd.get('-V'):
             print(print_version())
         else:
@@ -0,0 +1,57 @@
+# pylint: disable=E0611
+""" Module for printing the kernel port to asic port mapping
+and asic resource usage
+"""
+from netshowlib.cumulus import asic
+from collections import OrderedDict
+import json
+from tabulate import tabulate
+from netshow.cumulus.common import _
+
+
+class ShowAsicPorts(object):
+    """
+    Class responsible for printing kernel port, asic port and initial speed
+    of all ports
+    """
+    def __init__(self, cl):
+        self.use_json = cl.get('--json') or cl.get('-j')
+        self.asic = asic
+
+    def run(self):
+        """
+        :return: cli or json output of netshow asicports
+        """
+        _port_map = self.asic.port_map()
+        if self.use_json:
+            return json.dumps(OrderedDict(
+                [(x, {'asicname': y, 'initial_speed': z})
+                 for x, y, z in _port_map]), indent=4)
+        if not _port_map:
+            return _('asic port names not found')
+        _header = [_('port'), _('asic port'), _('initial speed')]
+        return tabulate(_port_map, _header)
+
+
+class ShowAsicResources(object):
+    """
+    Class responsible for printing hardware forwarding table usage
+    """
+    def __init__(self, cl):
+        self.use_json = cl.get('--json') or cl.get('-j')
+        self.asic = asic
+
+    def run(self):
+        """
+        :return: cli or json output of netshow asic resources
+        """
+        _resources = self.asic.resources()
+        if self.use_json:
+            return json.dumps(OrderedDict(
+                [(x, y._asdict()) for x, y in _resources.items()]), indent=4)
+        if not _resources:
+            return _('asic resource usage not available')
+        _header = [_('resource'), _('count'), _('max'), _('used %')]
+        _table = [[x.name, x.count, x.maximum, x.percent]
+                  for x in _resources.values()]
+        return tabulate(_table, _header)
@@ -4,14 +4,29 @@
 import netshowlib.netshowlib as nn
 from netshow.linux.netjson_encoder import NetEncoder
 from netshow.cumulus import print_iface
+from netshow.cumulus import watch
 import netshowlib.cumulus.cache as cumulus_cache
+from netshowlib.cumulus import counters
+from netshowlib.cumulus import counter_baseline
 from collections import OrderedDict
+import heapq
 import json
+import time
 from tabulate import tabulate
 from netshow.cumulus.common import _
 from netshow.linux.common import legend_wrapped_cli_output
 
 
+# sort field on the command line -> counter name
+SORT_FIELDS = OrderedDict([
+    ('ucast', 'unicast'),
+    ('mcast', 'multicast'),
+    ('bcast', 'broadcast'),
+    ('errors', 'errors'),
+    ('rate', None)
+])
+
+
 class ShowCounters(object):
     """
     Class responsible for printing out basic linux device neighbor info
@@ -29,27 +44,239 @@ class ShowCounters(object):
         self.show_legend = False
         if cl.get('-l') or cl.get('--legend'):
             self.show_legend = True
+        self.counters = counters
+        self.show_rate = cl.get('--rate')
+        self.interval = cl.get('<interval>') or 1
+        self.rates = {}
+        self.counter_baseline = counter_baseline
+        self.use_baseline = cl.get('--since-last') or cl.get('--since')
+        self.baseline_name = cl.get('<baseline>')
+        if cl.get('--since-last'):
+            self.baseline_name = counter_baseline.LAST_BASELINE
+        self.baseline_time = None
+        self.baseline = None
+        self.watch = watch
+        self.watch_interval = None
+        if cl.get('--watch'):
+            self.watch_interval = cl.get('<seconds>') or 1
+        self.feature_cache = None
+        self.snapshot = None
+        self.snapshot_time = None
+        self.top = cl.get('<count>') if cl.get('--top') else None
+        self.sort_field = 'errors'
+        for _field in SORT_FIELDS.keys():
+            # 'errors' is also the errors only filter, so check it last
+            if _field != 'errors' and cl.get(_field):
+                self.sort_field = _field
+                break
+        self.use_group = cl.get('--group')
+        self.group = None
+        for _group in counters.COUNTER_GROUPS.keys():
+            if cl.get(_group):
+                self.group = _group
+                break
 
     def run(self):
         """
         :return: basic neighbor information based on data obtained on netshow-lib
         """
-        feature_cache = self.cache.Cache()
-        feature_cache.run()
-        for _ifacename in sorted(nn.portname_list()):
-            _piface = self.print_iface.iface(_ifacename, feature_cache)
+        _error = self.check_options()
+        if _error:
+            return _error
+        self.feature_cache = self.cache.Cache()
+        # counters are collected on their own, with the group statistics
+        # if asked for, so the snapshot time is when they were read
+        _features = dict(self.feature_cache.feature_list)
+        _features.pop('counters', None)
+        self.feature_cache.run(_features)
+        self.snapshot = None
+        self.take_snapshot()
+        self.feature_cache.counters = self.snapshot
+        if self.use_baseline:
+            _error = self.load_baseline()
+            if _error:
+                return _error
+        if self.show_rate:
+            # one collection pass per snapshot. ifaces are created from the
+            # 2nd snapshot so they show the current counters
+            time.sleep(self.interval)
+            self.take_snapshot()
+        self.feature_cache.counters = self.display_counters()
+        if self.top:
+            _portnames = self.top_ports()
+        else:
+            _portnames = sorted(nn.portname_list())
+        for _ifacename in _portnames:
+            _piface = self.print_iface.iface(_ifacename, self.feature_cache)
             if hasattr(_piface.iface, 'is_phy') and _piface.iface.is_phy():
                 if self.show_up and _piface.iface.linkstate < 2:
                     continue
-                if self.show_errors and _piface.iface.counters.total_err == 0:
+                if self.show_errors and self.total_err(_piface) == 0:
                     continue
                 self.ifacelist[_ifacename] = _piface
+                if self.top and len(self.ifacelist) >= self.top:
+                    break
+
+        if self.watch_interval:
+            return self.watch.Watch(self.watch_interval).run(self.refresh,
+                                                              self.output)
+        return self.output()
+
+    def check_options(self):
+        """
+        :return: error message if command line options are not valid
+        """
+        if self.show_rate:
+            try:
+                self.interval = float(self.interval)
+            except ValueError:
+                self.interval = 0
+            if self.interval <= 0:
+                return _('rate interval must be a number of seconds')
+        if self.watch_interval is not None:
+            try:
+                self.watch_interval = float(self.watch_interval)
+            except ValueError:
+                self.watch_interval = 0
+            if self.watch_interval <= 0:
+                return _('watch interval must be a number of seconds')
+        if self.use_baseline and not self.baseline_name:
+            return _('baseline name is required')
+        if self.top is not None:
+            try:
+                self.top = int(self.top)
+            except ValueError:
+                self.top = 0
+            if self.top <= 0:
+                return _('top count must be a positive number')
+        if self.sort_field == 'rate' and not self.show_rate:
+            return _('sorting by rate requires --rate')
+        if self.use_group and not self.group:
+            return _('counter group is required')
+        if self.group and self.use_baseline:
+            return _('counter groups can not be used with a baseline')
+        return None
+
+    def sort_value(self, ifacename):
+        """
+        :return: value of the sort field for a port. In rate mode
+        the value per second is used
+        """
+        if self.show_rate:
+            _counters = self.rates.get(ifacename) or {}
+        else:
+            _counters = self.feature_cache.counters.get(ifacename) or {}
+        _countername = SORT_FIELDS.get(self.sort_field)
+        _value = 0
+        for _dir in ('tx', 'rx'):
+            for _name, _count in (_counters.get(_dir) or {}).items():
+                if _name == _countername or \
+                        (_countername is None and _name != 'errors'):
+                    _value += _count or 0
+        return _value
+
+    def top_ports(self):
+        """
+        generator of port names, highest sort field value first. Uses a heap
+        over the collected counters so ports are only ordered as far as
+        needed and PrintIface objects are only built for ports that are used.
+        """
+        _heap = [(-self.sort_value(x), x) for x in self.feature_cache.counters]
+        heapq.heapify(_heap)
+        while _heap:
+            yield heapq.heappop(_heap)[1]
 
+    def output(self):
+        """
+        :return: cli or json output of netshow counters
+        """
         if self.use_json:
+            if self.show_rate:
+                return json.dumps(
+                    {'interval': self.interval,
+                     'rates': OrderedDict(
+                         [(x, self.rates.get(x)) for x in self.ifacelist])},
+                    indent=4)
             return json.dumps(self.ifacelist,
                               cls=NetEncoder, indent=4)
+        if self.group:
+            return self.print_group()
+        if self.show_rate:
+            return self.print_rates()
         return self.print_counters()
 
+    def take_snapshot(self):
+        """
+        collect counters of all ports in one pass. In rate mode work out
+        the rates since the previous snapshot, over the time between the
+        2 counter reads.
+        """
+        _now = time.time()
+        _snapshot = self.counters.cacheinfo(
+            groups=[self.group] if self.group else None)
+        if self.show_rate and self.snapshot is not None:
+            self.rates = self.counters.counter_rates(
+                self.snapshot, _snapshot, _now - self.snapshot_time)
+        self.snapshot = _snapshot
+        self.snapshot_time = _now
+
+    def display_counters(self):
+        """
+        :return: counters to show. How much the counters went up when
+        using a baseline, otherwise the last snapshot
+        """
+        if self.baseline:
+            return self.counters.counter_deltas(self.baseline, self.snapshot)
+        return self.snapshot
+
+    def refresh(self):
+        """
+        used by watch mode. Only collect counters again and update the
+        counters hash the ifaces already point to. Ifaces are not rediscovered.
+        """
+        self.take_snapshot()
+        _display_counters = self.display_counters()
+        self.feature_cache.counters.clear()
+        self.feature_cache.counters.update(_display_counters)
+        # ifaces read the updated counters on next use
+        self.counters.new_generation()
+        for _piface in self.ifacelist.values():
+            # speed changes with link state
+            _piface.iface._speed = None
+
+    def load_baseline(self):
+        """
+        load the baseline used to work out how much the counters went up.
+        The ``last`` baseline is updated on every run, named baselines
+        are only saved when they do not exist.
+
+        :return: message to print instead of counters, if any
+        """
+        try:
+            (self.baseline_time, self.baseline) = self.counter_baseline.load(
+                self.baseline_name)
+        except ValueError:
+            return _('invalid baseline name')
+        if self.baseline is None or \
+                self.baseline_name == self.counter_baseline.LAST_BASELINE:
+            if not self.counter_baseline.save(self.baseline_name,
+                                              self.snapshot):
+                return _('unable to save counter baseline in') + ' ' + \
+                    self.counter_baseline.BASELINE_DIR
+        if self.baseline is None:
+            return _('counter baseline saved') + ': ' + self.baseline_name
+        return None
+
+    def total_err(self, piface):
+        """
+        :return: total errors of a port. errors per second in rate mode
+        """
+        if self.show_rate:
+            _rates = self.rates.get(piface.name, {})
+            return sum([_rates.get(x, {}).get('errors') or 0
+                        for x in ('tx', 'rx')])
+        return piface.iface.counters.total_err
+
     def print_counters(self):
         """
         :return: cli output of netshow counters
@@ -74,5 +301,66 @@ class ShowCounters(object):
                            _tx_counters.get('multicast'),
                            _tx_counters.get('broadcast'),
                            _tx_counters.get('errors')])
+        _output = tabulate(_table, _header, floatfmt='.0f')
+        if self.baseline_time:
+            _output = "%s %s\n\n%s" % (
+                _('counters since'),
+                time.strftime('%Y-%m-%d %H:%M:%S',
+                              time.localtime(self.baseline_time)),
+                _output)
+        return legend_wrapped_cli_output(_output)
+
+    def print_rates(self):
+        """
+        :return: cli output of netshow counters --rate
+        """
+        _header = ['', _('port'), _('speed'), _('mode'), '',
+                   _('ucast/s'), _('mcast/s'), _('bcast/s'), _('errors/s')]
+        _table = []
+        for _piface in self.ifacelist.values():
+            _rates = self.rates.get(_piface.name)
+            if not _rates or not _rates.get('rx'):
+                continue
+            _rx_rates = _rates.get('rx')
+            _tx_rates = _rates.get('tx')
+            _table.append([_piface.linkstate, _piface.name,
+                           _piface.speed, _piface.port_category,
+                           _('rx'), _rx_rates.get('unicast'),
+                           _rx_rates.get('multicast'),
+                           _rx_rates.get('broadcast'),
+                           _rx_rates.get('errors')])
+            _table.append(['', '', '', '', _('tx'),
+                           _tx_rates.get('unicast'),
+                           _tx_rates.get('multicast'),
+                           _tx_rates.get('broadcast'),
+                           _tx_rates.get('errors')])
         return legend_wrapped_cli_output(tabulate(_table, _header,
-          floatfmt='.0f'))
+          floatfmt='.1f'))
+
+    def print_group(self):
+        """
+        :return: cli output of netshow counters --group. Per second
+        in rate mode
+        """
+        (_rx_names, _tx_names) = self.counters.group_counter_names(self.group)
+        _names = _rx_names + [x for x in _tx_names if x not in _rx_names]
+        _suffix = '/s' if self.show_rate else ''
+        _header = ['', _('port'), _('speed'), _('mode'), ''] + \
+            [x + _suffix for x in _names]
+        _table = []
+        for _piface in self.ifacelist.values():
+            if self.show_rate:
+                _counters = self.rates.get(_piface.name) or {}
+            else:
+                _counters = _piface.iface.counters.all
+            if not _counters.get('rx'):
+                continue
+            _rx_counters = _counters.get('rx')
+            _tx_counters = _counters.get('tx') or {}
+            _table.append([_piface.linkstate, _piface.name,
+                           _piface.speed, _piface.port_category,
+                           _('rx')] + [_rx_counters.get(x) for x in _names])
+            _table.append(['', '', '', '', _('tx')] +
+                          [_tx_counters.get(x) for x in _names])
+        return legend_wrapped_cli_output(tabulate(
+            _table, _header, floatfmt='.1f' if self.show_rate else '.0f'))
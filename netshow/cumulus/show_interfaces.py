@@ -14,6 +14,9 @@ import netshow.cumulus.print_bridge as print_bridge
 import netshow.cumulus.print_bond as print_bond
 import netshowlib.cumulus.cache as cumulus_cache
 from netshowlib.cumulus import iface
+from netshowlib.cumulus import asic
+from netshowlib.cumulus import counters
+from netshow.cumulus import watch
 from netshow.linux.netjson_encoder import NetEncoder
 import json
 from netshow.linux.common import legend_wrapped_cli_output
@@ -34,14 +37,78 @@ class ShowInterfaces(linux_showint.ShowInterfaces):
         self.print_bridge = print_bridge
         self.print_bond = print_bond
         self.iface = iface
+        self.asic = asic
+        self.counters = counters
+        self.watch = watch
+        self.watch_interval = None
+        if _cl.get('--watch'):
+            self.watch_interval = _cl.get('<seconds>') or 1
+        self.feature_cache = None
+        self._single_printiface = None
+
+    def run(self):
+        """
+        :return: terminal output or JSON for 'netshow interfaces'. In watch
+        mode stays resident and redraws the output until interrupted
+        """
+        if self.watch_interval is None:
+            return linux_showint.ShowInterfaces.run(self)
+        try:
+            self.watch_interval = float(self.watch_interval)
+        except ValueError:
+            self.watch_interval = 0
+        if self.watch_interval <= 0:
+            return _('watch interval must be a number of seconds')
+        return self.watch.Watch(self.watch_interval).run(
+            self.refresh, lambda: linux_showint.ShowInterfaces.run(self))
+
+    def refresh(self):
+        """
+        used by watch mode. Only collect the volatile info again: counters
+        and link state. Interfaces are not rediscovered or reclassified.
+        """
+        if self.feature_cache is None:
+            return
+        if self._single_printiface:
+            # only the shown interface needs its counters read again
+            _printifaces = [self._single_printiface]
+            _counters = self.counters.cacheinfo(
+                ifacename=self._single_printiface.iface.name)
+        else:
+            _printifaces = self._ifacelist.get('all').values()
+            _counters = self.counters.cacheinfo()
+        self.feature_cache.counters.clear()
+        self.feature_cache.counters.update(_counters)
+        # ifaces read the updated counters on next use
+        self.counters.new_generation()
+        for _printiface in _printifaces:
+            # link state is read each time. speed is cached, so reset it
+            _printiface.iface._speed = None
 
     def print_single_iface(self):
         """
         :return: netshow terminal output or JSON of a single iface
         """
-        feature_cache = self.cache.Cache()
-        feature_cache.run()
-        _printiface = self.print_iface.iface(self.single_iface, feature_cache)
+        if self._single_printiface:
+            _printiface = self._single_printiface
+        else:
+            feature_cache = self.cache.Cache()
+            # STP info of a single port or bridge comes from a scoped
+            # mstpd query, not from a query of every bridge
+            _features = dict(feature_cache.feature_list)
+            _features.pop('mstpd', None)
+            feature_cache.run(_features)
+            self.feature_cache = feature_cache
+            _printiface = self.print_iface.iface(self.single_iface,
+                                                 feature_cache)
+            if not _printiface:
+                # may be an asic port name, like xe11
+                _kernelname = self.asic.kernel_portname(
+                    self.single_iface, getattr(feature_cache, 'asic', None))
+                if _kernelname:
+                    _printiface = self.print_iface.iface(_kernelname,
+                                                         feature_cache)
+            self._single_printiface = _printiface
         if not _printiface:
             return _('interface_does_not_exist')
 
@@ -70,6 +137,7 @@ class ShowInterfaces(linux_showint.ShowInterfaces):
         list_of_ports = sorted(nn.portname_list())
         feature_cache = self.cache.Cache()
         feature_cache.run()
+        self.feature_cache = feature_cache
         for _portname in list_of_ports:
             _printiface = self.print_iface.iface(_portname, feature_cache)
             if self.show_up and _printiface.iface.linkstate < 2:
@@ -0,0 +1,74 @@
+# pylint: disable=E0611
+""" Module for printing the bridge ports that carry each vlan
+"""
+from netshowlib.cumulus import vlan
+from netshowlib.linux import common as linux_common
+from collections import OrderedDict
+import json
+from tabulate import tabulate
+from netshow.cumulus.common import _
+
+
+class ShowVlan(object):
+    """
+    Class responsible for printing tagged and untagged ports of all vlans,
+    or of a single vlan
+    """
+    def __init__(self, cl):
+        self.use_json = cl.get('--json') or cl.get('-j')
+        self.vlanid = cl.get('<vlanid>')
+        self.vlan = vlan
+
+    def check_options(self):
+        """
+        :return: error message if the vlan id is not valid
+        """
+        if self.vlanid is None:
+            return None
+        try:
+            self.vlanid = int(self.vlanid)
+        except ValueError:
+            self.vlanid = 0
+        if not 1 <= self.vlanid <= 4094:
+            return _('vlan id must be a number between 1 and 4094')
+        return None
+
+    @staticmethod
+    def vlan_range(start, end):
+        """
+        :return: vlan range as a string. Example: 1-10
+        """
+        if start == end:
+            return str(start)
+        return '%s-%s' % (start, end)
+
+    def run(self):
+        """
+        :return: cli or json output of netshow vlan
+        """
+        _error = self.check_options()
+        if _error:
+            return _error
+        _index = self.vlan.cacheinfo()
+        if self.vlanid:
+            _ranges = []
+            _entry = _index.get(self.vlanid)
+            if _entry:
+                _ranges = [(self.vlanid, self.vlanid, _entry)]
+        else:
+            _ranges = _index.ranges
+        if self.use_json:
+            return json.dumps(OrderedDict(
+                [(self.vlan_range(x, y), z) for x, y, z in _ranges]), indent=4)
+        if not _ranges:
+            if self.vlanid:
+                return _('vlan %s is not on any bridge port') % (self.vlanid)
+            return _('no vlans found on bridge ports')
+        _header = [_('vlan'), _('tagged'), _('untagged')]
+        _table = []
+        for _start, _end, _entry in _ranges:
+            _table.append([
+                self.vlan_range(_start, _end),
+                ', '.join(linux_common.group_ports(_entry.get('tagged'))),
+                ', '.join(linux_common.group_ports(_entry.get('untagged')))])
+        return tabulate(_table, _header)
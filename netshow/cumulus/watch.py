@@ -0,0 +1,75 @@
+# pylint: disable=E0611
+""" Module for redrawing netshow output every few seconds
+"""
+import sys
+import time
+from netshowlib.cumulus import mstpd
+from netshow.cumulus.common import _
+
+# ANSI escape sequences
+CLEAR_SCREEN = '\033[2J\033[H'
+CLEAR_TO_EOL = '\033[K'
+MOVE_TO_ROW = '\033[%d;1H'
+
+
+class Watch(object):
+    """
+    Class responsible for staying resident and redrawing netshow output.
+    Only rows that changed since the last draw are written to the terminal.
+    """
+    def __init__(self, interval, output=None):
+        self.interval = interval
+        self.output = output or sys.stdout
+        self.lines = None
+
+    def header(self):
+        """
+        :return: header line with the refresh interval and current time
+        """
+        return "%s %ss: %s    %s" % (
+            _('every'), self.interval, ' '.join(sys.argv[1:]),
+            time.strftime('%Y-%m-%d %H:%M:%S'))
+
+    def draw(self, text):
+        """
+        write ``text`` to the terminal. The first time the screen is cleared,
+        after that only changed rows are rewritten.
+        """
+        _lines = [self.header(), ''] + text.split('\n')
+        if self.lines is None:
+            self.output.write(CLEAR_SCREEN + '\n'.join(_lines))
+        else:
+            _changes = []
+            for _row, _line in enumerate(_lines):
+                if _row >= len(self.lines) or self.lines[_row] != _line:
+                    _changes.append(MOVE_TO_ROW % (_row + 1) + _line +
+                                    CLEAR_TO_EOL)
+            # output got shorter, blank out old rows
+            for _row in range(len(_lines), len(self.lines)):
+                _changes.append(MOVE_TO_ROW % (_row + 1) + CLEAR_TO_EOL)
+            self.output.write(''.join(_changes))
+        self.output.flush()
+        self.lines = _lines
+
+    def run(self, refresh, render):
+        """
+        draw, then loop refreshing and redrawing until interrupted.
+
+        :param refresh: function that collects new data
+        :param render: function that returns output to draw
+        :return: empty string so caller can print the result like other commands
+        """
+        # refreshes may query mstpd. reuse one control socket
+        mstpd.keep_connection_open()
+        try:
+            self.draw(render())
+            while True:
+                time.sleep(self.interval)
+                refresh()
+                self.draw(render())
+        except KeyboardInterrupt:
+            if self.lines is not None:
+                self.output.write(MOVE_TO_ROW % (len(self.lines) + 1))
+        finally:
+            mstpd.keep_connection_open(False)
+        return ''
@@ -3,28 +3,167 @@ Module for running asic specific tasks
 """
 
 from netshowlib.linux import common as linux_common
+from collections import namedtuple, OrderedDict
 import io
+import json
+import mmap
+import os
 import re
+import time
 
 
 PORTTAB_FILELOCATION = '/var/lib/cumulus/porttab'
 BCMD_FILELOCATION = '/etc/bcm.d/config.bcm'
+PCI_DEVICES_PATH = '/sys/bus/pci/devices'
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+# detected asic, saved with the boot id so it is only detected once per boot
+ASIC_STATE_FILE = '/run/netshow/asic'
+# PCI vendor id -> asic name
+ASIC_VENDORS = {'0x14e4': 'broadcom'}
+# PCI base class of ethernet and network controllers
+NETWORK_PCI_CLASS = '0x02'
+NO_ASIC = 'none'
+# port_init_speed_<asic port>[.<sdk intf>]=<speed> lines of config.bcm.
+# Anything up to the last '_' of the key is skipped, same as split('_')[-1]
+PORT_INIT_SPEED_RE = re.compile(
+    br'^port_init_speed_(?:[^=\s]*_)?([^_=\s.]+)(?:\.([^_=\s.]+))?'
+    br'[ \t]*=[ \t]*(\S*)', re.M)
+RESOURCE_QUERY_CMD = '/usr/cumulus/bin/cl-resource-query'
+# last resource query output. Reused for RESOURCES_TTL seconds
+RESOURCES_CACHE_FILE = '/run/netshow/asic-resources.json'
+RESOURCES_TTL = 10
+# "<name>:  <count>[,  <percent>% of maximum value  <maximum>]"
+RESOURCE_RE = re.compile(
+    r'^\s*([^:]+):\s*(\d+)(?:,\s*(\d+)%\s+of maximum value\s+(\d+))?\s*$')
 
+# hardware forwarding table usage. maximum and percent are None
+# for resources without a limit
+Resource = namedtuple('Resource', ['name', 'count', 'maximum', 'percent'])
 
-def switching_asic_discovery():
-    """ return class instance that matches switching asic
-    used on the cumulus switch
+# parsed porttab and config.bcm port map, with the stat info of both files
+PORTMAP_CACHE_FILE = '/run/netshow/asic-portmap.json'
+
+# detected asic name and parsed asic info, kept for the life of the process
+ASIC_CACHE = {}
+
+
+def pci_asic_name():
+    """
+    find the switching asic by reading vendor and class ids
+    from ``/sys/bus/pci/devices``
+
+    :return: name of the asic, or ``NO_ASIC`` if none is found
+    """
+    for _device in sorted(os.listdir(PCI_DEVICES_PATH)):
+        _path = os.path.join(PCI_DEVICES_PATH, _device)
+        _pci_class = linux_common.read_file_oneline(
+            os.path.join(_path, 'class'))
+        if not _pci_class or not _pci_class.startswith(NETWORK_PCI_CLASS):
+            continue
+        _vendor = linux_common.read_file_oneline(
+            os.path.join(_path, 'vendor'))
+        if _vendor in ASIC_VENDORS:
+            return ASIC_VENDORS[_vendor]
+    return NO_ASIC
+
+
+def lspci_asic_name():
+    """
+    find the switching asic using ``lspci``. Used when PCI devices
+    are not in sysfs
+
+    :return: name of the asic, or ``NO_ASIC`` if none is found
     """
     try:
         lspci_output = linux_common.exec_command('lspci -nn')
     except linux_common.ExecCommandException:
-        return None
+        return NO_ASIC
 
     for _line in lspci_output.decode('utf-8').split('\n'):
         _line = _line.lower()
         if re.search(r'(ethernet|network)\s+controller.*broadcom',
                      _line):
-            return BroadcomAsic()
+            return 'broadcom'
+    return NO_ASIC
+
+
+def boot_id():
+    """
+    :return: id of the current boot
+    """
+    return linux_common.read_file_oneline(BOOT_ID_FILE)
+
+
+def load_asic_name():
+    """
+    :return: asic name saved during this boot. None if there is none
+    """
+    try:
+        (_boot_id, _name) = linux_common.read_file_oneline(
+            ASIC_STATE_FILE).split()
+    except (AttributeError, ValueError):
+        return None
+    if _boot_id != boot_id():
+        return None
+    return _name
+
+
+def save_asic_name(name):
+    """
+    save the asic name with the current boot id. Replaced atomically
+    """
+    _boot_id = boot_id()
+    if not _boot_id:
+        return
+    write_state_file(ASIC_STATE_FILE, u"%s %s\n" % (_boot_id, name))
+
+
+def write_state_file(path, text):
+    """
+    write ``text`` to a temp file then rename it, so readers
+    never see a half written file
+
+    :return: True if the file was written
+    """
+    _tmp_path = "%s.%s" % (path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(_tmp_path, 'wb') as _file:
+            _file.write(text.encode('utf-8'))
+        os.rename(_tmp_path, path)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def asic_name():
+    """
+    detect the switching asic once per process. The result is saved
+    under /run so other netshow runs in the same boot do not detect it again.
+
+    :return: name of the asic, or ``NO_ASIC`` if none is found
+    """
+    if 'name' in ASIC_CACHE:
+        return ASIC_CACHE['name']
+    _name = load_asic_name()
+    if _name is None:
+        if os.path.isdir(PCI_DEVICES_PATH):
+            _name = pci_asic_name()
+        else:
+            _name = lspci_asic_name()
+        save_asic_name(_name)
+    ASIC_CACHE['name'] = _name
+    return _name
+
+
+def switching_asic_discovery():
+    """ return class instance that matches switching asic
+    used on the cumulus switch
+    """
+    if asic_name() == 'broadcom':
+        return BroadcomAsic()
+    return None
 
 
 def cacheinfo():
@@ -43,14 +182,113 @@ def cacheinfo():
 
             { 'kernelports': {}, 'asicports': {} }
 
+        The result is kept for the life of the process, so it is only
+        worked out for the first port.
     """
+    if 'info' in ASIC_CACHE:
+        return ASIC_CACHE['info']
     cache = {'kernelports': {}, 'asicports': {}}
     asic = switching_asic_discovery()
     if asic:
         cache = asic.parse_speed_and_name_info()
+    ASIC_CACHE['info'] = cache
     return cache
 
 
+def kernel_portname(asicname, cache=None):
+    """
+    :param asicname: asic port name like ``xe11`` or ``xe11.1``. \
+        ``.0`` is used if no sdk intf is given
+    :param cache: asic hash from :meth:`cacheinfo`
+    :return: kernel port name of the asic port. None if there is none
+    """
+    if cache is None:
+        cache = cacheinfo()
+    if '.' not in asicname:
+        asicname = "%s.0" % (asicname)
+    return cache.get('asicports', {}).get(asicname.lower())
+
+
+def _port_sort_key(portname):
+    """
+    :return: sort key that puts swp2 before swp10
+    """
+    return [int(x) if x.isdigit() else x for x in re.split(r'(\d+)', portname)]
+
+
+def port_map(cache=None):
+    """
+    :param cache: asic hash from :meth:`cacheinfo`
+    :return: list of (kernel port, asic port, initial speed) sorted by \
+        kernel port name. initial speed is None if config.bcm does not set it
+    """
+    if cache is None:
+        cache = cacheinfo()
+    _kernelports = cache.get('kernelports', {})
+    return [(x, _kernelports[x].get('asicname'),
+             _kernelports[x].get('initial_speed'))
+            for x in sorted(_kernelports.keys(), key=_port_sort_key)]
+
+
+def parse_resources(output):
+    """
+    :param output: output of ``cl-resource-query``
+    :return: OrderedDict of resource key, like ``host_entries``, \
+        -> :class:`Resource`
+    """
+    _resources = OrderedDict()
+    for _line in output.splitlines():
+        _match = RESOURCE_RE.match(_line)
+        if not _match:
+            continue
+        (_name, _count, _percent, _maximum) = _match.groups()
+        _name = _name.strip()
+        _key = re.sub(r'\W+', '_', _name.lower()).strip('_')
+        _count = int(_count)
+        if _maximum is not None:
+            _maximum = int(_maximum)
+            _percent = round(100.0 * _count / _maximum, 1) if _maximum else 0.0
+        _resources[_key] = Resource(_name, _count, _maximum, _percent)
+    return _resources
+
+
+def resource_query_output(ttl=RESOURCES_TTL):
+    """
+    run ``cl-resource-query``. The output is saved under /run and reused
+    for ``ttl`` seconds, so pollers do not each run an SDK query.
+
+    :return: output of ``cl-resource-query``. None if it cannot be run
+    """
+    _now = time.time()
+    try:
+        with io.open(RESOURCES_CACHE_FILE) as _file:
+            _cache = json.load(_file)
+        if 0 <= _now - _cache['timestamp'] < ttl:
+            return _cache['output']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+    try:
+        _output = linux_common.exec_command(RESOURCE_QUERY_CMD)
+    except linux_common.ExecCommandException:
+        return None
+    if isinstance(_output, bytes):
+        _output = _output.decode('utf-8')
+    write_state_file(RESOURCES_CACHE_FILE, json.dumps(
+        {'timestamp': _now, 'output': _output}, separators=(',', ':')))
+    return _output
+
+
+def resources(ttl=RESOURCES_TTL):
+    """
+    :return: hardware resource usage, see :meth:`parse_resources`. \
+        Empty if ``cl-resource-query`` cannot be run
+    """
+    _output = resource_query_output(ttl)
+    if not _output:
+        return OrderedDict()
+    return parse_resources(_output)
+
+
 class Asic(object):
     """
     generic asic class for getting asic info
@@ -91,10 +329,55 @@ class BroadcomAsic(object):
         }
 
     def parse_speed_and_name_info(self):
+        """
+        :return: port name and speed hash. Taken from the port map cache
+        file if porttab and config.bcm did not change since it was written
+        """
+        _signature = self.source_signature()
+        _cached = self.load_port_map(_signature)
+        if _cached:
+            self.asichash = _cached
+            return self.asichash
         self.parse_ports_file()
         self.parse_initial_speed_file()
+        if _signature:
+            write_state_file(PORTMAP_CACHE_FILE, json.dumps(
+                {'sources': _signature, 'asic': self.asichash},
+                separators=(',', ':')))
         return self.asichash
 
+    def source_signature(self):
+        """
+        :return: list of [path, mtime, size, inode] of porttab and \
+            config.bcm. None if either file cannot be read
+        """
+        _signature = []
+        for _path in (self.porttab, self.bcmd):
+            try:
+                _stat = os.stat(_path)
+            except OSError:
+                return None
+            _signature.append([_path, _stat.st_mtime, _stat.st_size,
+                               _stat.st_ino])
+        return _signature
+
+    def load_port_map(self, signature):
+        """
+        :return: port map from the cache file if it was made from files \
+            matching ``signature``. None otherwise
+        """
+        if not signature:
+            return None
+        try:
+            with io.open(PORTMAP_CACHE_FILE) as _file:
+                _cache = json.load(_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(_cache, dict) or \
+                _cache.get('sources') != signature:
+            return None
+        return _cache.get('asic')
+
     def parse_ports_file(self):
         """
         parses porttabs file to generate mapping between kernel
@@ -117,23 +400,30 @@ class BroadcomAsic(object):
 
     def parse_initial_speed_file(self):
         """
-        parses initial speed info from broadcom initialization files
+        parses initial speed info from broadcom initialization files.
+        The file is memory mapped and only ``port_init_speed`` lines
+        are looked at, the rest of the file is never copied into a string.
         """
         try:
-            bcmdfile = io.open(self.bcmd).read()
+            bcmdfile = io.open(self.bcmd)
         except IOError:
             return None
 
-        textio = io.StringIO(bcmdfile)
-        for line in textio:
-            if line.startswith('port_init_speed'):
-                (portnamepart, speed) = line.split('=')
-                split_portnamepart = portnamepart.split('_')[-1].split('.')
-                if len(split_portnamepart) > 1:
-                    sdk_intfname = split_portnamepart[1]
-                else:
-                    sdk_intfname = "0"
-                asicportname = "%s.%s" % (split_portnamepart[0], sdk_intfname)
-                kernelportname = self.asichash['asicports'].get(asicportname)
-                if kernelportname:
-                    self.asichash['kernelports'][kernelportname]['initial_speed'] = speed.strip()
+        with bcmdfile:
+            try:
+                _map = mmap.mmap(bcmdfile.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error):
+                # empty file
+                return None
+            try:
+                for _match in PORT_INIT_SPEED_RE.finditer(_map):
+                    (_asicname, _sdk_intf, _speed) = _match.groups()
+                    asicportname = "%s.%s" % (_asicname.decode('utf-8'),
+                                              (_sdk_intf or b'0').decode('utf-8'))
+                    kernelportname = self.asichash['asicports'].get(
+                        asicportname)
+                    if kernelportname:
+                        self.asichash['kernelports'][kernelportname][
+                            'initial_speed'] = _speed.decode('utf-8')
+            finally:
+                _map.close()
@@ -54,7 +54,8 @@ class Bond(cumulus_iface.Iface, linux_bond.Bond):
         use vlan_list from cumulus provider
         """
         if self.vlan_filtering:
-            return self.common.vlan_aware_vlan_list(self.name, 'vlans')
+            return self.common.vlan_aware_vlan_list(self.name, 'vlans',
+                                                    self._cache)
         else:
             return linux_bond.Bond.vlan_list.fget(self)
 
@@ -65,6 +66,7 @@ class Bond(cumulus_iface.Iface, linux_bond.Bond):
         otherwise use linux provider native vlan function to get native vlan.
         """
         if self.vlan_filtering:
-            return self.common.vlan_aware_vlan_list(self.name, 'untagged_vlans')
+            return self.common.vlan_aware_vlan_list(
+                self.name, 'untagged_vlans', self._cache)
         else:
             return linux_bond.Bond.native_vlan.fget(self)
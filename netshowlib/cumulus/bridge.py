@@ -9,23 +9,40 @@ from netshowlib.cumulus import mstpd
 from collections import OrderedDict
 
 
+# keys of MstpctlStpBridge.member_state, in display order
+MEMBER_STATE_KEYS = ['root', 'designated', 'alternate', 'oper_edge_port',
+                     'network_port', 'discarding', 'forwarding', 'backup']
+
 
 class MstpctlStpBridge(object):
     """
-    class responsible to managing stp info gathered from mstpctl
+    class responsible to managing stp info gathered from mstpctl.
+    Each instance holds one STP snapshot. Member roles and states are
+    indexed once per instance.
     """
     def __init__(self, bridge, cache=None):
         self.bridge = bridge
         self._root_priority = None
         self._bridge_priority = None
-        if cache:
+        self.generation = None
+        if getattr(cache, 'mstpd', None) is not None:
             self._cache = cache.mstpd.get('bridge')
         else:
-            self._cache = mstpd.cacheinfo().get('bridge')
+            # only query this bridge, not every bridge on the switch
+            self._cache = mstpd.memoized_cacheinfo(
+                self.bridge.name).get('bridge')
+            self.generation = mstpd.GENERATION
         self.orig_cache = cache
         self.stpdetails = self._cache.get(self.bridge.name)
         self.initialize_member_state()
 
+    def is_current(self):
+        """
+        :return: True if the STP snapshot is still current. Snapshots from \
+            a feature cache always are, the owner of the cache updates it.
+        """
+        return self.generation is None or self.generation == mstpd.GENERATION
+
     def is_root(self):
         """
         :return: True if switch is root for bridge domain
@@ -45,26 +62,69 @@ class MstpctlStpBridge(object):
         """
         :return root priority
         """
-        return int(self.stpdetails.get('designated_root').split('.')[0]) * 4096
+        if self._root_priority is None:
+            self._root_priority = int(
+                self.stpdetails.get('designated_root').split('.')[0]) * 4096
+        return self._root_priority
 
     @property
     def bridge_priority(self):
         """
         :return: bridge priority
         """
-        return int(self.stpdetails.get('bridge_id').split('.')[0]) * 4096
+        if self._bridge_priority is None:
+            self._bridge_priority = int(
+                self.stpdetails.get('bridge_id').split('.')[0]) * 4096
+        return self._bridge_priority
 
     def initialize_member_state(self):
-        self._member_state = OrderedDict([
-            ('root', []),
-            ('designated', []),
-            ('alternate', []),
-            ('oper_edge_port', []),
-            ('network_port', []),
-            ('discarding', []),
-            ('forwarding', []),
-            ('backup', [])
-        ])
+        """
+        forget the member role and state index. It is built again on next use
+        """
+        self._member_state = None
+        self._roles = None
+        self._states = None
+
+    def index_member_state(self):
+        """
+        index bridge members by STP role, STP state and edge/network port
+        in one pass over the snapshot. Does nothing if already indexed.
+        """
+        if self._member_state is not None:
+            return
+        _roles = {}
+        _states = {}
+        _port_types = {'oper_edge_port': [], 'network_port': []}
+        _members = self.bridge.members
+        for _ifacename, _stpinfo in self.stpdetails.get('ifaces').items():
+            _iface = _members.get(_ifacename)
+            _roles.setdefault(_stpinfo.get('role'), []).append(_iface)
+            _states.setdefault(_stpinfo.get('state'), []).append(_iface)
+            if _stpinfo.get('oper_edge_port') == 'yes':
+                _port_types['oper_edge_port'].append(_iface)
+            elif _stpinfo.get('network_port') == 'yes':
+                _port_types['network_port'].append(_iface)
+        # tuples, so callers can not change the index
+        self._roles = dict([(x, tuple(y)) for x, y in _roles.items()])
+        self._states = dict([(x, tuple(y)) for x, y in _states.items()])
+        self._member_state = OrderedDict()
+        for _key in MEMBER_STATE_KEYS:
+            self._member_state[_key] = self._roles.get(_key) or \
+                self._states.get(_key) or tuple(_port_types.get(_key, ()))
+
+    def members_in_role(self, role):
+        """
+        :return: tuple of bridge members with this STP role
+        """
+        self.index_member_state()
+        return self._roles.get(role, ())
+
+    def members_in_state(self, state):
+        """
+        :return: tuple of bridge members in this STP state
+        """
+        self.index_member_state()
+        return self._states.get(state, ())
 
     @property
     def mode(self):
@@ -88,40 +148,13 @@ class MstpctlStpBridge(object):
 
         return 0
 
-    def append_member_state_from_roles(self, iface_to_add, stpinfo):
-        if stpinfo.get('role') == 'root':
-            self._member_state['root'].append(iface_to_add)
-        elif stpinfo.get('role') == 'designated':
-            self._member_state['designated'].append(iface_to_add)
-        elif stpinfo.get('role') == 'alternate':
-            self._member_state['alternate'].append(iface_to_add)
-        elif stpinfo.get('role') == 'backup':
-            self._member_state['backup'].append(iface_to_add)
-
-    def append_member_state_from_state(self, iface_to_add, stpinfo):
-        if stpinfo.get('state') == 'forwarding':
-            self._member_state['forwarding'].append(iface_to_add)
-        elif stpinfo.get('state') == 'discarding':
-            self._member_state['discarding'].append(iface_to_add)
-
-    def append_member_state_from_other_attrs(self, iface_to_add, stpinfo):
-        if stpinfo.get('oper_edge_port') == 'yes':
-            self._member_state['oper_edge_port'].append(iface_to_add)
-        elif stpinfo.get('network_port') == 'yes':
-            self._member_state['network_port'].append(iface_to_add)
-
     @property
     def member_state(self):
         """
-        :return: stp state of iface members of the bridge
+        :return: stp state of iface members of the bridge. Hash of \
+            :data:`MEMBER_STATE_KEYS` to tuples of members
         """
-        self.initialize_member_state()
-        for _ifacename, _stpinfo in self.stpdetails.get('ifaces').items():
-            _iface_to_add = self.bridge.members.get(_ifacename)
-            self.append_member_state_from_roles(_iface_to_add, _stpinfo)
-            self.append_member_state_from_state(_iface_to_add, _stpinfo)
-            self.append_member_state_from_other_attrs(_iface_to_add, _stpinfo)
-
+        self.index_member_state()
         return self._member_state
 
 
@@ -164,7 +197,7 @@ class BridgeMember(linux_bridge.BridgeMember, cumulus_iface.Iface):
         """
         if self.vlan_filtering:
             return self.common.vlan_aware_vlan_list(
-                self.name, 'vlans')
+                self.name, 'vlans', self._cache)
         else:
             return linux_bridge.BridgeMember.vlan_list.fget(self)
 
@@ -176,7 +209,7 @@ class BridgeMember(linux_bridge.BridgeMember, cumulus_iface.Iface):
         """
         if self.vlan_filtering:
             return self.common.vlan_aware_vlan_list(
-                self.name, 'untagged_vlans')
+                self.name, 'untagged_vlans', self._cache)
         else:
             return linux_bridge.BridgeMember.native_vlan.fget(self)
 
@@ -186,7 +219,6 @@ class Bridge(linux_bridge.Bridge):
     """
     def __init__(self, name, cache=None):
         linux_bridge.Bridge.__init__(self, name, cache)
-        self._vlan_filtering = False
         self.common = common
         self.bridge_class = MstpctlStpBridge
 
@@ -196,10 +228,7 @@ class Bridge(linux_bridge.Bridge):
         :return the vlan filtering setting. If set to 1 trunk config is placed
          under the physical port and can be seen using bridge vlan show command
         """
-        self._vlan_filtering = False
-        if self.common.is_vlan_aware_bridge(self.name):
-            self._vlan_filtering = True
-        return self._vlan_filtering
+        return self.common.is_vlan_aware_bridge(self.name)
 
     @property
     def stp(self):
@@ -209,7 +238,10 @@ class Bridge(linux_bridge.Bridge):
         :return: :class:`MstpctlStpBridge` instance if stp_state == 2
         """
         if self.read_from_sys('bridge/stp_state') == '2':
-            self._stp = self.bridge_class(self, self._cache)
+            # keep the snapshot, and its member index, while it is current
+            if not isinstance(self._stp, MstpctlStpBridge) or \
+                    not self._stp.is_current():
+                self._stp = self.bridge_class(self, self._cache)
             return self._stp
         return super(Bridge, self).stp
 
@@ -257,10 +289,18 @@ class MstpctlStpBridgeMember(object):
         :return: None if STP is not running the port.
         """
 
-        if self.orig_cache:
+        if getattr(self.orig_cache, 'mstpd', None) is not None:
             self._cache = self.orig_cache.mstpd.get('iface').get(self.bridgemem.name)
         else:
-            self._cache = self.mstpd.cacheinfo().get('iface').get(self.bridgemem.name)
+            # a port is a direct member of one bridge at most. Only query
+            # that bridge, not every bridge on the switch. All members of
+            # the bridge share the query
+            _bridgename = self.bridgemem.read_symlink('brport/bridge')
+            if _bridgename:
+                self._cache = self.mstpd.memoized_cacheinfo(
+                    _bridgename).get('iface').get(self.bridgemem.name)
+            else:
+                self._cache = None
         # if STP is not enabled on the interface, return state as None
         # sub interfaces
         _allbridges = set(self.bridgemem.bridge_masters.keys())
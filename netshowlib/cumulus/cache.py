@@ -16,3 +16,4 @@ class Cache(linuxCache):
         self.feature_list['counters'] = 'cumulus'
         self.feature_list['mstpd'] = 'cumulus'
         self.feature_list['asic'] = 'cumulus'
+        self.feature_list['vlan'] = 'cumulus'
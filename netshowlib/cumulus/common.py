@@ -3,8 +3,14 @@
 # pylint: disable=W0612
 """ Cumulus provider common module
 """
+import bisect
 import re
+import threading
 from netshowlib.linux import common as linux_common
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 
 def is_phy(ifacename):
@@ -17,44 +23,216 @@ def is_phy(ifacename):
     return False
 
 
+# bridge name -> True if vlan aware, read once per generation.
+# see :func:`new_generation`
+VLAN_FILTERING = {}
+# bridge port name -> name of its bridge, ``None`` if not a bridge port
+BRIDGE_OF_PORT = {}
+
+
+def new_generation():
+    """
+    forget the vlan filtering settings and bridge ports memoized by
+    :func:`is_vlan_aware_bridge` and :func:`is_vlan_aware_port`. They are
+    read from sysfs again on next lookup.
+    """
+    VLAN_FILTERING.clear()
+    BRIDGE_OF_PORT.clear()
+
+
 def is_vlan_aware_bridge(ifacename):
     """
-    used in :meth:`is_svi_initial_test`
+    used in :meth:`is_svi_initial_test`. Memoized, so all interfaces
+    share one ``bridge/vlan_filtering`` read per bridge.
+
     :params ifacename: interface name.
     :return: True if ``bridge/vlan_filtering`` exists and is set to 1
     """
-    _vlanfiltering = linux_common.read_from_sys('bridge/vlan_filtering',
-                                                ifacename)
-    if _vlanfiltering and _vlanfiltering == "1":
-        return True
-    return False
+    if ifacename not in VLAN_FILTERING:
+        _vlanfiltering = linux_common.read_from_sys('bridge/vlan_filtering',
+                                                    ifacename)
+        VLAN_FILTERING[ifacename] = _vlanfiltering == "1"
+    return VLAN_FILTERING[ifacename]
+
+
+def is_vlan_aware_port(ifacename):
+    """
+    :params ifacename: interface name.
+    :return: True if the interface is a port of a vlan aware bridge
+    """
+    if ifacename not in BRIDGE_OF_PORT:
+        BRIDGE_OF_PORT[ifacename] = linux_common.read_symlink(
+            linux_common.sys_path('brport/bridge', ifacename))
+    _bridgename = BRIDGE_OF_PORT[ifacename]
+    if _bridgename is None:
+        return False
+    return is_vlan_aware_bridge(_bridgename)
 
 
-def vlan_aware_vlan_list(ifacename, type_of_vlan):
+class VlanRanges(list):
+    """
+    vlans of a vlan aware port as a list of ranges, like
+    ``['1-10', '20', '4092']``. Same list ``create_range`` makes, so printers
+    and the JSON encoder use it as is.
+
+    * ``intervals``: sorted list of (start, end) vlan id tuples
+    * ``vlan in ranges`` works with vlan ids as int or str
+    """
+    def __init__(self, intervals=None):
+        self.intervals = list(intervals or [])
+        # interval starts, for bisect
+        self._starts = [x for x, y in self.intervals]
+        list.__init__(self, [str(x) if x == y else '%s-%s' % (x, y)
+                             for x, y in self.intervals])
+
+    def __contains__(self, vlan):
+        try:
+            vlan = int(vlan)
+        except (TypeError, ValueError):
+            return list.__contains__(self, vlan)
+        _idx = bisect.bisect_right(self._starts, vlan) - 1
+        return _idx >= 0 and vlan <= self.intervals[_idx][1]
+
+    def vlans(self):
+        """
+        :return: generator of all vlan ids, in order
+        """
+        for _start, _end in self.intervals:
+            for _vlan in range(_start, _end + 1):
+                yield _vlan
+
+
+def bitmap_to_intervals(bitmap):
+    """
+    :param bitmap: vlan bitmap as an int. Bit N is set if vlan N is on
+    :return: sorted list of (start, end) tuples of the runs of set bits
+    """
+    intervals = []
+    while bitmap:
+        # lowest set bit starts a run. the lowest clear bit above it ends it
+        _start = (bitmap & -bitmap).bit_length() - 1
+        _run = bitmap >> _start
+        _length = (~_run & (_run + 1)).bit_length() - 1
+        intervals.append((_start, _start + _length - 1))
+        bitmap = (_run >> _length) << (_start + _length)
+    return intervals
+
+
+def vlan_bitmap_words(ifacename, type_of_vlan):
     """
     :param type_of_vlan:  can be 'untagged_vlans' or 'vlans'
-    :return: list of vlans supported on vlan aware physical/bond port
+    :return: generator of the 32 bit words of the vlan bitmap of a vlan \
+        aware port, lowest vlans first. Words are parsed as they are used
     """
-    vlan_list = []
     attr_value = "brport/%s" % (type_of_vlan)
     bitmap_array = linux_common.read_from_sys(attr_value,
                                               ifacename, oneline=False)
-    if bitmap_array:
-        vlanid = 0
-        for bit32entry in bitmap_array:
-            hex32entry = re.sub('0x', '', bit32entry).strip()
-            # convert hex entry to binary entry. Obtained from
-            # Stackoverflow
-            scale = 16
-            num_of_bits = 32
-            # converts hex string into binary string
-            mod32bit = bin(int(hex32entry, scale))[2:].zfill(num_of_bits)
-            # loop over the reverse of `range(32)` since vlans are listed
-            # from left to right
-            for i in reversed(range(32)):
-                # If vlan bit is set to one, add it to the vlan list
-                if mod32bit[i] == '1':
-                    vlan_list.append(str(vlanid))
-                # increment vlan after from the list when check is done
-                vlanid += 1
-    return vlan_list
+    # one 32 bit hex word per line
+    for bit32entry in bitmap_array or []:
+        bit32entry = bit32entry.strip()
+        if bit32entry:
+            yield int(bit32entry, 16)
+
+
+def cached_vlan_bitmaps(ifacename, cache=None):
+    """
+    :param cache: feature cache
+    :return: hash of 'vlans' and 'untagged_vlans' bitmaps of a vlan aware \
+        port, from the ``vlan`` feature cache. ``None`` if not cached
+    """
+    _vlan = getattr(cache, 'vlan', None)
+    if _vlan is None:
+        return None
+    return _vlan.bitmaps.get(ifacename)
+
+
+def vlan_aware_vlan_count(ifacename, type_of_vlan, limit=None, cache=None):
+    """
+    count set bits in the vlan bitmap, without decoding the vlans
+
+    :param type_of_vlan:  can be 'untagged_vlans' or 'vlans'
+    :param limit: stop counting once this many vlans are found
+    :param cache: feature cache. Its vlan bitmaps are used if it has them
+    :return: number of vlans on a vlan aware port, at most ``limit``
+    """
+    _bitmaps = cached_vlan_bitmaps(ifacename, cache)
+    if _bitmaps is not None:
+        _count = bin(_bitmaps.get(type_of_vlan)).count('1')
+        if limit:
+            return min(_count, limit)
+        return _count
+    _count = 0
+    for _word in vlan_bitmap_words(ifacename, type_of_vlan):
+        _count += bin(_word).count('1')
+        if limit and _count >= limit:
+            return limit
+    return _count
+
+
+def vlan_aware_vlan_bitmap(ifacename, type_of_vlan, cache=None):
+    """
+    :param type_of_vlan:  can be 'untagged_vlans' or 'vlans'
+    :param cache: feature cache. Its vlan bitmaps are used if it has them
+    :return: vlan bitmap of a vlan aware port as an int. \
+        Bit N is set if vlan N is on the port
+    """
+    _bitmaps = cached_vlan_bitmaps(ifacename, cache)
+    if _bitmaps is not None:
+        return _bitmaps.get(type_of_vlan)
+    _bitmap = 0
+    for _idx, _word in enumerate(vlan_bitmap_words(ifacename, type_of_vlan)):
+        _bitmap |= _word << (32 * _idx)
+    return _bitmap
+
+
+def vlan_aware_vlan_list(ifacename, type_of_vlan, cache=None):
+    """
+    :param type_of_vlan:  can be 'untagged_vlans' or 'vlans'
+    :param cache: feature cache. Its vlan bitmaps are used if it has them
+    :return: :class:`VlanRanges` of vlans supported on vlan aware \
+        physical/bond port
+    """
+    return VlanRanges(bitmap_to_intervals(
+        vlan_aware_vlan_bitmap(ifacename, type_of_vlan, cache)))
+
+
+def parallel_map(func, items, workers):
+    """
+    run ``func`` against each entry in ``items`` using a bounded pool of
+    worker threads. Used to overlap the wait on external commands like
+    ``ethtool`` so that a large switch does not pay for each fork one at a time.
+
+    :param func: function that takes a single item. It is expected to \
+        handle its own errors
+    :param items: list of items to process
+    :param workers: maximum number of threads to run at the same time
+    :return: hash of item -> result of ``func(item)``
+    """
+    results = {}
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        for _item in items:
+            results[_item] = func(_item)
+        return results
+
+    work_queue = queue.Queue()
+    for _item in items:
+        work_queue.put(_item)
+
+    def _worker():
+        while True:
+            try:
+                _item = work_queue.get_nowait()
+            except queue.Empty:
+                return
+            results[_item] = func(_item)
+
+    threads = []
+    for _ in range(min(workers, len(items))):
+        _thread = threading.Thread(target=_worker)
+        _thread.daemon = True
+        _thread.start()
+        threads.append(_thread)
+    for _thread in threads:
+        _thread.join()
+    return results
@@ -0,0 +1,116 @@
+"""
+Module for saving and loading counter baselines.
+A baseline is a snapshot of the counters of all ports, kept in a fixed
+record file under /run so netshow can show how much counters went up since
+the snapshot, without clearing the hardware counters.
+"""
+import io
+import mmap
+import os
+import re
+import struct
+import time
+
+
+BASELINE_DIR = '/run/netshow'
+LAST_BASELINE = 'last'
+
+# header: magic, version, number of records, time the baseline was taken
+HEADER_FMT = '<4sIId'
+HEADER_MAGIC = b'NSCB'
+HEADER_VERSION = 1
+# record: port name, then rx and tx counters in COUNTER_NAMES order
+RECORD_FMT = '<16s8Q'
+COUNTER_NAMES = ['unicast', 'broadcast', 'multicast', 'errors']
+
+
+def baseline_path(name):
+    """
+    :return: location of the named baseline file
+    """
+    if not re.match(r'[\w.-]+$', name):
+        raise ValueError("invalid baseline name '%s'" % (name))
+    return os.path.join(BASELINE_DIR, 'counters-%s.bin' % (name))
+
+
+def save(name, counters_cache, timestamp=None):
+    """
+    write all port counters to the named baseline with a single write. \
+    The file is replaced atomically so readers never see half a baseline.
+
+    :param counters_cache: counters hash from :meth:`counters.cacheinfo`
+    :return: True if the baseline was saved
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    _ports = sorted([x for x, y in counters_cache.items() if y.get('rx')])
+    _data = [struct.pack(HEADER_FMT, HEADER_MAGIC, HEADER_VERSION,
+                         len(_ports), timestamp)]
+    for _port in _ports:
+        _values = []
+        for _dir in ('rx', 'tx'):
+            _dir_counters = counters_cache[_port].get(_dir) or {}
+            _values += [int(_dir_counters.get(x) or 0) for x in COUNTER_NAMES]
+        _data.append(struct.pack(RECORD_FMT, _port.encode('utf-8'), *_values))
+
+    _path = baseline_path(name)
+    _tmp_path = "%s.%s" % (_path, os.getpid())
+    try:
+        if not os.path.isdir(BASELINE_DIR):
+            os.makedirs(BASELINE_DIR)
+        with io.open(_tmp_path, 'wb') as _file:
+            _file.write(b''.join(_data))
+        os.rename(_tmp_path, _path)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def load(name):
+    """
+    read the named baseline using mmap.
+
+    :return: tuple of (time baseline was taken, counters hash with the \
+        same format as :meth:`counters.cacheinfo`)
+    :return: (None, None) if the baseline does not exist or is not valid
+    """
+    try:
+        _file = io.open(baseline_path(name), 'rb')
+    except (IOError, OSError):
+        return (None, None)
+    with _file:
+        try:
+            _map = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            # empty file
+            return (None, None)
+        try:
+            return _parse(_map)
+        finally:
+            _map.close()
+
+
+def _parse(buf):
+    """
+    :return: tuple of (timestamp, counters hash) from the baseline contents
+    """
+    _header_len = struct.calcsize(HEADER_FMT)
+    _record_len = struct.calcsize(RECORD_FMT)
+    if len(buf) < _header_len:
+        return (None, None)
+    (_magic, _version, _count, _timestamp) = struct.unpack_from(
+        HEADER_FMT, buf, 0)
+    if _magic != HEADER_MAGIC or _version != HEADER_VERSION or \
+            len(buf) < _header_len + _count * _record_len:
+        return (None, None)
+    counters_hash = {}
+    _counter_count = len(COUNTER_NAMES)
+    for i in range(_count):
+        _record = struct.unpack_from(RECORD_FMT, buf,
+                                     _header_len + i * _record_len)
+        _port = _record[0].split(b'\0', 1)[0].decode('utf-8')
+        counters_hash[_port] = {
+            'rx': dict(zip(COUNTER_NAMES, _record[1:1 + _counter_count])),
+            'tx': dict(zip(COUNTER_NAMES, _record[1 + _counter_count:]))
+        }
+    return (_timestamp, counters_hash)
@@ -4,16 +4,118 @@
 Module responsible for printing countes for the cumulus provider
 """
 from netshowlib.cumulus import common
+from netshowlib.cumulus import ethtool
 from netshowlib.linux import common as linux_common
+from collections import OrderedDict
 import os
 import io
 
 
-def get_ethtool_output(ifacename):
+# number of ethtool commands that can run at the same time
+COUNTER_WORKERS = 8
+# seconds an ethtool command is allowed to run before it is killed
+ETHTOOL_TIMEOUT = 5
+
+PROC_NET_DEV = '/proc/net/dev'
+
+# maps lowercase ethtool statistic names to their place in the counters hash
+HWIF_COUNTERS = {
+    'hwifinucastpkts': ('rx', 'unicast'),
+    'hwifinbcastpkts': ('rx', 'broadcast'),
+    'hwifinmcastpkts': ('rx', 'multicast'),
+    'hwifinerrors': ('rx', 'errors'),
+    'hwifoutucastpkts': ('tx', 'unicast'),
+    'hwifoutbcastpkts': ('tx', 'broadcast'),
+    'hwifoutmcastpkts': ('tx', 'multicast'),
+    'hwifouterrors': ('tx', 'errors')
+}
+
+# named groups of extra ethtool statistics. Each entry is
+# (lowercase ethtool statistic name, direction, counter name).
+# Counter names are listed in the order they are displayed.
+COUNTER_GROUPS = OrderedDict([
+    ('octets', [
+        ('hwifinoctets', 'rx', 'octets'),
+        ('hwifoutoctets', 'tx', 'octets')]),
+    ('drops', [
+        ('hwifindiscards', 'rx', 'discards'),
+        ('hwifinl3drops', 'rx', 'l3_drops'),
+        ('hwifinbufferdrops', 'rx', 'buffer_drops'),
+        ('hwifinacldrops', 'rx', 'acl_drops'),
+        ('hwifindot3lengtherrors', 'rx', 'length_errors'),
+        ('hwifindot3frameerrors', 'rx', 'frame_errors'),
+        ('softindrops', 'rx', 'soft_drops'),
+        ('softinframeerrors', 'rx', 'soft_frame_errors'),
+        ('hwifoutdiscards', 'tx', 'discards'),
+        ('hwifoutqdrops', 'tx', 'queue_drops'),
+        ('hwifoutnonqdrops', 'tx', 'non_queue_drops'),
+        ('softoutdrops', 'tx', 'soft_drops'),
+        ('softouttxfifofull', 'tx', 'tx_fifo_full')]),
+    ('pfc', [('hwifinpausepkt', 'rx', 'pause'),
+             ('hwifoutpausepkt', 'tx', 'pause')] +
+     [('hwifinpfc%dpkt' % (x), 'rx', 'pfc%d' % (x)) for x in range(8)] +
+     [('hwifoutpfc%dpkt' % (x), 'tx', 'pfc%d' % (x)) for x in range(8)])
+])
+
+# statistic name -> slot lookup tables, one per combination of groups
+LOOKUP_TABLES = {}
+
+# counters snapshot generation. Counters objects read their counters once
+# per generation, see :meth:`new_generation`
+GENERATION = 0
+
+
+def new_generation():
+    """
+    make all :class:`Counters` objects read their counters again the next
+    time they are used. Counters read in the same generation are consistent
+    with each other.
+
+    :return: the new generation number
+    """
+    global GENERATION
+    GENERATION += 1
+    return GENERATION
+
+
+def lookup_table(groups=None):
+    """
+    :param groups: list of :data:`COUNTER_GROUPS` names to collect \
+        on top of the default counters
+    :return: hash of lowercase ethtool statistic name -> (direction, counter)
+    """
+    _key = tuple(sorted(set(groups or [])))
+    _table = LOOKUP_TABLES.get(_key)
+    if _table is None:
+        _table = dict(HWIF_COUNTERS)
+        for _group in _key:
+            if _group not in COUNTER_GROUPS:
+                raise ValueError("unknown counter group '%s'" % (_group))
+            for _statname, _dir, _counter in COUNTER_GROUPS[_group]:
+                _table[_statname] = (_dir, _counter)
+        LOOKUP_TABLES[_key] = _table
+    return _table
+
+
+def group_counter_names(group):
+    """
+    :return: tuple of (rx counter names, tx counter names) of the named \
+        group in display order
+    """
+    _names = {'rx': [], 'tx': []}
+    for _, _dir, _counter in COUNTER_GROUPS[group]:
+        _names[_dir].append(_counter)
+    return (_names['rx'], _names['tx'])
+
+
+def get_ethtool_output(ifacename, timeout=None):
     """
+    :param timeout: if set, ethtool is killed after this many seconds
     :return: ethtool output method used by cumulus provider to get ethtool output of a single interface.
     """
     cmd = '/sbin/ethtool -S %s' % (ifacename)
+    if timeout:
+        cmd = '/usr/bin/timeout -s KILL %s %s' % (timeout, cmd)
     try:
         ethtool_output = linux_common.exec_command(cmd)
     except linux_common.ExecCommandException:
@@ -21,37 +123,122 @@ def get_ethtool_output(ifacename):
     return ethtool_output
 
 
-def get_physical_port_counters(ethtool_output):
+def get_physical_port_counters(ethtool_output, groups=None):
     """
     :param: array of ethtool output of a specific interface.
+    :param groups: list of :data:`COUNTER_GROUPS` names to collect \
+        on top of the default counters
     :return: hash of broadcast, unicast, multicast and
     error counters of a specific interface
     """
     counters_hash = {'tx': {}, 'rx': {}}
+    _table = lookup_table(groups)
     fileio = io.StringIO(ethtool_output)
     for line in fileio:
-        if len(line.strip()) <= 0:
+        (_name, _sep, _value) = line.partition(':')
+        if not _sep:
             continue
-        # make all char lowercase
-        line = line.lower()
-        splitline = line.split()
-        rx_tx_hash = {'in': 'rx',
-                      'out': 'tx'}
-        for _dir, _pkt_dir in rx_tx_hash.items():
-            if splitline[0] == 'hwif' + _dir + 'ucastpkts:':
-                counters_hash[_pkt_dir]['unicast'] = int(splitline[1])
-            elif splitline[0] == 'hwif' + _dir + 'bcastpkts:':
-                counters_hash[_pkt_dir]['broadcast'] = int(splitline[1])
-            elif splitline[0] == 'hwif' + _dir + 'mcastpkts:':
-                counters_hash[_pkt_dir]['multicast'] = int(splitline[1])
-            elif splitline[0] == 'hwif' + _dir + 'errors:':
-                counters_hash[_pkt_dir]['errors'] = int(splitline[1])
-                break
+        _loc = _table.get(_name.strip().lower())
+        if _loc:
+            counters_hash[_loc[0]][_loc[1]] = int(_value)
+    return counters_hash
+
+
+def stats_to_counters(stats, groups=None):
+    """
+    :param stats: hash of ethtool statistic name -> value, as returned by \
+        :meth:`ethtool.get_stats`
+    :param groups: list of :data:`COUNTER_GROUPS` names to collect \
+        on top of the default counters
+    :return: hash of broadcast, unicast, multicast and
+    error counters of a specific interface
+    """
+    counters_hash = {'tx': {}, 'rx': {}}
+    _table = lookup_table(groups)
+    for _name, _value in stats.items():
+        _loc = _table.get(_name.lower())
+        if _loc:
+            counters_hash[_loc[0]][_loc[1]] = _value
     return counters_hash
 
 
-def cacheinfo(ifacename=None):
+def get_port_counters(ifacename, sock=None, timeout=None, groups=None):
+    """
+    read the counters using the ethtool ioctl. If the ioctl is not permitted \
+    fall back to parsing ``ethtool -S`` output.
+
+    :param sock: socket to use for the ethtool ioctl
+    :param timeout: seconds ``ethtool -S`` is allowed to run
+    :param groups: list of :data:`COUNTER_GROUPS` names to collect \
+        on top of the default counters
+    :return: hash of broadcast, unicast, multicast and
+    error counters of a specific interface
     """
+    if sock:
+        try:
+            return stats_to_counters(ethtool.get_stats(ifacename, sock),
+                                     groups)
+        except ethtool.EthtoolException:
+            pass
+    return get_physical_port_counters(
+        get_ethtool_output(ifacename, timeout), groups)
+
+
+def get_kernel_counters(ifacename=None):
+    """
+    get counters kept by the kernel for all physical ports from a single read
+    of ``/proc/net/dev``. Works on Cumulus VX and for non root users, \
+    where ethtool does not.
+    The kernel only keeps rx multicast, so tx multicast is 0
+    and broadcast packets are counted as unicast.
+
+    :param ifacename: only return counters for this interface
+    :return: hash with the same format as :meth:`cacheinfo`
+    """
+    counters_hash = {}
+    try:
+        proc_net_dev = io.open(PROC_NET_DEV).read()
+    except IOError:
+        return counters_hash
+
+    for line in io.StringIO(proc_net_dev):
+        if ':' not in line:
+            continue
+        (_iface, _stats) = line.split(':', 1)
+        _iface = _iface.strip()
+        if ifacename and _iface != ifacename:
+            continue
+        if not ifacename and not common.is_phy(_iface):
+            continue
+        _stats = [int(x) for x in _stats.split()]
+        # rx: bytes packets errs drop fifo frame compressed multicast
+        # tx: bytes packets errs drop fifo colls carrier compressed
+        counters_hash[_iface] = {
+            'rx': {'unicast': _stats[1] - _stats[7],
+                   'broadcast': 0,
+                   'multicast': _stats[7],
+                   'errors': _stats[2]},
+            'tx': {'unicast': _stats[9],
+                   'broadcast': 0,
+                   'multicast': 0,
+                   'errors': _stats[10]}
+        }
+    return counters_hash
+
+
+def cacheinfo(ifacename=None, workers=COUNTER_WORKERS,
+              timeout=ETHTOOL_TIMEOUT, kernel_only=False, groups=None):
+    """
+    Ports where hardware counters cannot be read get the counters kept
+    by the kernel, see :meth:`get_kernel_counters`.
+
+    :param workers: max number of ethtool commands to run at the same time
+    :param timeout: seconds each ethtool command is allowed to run when \
+        collecting counters for all ports
+    :param kernel_only: only read counters kept by the kernel. Cheap \
+        enough to run every second
+    :param groups: list of :data:`COUNTER_GROUPS` names to collect \
+        on top of the default counters. Only these statistics are kept
     :return: hash of following format
        ```
           {'swp1': {
@@ -71,23 +258,106 @@ def cacheinfo(ifacename=None):
           }
        ```
     """
+    if kernel_only:
+        return get_kernel_counters(ifacename)
+
     counters_hash = {}
+    try:
+        _sock = ethtool.ethtool_socket()
+    except ethtool.EthtoolException:
+        _sock = None
+
     if ifacename:
-        counters_hash[ifacename] = get_physical_port_counters(
-            get_ethtool_output(ifacename))
-        return counters_hash
+        counters_hash[ifacename] = get_port_counters(ifacename, _sock,
+                                                     groups=groups)
+    else:
+        def _port_counters(_iface):
+            return get_port_counters(_iface, _sock, timeout, groups)
 
-    for _iface in os.listdir(linux_common.SYS_PATH_ROOT):
-        if common.is_phy(_iface):
-            counters_hash[_iface] = get_physical_port_counters(
-                get_ethtool_output(_iface))
+        _phy_ports = [x for x in os.listdir(linux_common.SYS_PATH_ROOT)
+                      if common.is_phy(x)]
+        # ioctl reads are cheap. The pool matters when falling back to ethtool
+        counters_hash.update(common.parallel_map(_port_counters,
+                                                 _phy_ports, workers))
+    if _sock:
+        _sock.close()
 
+    _no_hw_counters = [x for x, y in counters_hash.items() if not y.get('rx')]
+    if _no_hw_counters:
+        _kernel_counters = get_kernel_counters(ifacename)
+        for _iface in _no_hw_counters:
+            if _iface in _kernel_counters:
+                counters_hash[_iface] = _kernel_counters[_iface]
     return counters_hash
 
 
+def counter_delta(old, new):
+    """
+    difference between 2 readings of the same counter.
+    If the counter went down it either wrapped or was cleared.
+    A counter that was in the top half of its 32 or 64 bit range is taken as
+    wrapped, otherwise it was cleared and the new value is the delta.
+
+    :return: how much the counter went up between the 2 readings
+    """
+    if new >= old:
+        return new - old
+    for _width in (32, 64):
+        if old < 2 ** _width:
+            if old >= 2 ** (_width - 1):
+                return 2 ** _width - old + new
+            break
+    return new
+
+
+def counter_deltas(old_cache, new_cache):
+    """
+    :param old_cache: counters hash from :meth:`cacheinfo`
+    :param new_cache: counters hash from :meth:`cacheinfo` taken after \
+        ``old_cache``
+    :return: hash with the same format as :meth:`cacheinfo` with how much \
+        each counter went up. Counters missing from ``old_cache`` are taken as 0
+    """
+    deltas_hash = {}
+    for _iface, _new in new_cache.items():
+        _old = old_cache.get(_iface) or {}
+        deltas_hash[_iface] = {}
+        for _dir in ('tx', 'rx'):
+            _old_dir = _old.get(_dir) or {}
+            deltas_hash[_iface][_dir] = {}
+            for _name, _value in (_new.get(_dir) or {}).items():
+                deltas_hash[_iface][_dir][_name] = counter_delta(
+                    _old_dir.get(_name, 0), _value)
+    return deltas_hash
+
+
+def counter_rates(old_cache, new_cache, interval):
+    """
+    :param old_cache: counters hash from :meth:`cacheinfo`
+    :param new_cache: counters hash from :meth:`cacheinfo` taken \
+        ``interval`` seconds after ``old_cache``
+    :param interval: seconds between the 2 snapshots
+    :return: hash with the same format as :meth:`cacheinfo` but with \
+        packets/errors per second. Ports missing from either snapshot are skipped
+    """
+    rates_hash = {}
+    _deltas = counter_deltas(old_cache, new_cache)
+    for _iface, _delta in _deltas.items():
+        if not old_cache.get(_iface):
+            continue
+        rates_hash[_iface] = {}
+        for _dir, _dir_delta in _delta.items():
+            rates_hash[_iface][_dir] = dict(
+                [(x, round(y / float(interval), 1))
+                 for x, y in _dir_delta.items()])
+    return rates_hash
+
+
 class Counters(object):
     """
-    class responsible for printing counters for the cumulus provider
+    class responsible for printing counters for the cumulus provider.
+    Counters are read once per snapshot generation, so all properties show
+    numbers from the same snapshot. Use :meth:`refresh` to take a new one.
     """
     def __init__(self, name, cache=None):
         self.tx = {
@@ -107,19 +377,35 @@ class Counters(object):
             self._cache = cache.counters
         else:
             self._cache = None
+        # True if the counters were read by this object, not a feature cache
+        self._own_snapshot = False
+        self.generation = None
 
     def run(self):
         """
         ``run()`` function for this feature updates the cache .
+        Does nothing if counters were already read in this generation.
         """
-        if not self._cache:
+        if self.generation == GENERATION:
+            return
+        self.generation = GENERATION
+        if not self._cache or self._own_snapshot:
             self._cache = cacheinfo(self.name)
+            self._own_snapshot = True
 
         counter_cache = self._cache.get(self.name)
         if counter_cache:
             self.tx = counter_cache.get('tx')
             self.rx = counter_cache.get('rx')
 
+    def refresh(self):
+        """
+        take a new snapshot. Counters from a feature cache are read again
+        from the feature cache, so the owner of the cache must update it first.
+        """
+        self.generation = None
+        self.run()
+
     @property
     def total_tx(self):
         """
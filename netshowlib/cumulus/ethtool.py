@@ -0,0 +1,163 @@
+"""
+Module for reading port statistics using the SIOCETHTOOL ioctl.
+Same information as ``ethtool -S`` but without forking a process per port.
+"""
+import array
+import fcntl
+import socket
+import struct
+
+
+SIOCETHTOOL = 0x8946
+ETHTOOL_GDRVINFO = 0x00000003
+ETHTOOL_GSTRINGS = 0x0000001b
+ETHTOOL_GSTATS = 0x0000001d
+ETHTOOL_GSSET_INFO = 0x00000037
+ETH_SS_STATS = 1
+ETH_GSTRING_LEN = 32
+IFNAMSIZ = 16
+
+# struct ethtool_drvinfo is 196 bytes. driver name is at offset 4
+DRVINFO_LEN = 196
+# struct ifreq is 40 bytes on 64 bit systems, 32 on 32 bit systems
+IFREQ_LEN = 40
+
+# stats string names, cached per (driver, number of stats)
+STRINGS_CACHE = {}
+# stats string names, cached per port, so repeat reads of a port
+# only need the GSTATS ioctl
+PORT_STRINGS_CACHE = {}
+
+
+class EthtoolException(Exception):
+    """
+    Exception when the ethtool ioctl fails. Example, the ioctl
+    is not permitted or the driver does not support it.
+    """
+    pass
+
+
+def ethtool_socket():
+    """
+    :return: socket used to send the ethtool ioctl.
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    except (IOError, OSError) as _err:
+        raise EthtoolException(str(_err))
+
+
+def _ioctl(sock, ifacename, buf):
+    """
+    run the ethtool ioctl. ``buf`` is updated in place by the kernel.
+    """
+    _ifreq = struct.pack('%dsP' % IFNAMSIZ,
+                         ifacename.encode('utf-8'),
+                         buf.buffer_info()[0])
+    _ifreq += b'\0' * (IFREQ_LEN - len(_ifreq))
+    try:
+        fcntl.ioctl(sock.fileno(), SIOCETHTOOL, _ifreq)
+    except (IOError, OSError) as _err:
+        raise EthtoolException("%s: %s" % (ifacename, _err))
+
+
+def _new_buffer(size, header):
+    """
+    :return: zeroed buffer of ``size`` bytes, starting with ``header``
+    """
+    buf = array.array('B', b'\0' * size)
+    for _idx, _byte in enumerate(bytearray(header)):
+        buf[_idx] = _byte
+    return buf
+
+
+def driver_name(sock, ifacename):
+    """
+    :return: name of the driver for the named interface
+    """
+    buf = _new_buffer(DRVINFO_LEN, struct.pack('I', ETHTOOL_GDRVINFO))
+    _ioctl(sock, ifacename, buf)
+    return _c_string(buf[4:36])
+
+
+def stats_count(sock, ifacename):
+    """
+    :return: number of statistics the driver reports for the interface
+    """
+    buf = _new_buffer(24, struct.pack('IIQ', ETHTOOL_GSSET_INFO, 0,
+                                      1 << ETH_SS_STATS))
+    _ioctl(sock, ifacename, buf)
+    (_mask,) = struct.unpack('Q', _to_bytes(buf[8:16]))
+    if not _mask & (1 << ETH_SS_STATS):
+        return 0
+    return struct.unpack('I', _to_bytes(buf[16:20]))[0]
+
+
+def stats_names(sock, ifacename):
+    """
+    :return: list of statistic names. Only fetched once for each driver. \
+        Driver and stats count are only read once for each port
+    """
+    _names = PORT_STRINGS_CACHE.get(ifacename)
+    if _names is not None:
+        return _names
+    _count = stats_count(sock, ifacename)
+    _key = (driver_name(sock, ifacename), _count)
+    _names = STRINGS_CACHE.get(_key)
+    if _names is not None:
+        PORT_STRINGS_CACHE[ifacename] = _names
+        return _names
+    buf = _new_buffer(12 + _count * ETH_GSTRING_LEN,
+                      struct.pack('III', ETHTOOL_GSTRINGS, ETH_SS_STATS,
+                                  _count))
+    _ioctl(sock, ifacename, buf)
+    _names = []
+    for i in range(_count):
+        _start = 12 + i * ETH_GSTRING_LEN
+        _names.append(_c_string(buf[_start:_start + ETH_GSTRING_LEN]))
+    STRINGS_CACHE[_key] = _names
+    PORT_STRINGS_CACHE[ifacename] = _names
+    return _names
+
+
+def get_stats(ifacename, sock=None):
+    """
+    :param sock: socket to use for the ioctl. One is created and closed \
+        if not given
+    :return: hash of statistic name -> value. Same as ``ethtool -S``
+    """
+    _own_sock = sock is None
+    if _own_sock:
+        sock = ethtool_socket()
+    try:
+        _names = stats_names(sock, ifacename)
+        _count = len(_names)
+        buf = _new_buffer(8 + _count * 8,
+                          struct.pack('II', ETHTOOL_GSTATS, _count))
+        _ioctl(sock, ifacename, buf)
+    finally:
+        if _own_sock:
+            sock.close()
+    (_n_stats,) = struct.unpack('I', _to_bytes(buf[4:8]))
+    if _n_stats != _count:
+        # port was recreated with another driver. read its names again
+        PORT_STRINGS_CACHE.pop(ifacename, None)
+        raise EthtoolException("%s: stats count changed" % (ifacename))
+    _values = struct.unpack('%dQ' % _count, _to_bytes(buf[8:]))
+    return dict(zip(_names, _values))
+
+
+def _to_bytes(buf):
+    """
+    :return: byte string of array slice. works on py2 and py3
+    """
+    if hasattr(buf, 'tobytes'):
+        return buf.tobytes()
+    return buf.tostring()
+
+
+def _c_string(buf):
+    """
+    :return: null terminated string in array slice as a str
+    """
+    return _to_bytes(buf).split(b'\0', 1)[0].decode('utf-8')
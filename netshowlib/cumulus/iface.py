@@ -69,7 +69,9 @@ class Iface(linux_iface.Iface):
         """
         _bridgemem_type = 0
         if self.vlan_filtering:
-            if len(self.common.vlan_aware_vlan_list(self.name, 'vlans')) > 1:
+            # a trunk has more than one vlan. stop counting at the 2nd one
+            if self.common.vlan_aware_vlan_count(self.name, 'vlans', limit=2,
+                                                 cache=self._cache) > 1:
                 _bridgemem_type = 2
             else:
                 _bridgemem_type = 1
@@ -92,11 +94,7 @@ class Iface(linux_iface.Iface):
         """
         if not self.is_subint():
             return False
-        parent_ifacename = self.name.split('.')[0]
-        parent_iface = self.iface_class(parent_ifacename)
-        if self.common.is_vlan_aware_bridge(parent_iface.name):
-            return True
-        return False
+        return self.common.is_vlan_aware_bridge(self.name.split('.')[0])
 
 
     def is_svi_initial_test(self):
@@ -222,15 +220,32 @@ class Iface(linux_iface.Iface):
         if self._counters is None:
             self._counters = counters.Counters(name=self.name,
                                                cache=self._cache)
-        # check counters each time this property is called
+        # only reads counters once per snapshot generation
         self._counters.run()
         return self._counters
 
+    @property
+    def vlan_count(self):
+        """
+        :return: number of vlans on a vlan aware port, counted from the \
+            vlan bitmap without decoding it. 0 if port is not vlan aware
+        """
+        return self.common.vlan_aware_vlan_count(self.name, 'vlans',
+                                                 cache=self._cache)
+
+    @property
+    def native_vlan_count(self):
+        """
+        :return: number of untagged vlans on a vlan aware port. \
+            0 if port is not vlan aware
+        """
+        return self.common.vlan_aware_vlan_count(self.name, 'untagged_vlans',
+                                                 cache=self._cache)
+
     @property
     def vlan_filtering(self):
         """
-        :return: Determines if port is vlan aware or not
+        :return: Determines if port is vlan aware or not, from the vlan \
+            filtering setting of its bridge
         """
-        if self.read_from_sys('brport/vlans'):
-            return True
-        return False
+        return self.common.is_vlan_aware_port(self.name)
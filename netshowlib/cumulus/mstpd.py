@@ -3,146 +3,567 @@ module for mstpd functions
 """
 from netshowlib.linux import common as linux_common
 import io
+import os
 import re
+import socket
+import struct
 
 
-def cacheinfo():
-    _mstpdcache = MstpdInfo()
-    return _mstpdcache.run()
+# column where the 2nd attribute starts on bridge and port attribute lines
+BRIDGE_COL_AT = 26
+IFACE_COL_AT = 45
+# lines longer than this have 2 attributes
+TWO_COL_LEN = 45
+PARENS_RE = re.compile(r'\(.*\)')
 
+# mstpd control socket. Abstract unix datagram socket, same one
+# mstpctl uses. Layouts follow mstpd ctl_socket.h and ctl_functions.h
+MSTPD_SOCKET = '\0.mstp_server'
+MSTPD_TIMEOUT = 0.5
+# struct ctl_msg_hdr: cmd, lin, lout, llog, res
+CTL_HEADER = struct.Struct('@5i')
+LOG_STRING_LEN = 256
+IFNAMSIZ = 16
+CMD_GET_CIST_BRIDGE_STATUS = 101
+CMD_GET_CIST_PORT_STATUS = 105
+# bridge and port enum values as printed by mstpctl
+PORT_STATES = {0: 'disabled', 1: 'listening', 2: 'learning',
+               3: 'forwarding', 4: 'discarding'}
+PORT_ROLES = {0: 'disabled', 1: 'root', 2: 'designated', 3: 'alternate',
+              4: 'backup', 5: 'master'}
+PROTOCOL_VERSIONS = {0: 'stp', 2: 'rstp', 3: 'mstp'}
+ADMIN_P2P = {0: 'auto', 1: 'yes', 2: 'no'}
 
-class MstpdInfo(object):
 
-    def __init__(self):
-        self.is_bridge_info = None
-        self.newbridgename = None
-        self.bridgename = None
-        self.iface = None
-        self.bridge_loc = None
-        self.textio = None
-        self.bridgehash = {'bridge': {}, 'iface': {}}
+def _bridge_id(value):
+    """
+    :return: bridge id in mstpctl format. Example: 8.000.00:02:00:00:00:0f
+    """
+    _bytes = bytearray(struct.pack('@Q', value))
+    _prio = (_bytes[0] << 8) + _bytes[1]
+    return '%x.%03x.%s' % (_prio >> 12, _prio & 0xfff,
+                           ':'.join(['%02x' % x for x in _bytes[2:]]))
 
-    @property
-    def mstpctl_output(self):
+
+def _port_id(value):
+    """
+    :return: port id in mstpctl format. Example: 8.001
+    """
+    _bytes = bytearray(struct.pack('@H', value))
+    _portid = (_bytes[0] << 8) + _bytes[1]
+    return '%x.%03x' % (_portid >> 12, _portid & 0xfff)
+
+
+def _yes_no(value):
+    return 'yes' if value else 'no'
+
+
+def _ifname(value):
+    return value.split(b'\0')[0].decode('utf-8')
+
+
+def _seconds(value):
+    return '%ss' % (value)
+
+
+def _enum(names):
+    return lambda value: names.get(value, str(value))
+
+
+# (bridgehash key, struct format, decoder). Fields with no key are skipped
+BRIDGE_STATUS_FIELDS = [
+    ('bridge_id', 'Q', _bridge_id),
+    ('time_since_topology_change', 'I', _seconds),
+    ('topology_change_count', 'I', str),
+    ('topology_change', '?', _yes_no),
+    ('topology_change_port', '%ds' % IFNAMSIZ, _ifname),
+    ('last_topology_change_port', '%ds' % IFNAMSIZ, _ifname),
+    ('designated_root', 'Q', _bridge_id),
+    ('path_cost', 'I', str),
+    (None, 'H', None),
+    ('max_age', 'I', str),
+    ('forward_delay', 'I', str),
+    ('bridge_max_age', 'I', str),
+    ('bridge_forward_delay', 'I', str),
+    ('tx_hold_count', 'I', str),
+    ('force_protocol_version', 'i', _enum(PROTOCOL_VERSIONS)),
+    ('regional_root', 'Q', _bridge_id),
+    ('internal_path_cost', 'I', str),
+    ('enabled', '?', _yes_no),
+    ('ageing_time', 'I', str),
+    ('max_hops', 'B', str),
+    ('hello_time', 'B', str),
+    # struct padding, then root port name of get_cist_bridge_status_OUT
+    (None, '0Q', None),
+    ('root_port', '%ds' % IFNAMSIZ, _ifname)]
+
+PORT_STATUS_FIELDS = [
+    (None, 'I', None),
+    ('state', 'i', _enum(PORT_STATES)),
+    ('port_id', 'H', _port_id),
+    ('admin_external_cost', 'I', str),
+    ('external_port_cost', 'I', str),
+    ('designated_root', 'Q', _bridge_id),
+    ('dsgn_external_cost', 'I', str),
+    ('designated_bridge', 'Q', _bridge_id),
+    ('designated_port', 'H', _port_id),
+    ('dsgn_regional_root', 'Q', _bridge_id),
+    ('dsgn_internal_cost', 'I', str),
+    ('topology_change_ack', '?', _yes_no),
+    ('role', 'i', _enum(PORT_ROLES)),
+    ('admin_edge_port', '?', _yes_no),
+    ('auto_edge_port', '?', _yes_no),
+    ('oper_edge_port', '?', _yes_no),
+    ('enabled', '?', _yes_no),
+    ('admin_point-to-point', 'i', _enum(ADMIN_P2P)),
+    ('point-to-point', '?', _yes_no),
+    ('restricted_role', '?', _yes_no),
+    ('restricted_tcn', '?', _yes_no),
+    ('disputed', '?', _yes_no),
+    ('bpdu_guard_port', '?', _yes_no),
+    ('bpdu_guard_error', '?', _yes_no),
+    ('network_port', '?', _yes_no),
+    ('ba_inconsistent', '?', _yes_no),
+    (None, 'I', None),
+    ('num_rx_bpdu', 'I', str),
+    ('num_rx_tcn', 'I', str),
+    ('num_tx_bpdu', 'I', str),
+    ('num_tx_tcn', 'I', str),
+    ('num_transition_fwd', 'I', str),
+    ('num_transition_blk', 'I', str),
+    (None, '0Q', None)]
+
+
+def status_struct(fields):
+    """
+    :return: :class:`struct.Struct` for a list of status fields
+    """
+    return struct.Struct('@' + ''.join([x[1] for x in fields]))
+
+
+BRIDGE_STATUS = status_struct(BRIDGE_STATUS_FIELDS)
+PORT_STATUS = status_struct(PORT_STATUS_FIELDS)
+
+
+def decode_status(fields, status, data):
+    """
+    :return: hash of a bridge or port status reply, \
+        keyed like the mstpctl output
+    """
+    _values = iter(status.unpack(data))
+    _result = {}
+    for _key, _fmt, _decode in fields:
+        if _fmt.startswith('0'):
+            continue
+        _value = next(_values)
+        if _key:
+            _result[_key] = _decode(_value)
+    return _result
+
+
+class MstpdException(Exception):
+    """
+    Exception when mstpd does not answer on its control socket, or does
+    not accept the expected layout. Example, mstpd is built with different
+    status structs.
+    """
+    pass
+
+
+def ifindex(ifacename):
+    """
+    :return: ifindex of the named interface. ``None`` if it does not exist
+    """
+    _index = linux_common.read_file_oneline(
+        os.path.join(linux_common.SYS_PATH_ROOT, ifacename, 'ifindex'))
+    if _index and _index.isdigit():
+        return int(_index)
+    return None
+
+
+def is_mstp_bridge(bridgename):
+    """
+    :return: True if the bridge has STP run by mstpd (stp_state 2)
+    """
+    return linux_common.read_file_oneline(os.path.join(
+        linux_common.SYS_PATH_ROOT, bridgename, 'bridge', 'stp_state')) == '2'
+
+
+def mstp_bridges():
+    """
+    :return: list of bridges with STP run by mstpd (stp_state 2)
+    """
+    return sorted([x for x in os.listdir(linux_common.SYS_PATH_ROOT)
+                   if is_mstp_bridge(x)])
+
+
+def port_bridge(portname):
+    """
+    :return: name of the bridge the port is a member of. ``None`` if \
+        it is not a bridge port
+    """
+    return linux_common.read_symlink(os.path.join(
+        linux_common.SYS_PATH_ROOT, portname, 'brport', 'bridge'))
+
+
+def bridge_ports(bridgename):
+    """
+    :return: list of ports of the named bridge
+    """
+    try:
+        return sorted(os.listdir(os.path.join(
+            linux_common.SYS_PATH_ROOT, bridgename, 'brif')))
+    except OSError:
+        return []
+
+
+class MstpdClient(object):
+    """
+    Client for the mstpd control socket. Reads bridge and port status
+    without forking mstpctl. The socket is closed after each query unless
+    ``keep_open`` is set, which resident modes do.
+    """
+    def __init__(self, address=MSTPD_SOCKET, timeout=MSTPD_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.keep_open = False
+        # set when mstpd replies do not match the expected layout
+        self.disabled = False
+        self.sock = None
+
+    def connect(self):
         """
-        :returns: mstpctl showall output(raw)
+        open the control socket. mstpd replies to the address of the sender
+        so the client socket is bound to its own abstract address
         """
-
-        result = ''
+        if self.sock:
+            return
+        _sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
         try:
-            result = linux_common.exec_command('/sbin/mstpctl showall')
-        except (ValueError, IOError):
-            pass
-        return result
+            _sock.settimeout(self.timeout)
+            _sock.bind('\0.netshow_%s_%s' % (os.getpid(), id(self)))
+            _sock.connect(self.address)
+        except socket.error:
+            _sock.close()
+            raise
+        self.sock = _sock
 
-    def set_bridge_name(self, line):
+    def close(self):
         """
-        when parsing mstpctl, set the bridge name. and reset iface and bridge_loc variables.
+        close the control socket
         """
-        if self.newbridgename and self.bridgename != self.newbridgename:
-            self.bridgename = self.newbridgename
-            self.newbridgename = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
 
-        if line.startswith('BRIDGE'):
-            splitline = line.split()
-            self.newbridgename = splitline[1].split(',')[0]
-            self.iface = None
-            self.bridge_loc = None
-            return True
-        return False
+    def request(self, cmd, data, outlen):
+        """
+        send one control message to mstpd
 
-    def run(self):
+        :return: output part of the reply. ``None`` if mstpd \
+            returned an error. mstpd returns the same error for an unknown \
+            bridge or port and for input or output sizes that do not match \
+            its structs
         """
-        execute mstpctl and parse it. return hash of most of the mstpctl output.
-        mstpctl needs to have JSON output. would do away with this class.
+        self.connect()
+        try:
+            self.sock.send(CTL_HEADER.pack(cmd, len(data), outlen,
+                                           LOG_STRING_LEN, 0) + data)
+            _reply = self.sock.recv(CTL_HEADER.size + outlen + LOG_STRING_LEN)
+        except socket.timeout:
+            self.close()
+            self.disabled = True
+            raise MstpdException('no reply from mstpd')
+        except socket.error:
+            self.close()
+            raise
+        if len(_reply) < CTL_HEADER.size:
+            raise MstpdException('short reply from mstpd')
+        (_cmd, _lin, _lout, _llog, _res) = CTL_HEADER.unpack_from(_reply)
+        if _cmd != cmd:
+            raise MstpdException('reply to another command')
+        if _res:
+            return None
+        if _lout != outlen or len(_reply) < CTL_HEADER.size + outlen:
+            self.disabled = True
+            raise MstpdException('unexpected mstpd reply length')
+        return _reply[CTL_HEADER.size:CTL_HEADER.size + outlen]
+
+    def bridge_status(self, bridgename):
         """
-        self.textio = io.StringIO(self.mstpctl_output)
-        for line in self.textio:
-            if len(line.strip()) <= 0:
-                continue
-            if len(line.split(',')) > 2:
-                continue
-            if self.set_bridge_name(line):
-                continue
+        mstpd knows all bridges with stp_state 2. If it returns an error
+        for one of them, it does not accept the status struct sizes, so
+        the client is disabled.
 
-            if self.bridgename:
-                self.set_next_col_at()
-                if self.initialize_bridgehash(line):
-                    continue
-                elif self.initialize_ifacehash(line):
-                    continue
+        :return: hash of CIST status of the named bridge. \
+            ``None`` if mstpd does not run STP on it
+        """
+        _brindex = ifindex(bridgename)
+        if _brindex is None:
+            return None
+        _data = self.request(CMD_GET_CIST_BRIDGE_STATUS,
+                             struct.pack('@i', _brindex), BRIDGE_STATUS.size)
+        if _data is None:
+            if is_mstp_bridge(bridgename):
+                self.disabled = True
+                raise MstpdException(
+                    'mstpd rejected the status request of %s' % (bridgename))
+            return None
+        return decode_status(BRIDGE_STATUS_FIELDS, BRIDGE_STATUS, _data)
 
-                self.create_iface_bridge_hash_to_write_to()
-                self.update_stp_attributes(line)
+    def port_status(self, bridgename, portname):
+        """
+        :return: hash of CIST status of a bridge port. \
+            ``None`` if mstpd does not know it
+        """
+        _brindex = ifindex(bridgename)
+        _portindex = ifindex(portname)
+        if _brindex is None or _portindex is None:
+            return None
+        _data = self.request(CMD_GET_CIST_PORT_STATUS,
+                             struct.pack('@ii', _brindex, _portindex),
+                             PORT_STATUS.size)
+        if _data is None:
+            return None
+        return decode_status(PORT_STATUS_FIELDS, PORT_STATUS, _data)
 
-        return self.bridgehash
 
-    def set_next_col_at(self):
+# shared client. resident modes set ``keep_open``
+CLIENT = MstpdClient()
+
+# generation of memoized STP info, see :func:`new_generation`
+GENERATION = 0
+# (bridge name, port name) -> (generation, cacheinfo result)
+CACHEINFO_MEMO = {}
+
+
+def keep_connection_open(keep_open=True):
+    """
+    keep the mstpd control socket open between queries. Used by
+    modes that stay resident, like ``--watch`` and the exporter
+    """
+    CLIENT.keep_open = keep_open
+    if not keep_open:
+        CLIENT.close()
+
+
+def cacheinfo(bridgename=None, portname=None):
+    """
+    :param bridgename: only query STP info of this bridge
+    :param portname: with ``bridgename``, only query STP info of this port
+    :return: hash of STP info of bridges and ports. Same format for \
+        full and scoped queries
+    """
+    _mstpdcache = MstpdInfo(bridgename, portname)
+    return _mstpdcache.run()
+
+
+def new_generation():
+    """
+    forget STP info memoized by :func:`memoized_cacheinfo`. The next
+    lookup queries mstpd again.
+
+    :return: the new generation number
+    """
+    global GENERATION
+    GENERATION += 1
+    CACHEINFO_MEMO.clear()
+    return GENERATION
+
+
+def memoized_cacheinfo(bridgename=None, portname=None):
+    """
+    same as :func:`cacheinfo`, but mstpd is queried at most once per
+    generation for the same bridge or port. A memoized query of all bridges,
+    or of the whole bridge, also answers a query of one of its ports.
+    Used when there is no feature cache, so all bridge and bridge member
+    objects created in one pass share a single query.
+    """
+    for _key in ((None, None), (bridgename, None), (bridgename, portname)):
+        _memo = CACHEINFO_MEMO.get(_key)
+        if _memo and _memo[0] == GENERATION:
+            return _memo[1]
+    _result = cacheinfo(bridgename, portname)
+    CACHEINFO_MEMO[(bridgename, portname)] = (GENERATION, _result)
+    return _result
+
+
+class MstpdInfo(object):
+
+    def __init__(self, bridgename=None, portname=None):
+        self.bridgename = bridgename
+        self.portname = portname
+        self.bridgehash = {'bridge': {}, 'iface': {}}
+
+    @property
+    def mstpctl_commands(self):
         """
-        :return: column width to use. if parsing bridge entry, use 26 if parsing iface entry use 45.
+        :return: list of mstpctl commands to run. ``showall`` unless \
+            the query is scoped to a bridge or bridge port
+        """
+        if not self.bridgename:
+            return ['/sbin/mstpctl showall']
+        if self.portname:
+            return ['/sbin/mstpctl showportdetail %s %s' % (
+                self.bridgename, self.portname)]
+        return ['/sbin/mstpctl showbridge %s' % (self.bridgename),
+                '/sbin/mstpctl showportdetail %s' % (self.bridgename)]
+
+    @property
+    def mstpctl_output(self):
+        """
+        :returns: mstpctl showall output(raw), or output of the scoped queries
         """
-        if self.is_bridge_info:
-            self.next_col_at = 26
-        else:
-            self.next_col_at = 45
 
-    def initialize_bridgehash(self, line):
+        result = ''
+        for _cmd in self.mstpctl_commands:
+            try:
+                result += linux_common.exec_command(_cmd)
+            except (ValueError, IOError):
+                pass
+            except linux_common.ExecCommandException:
+                # scoped query of a bridge that is not running mstpd
+                if not self.bridgename:
+                    raise
+        return result
+
+    def run(self):
         """
-        initialize bridge and bridge->ifaces section of the bridgehash attribute.
+        :return: hash of STP info read from the mstpd control socket. \
+            If mstpd can not be queried that way, parse mstpctl output
         """
-        split_line = line.split()
-        if split_line[0] == self.bridgename and not split_line[1] == 'id':
-            self.bridgehash['bridge'][self.bridgename] = {}
-            self.bridgehash['bridge'][self.bridgename]['ifaces'] = {}
-            self.is_bridge_info = True
-            self.bridge_loc = None
-            self.iface = None
-            return True
-        return False
+        if not CLIENT.disabled:
+            try:
+                return self.query_mstpd(CLIENT)
+            except (MstpdException, socket.error):
+                self.bridgehash = {'bridge': {}, 'iface': {}}
+            finally:
+                if not CLIENT.keep_open:
+                    CLIENT.close()
+        return self.parse_mstpctl()
 
-    def initialize_ifacehash(self, line):
+    def query_mstpd(self, client):
         """
-        initialize the iface portion of the bridgehash attribute.
+        read bridge and port status from the mstpd control socket
+        into the same hash the mstpctl parser builds
         """
-        if len(line.split()[0].split(':')) == 2:
-            self.iface = line.split()[0].split(':')[1]
-            self.is_bridge_info = False
-            self.bridge_loc = None
-            return True
-        return False
+        # fail early, before reading sysfs, if mstpd is not running
+        client.connect()
+        _bridges = self.bridgehash['bridge']
+        _ifaces = self.bridgehash['iface']
+        if self.bridgename:
+            _bridgenames = [self.bridgename]
+        else:
+            _bridgenames = mstp_bridges()
+        for _bridgename in _bridgenames:
+            if self.portname:
+                _portnames = [self.portname]
+            else:
+                _bridge = client.bridge_status(_bridgename)
+                if _bridge is None:
+                    continue
+                _bridge['ifaces'] = {}
+                _bridges[_bridgename] = _bridge
+                _portnames = bridge_ports(_bridgename)
+            for _portname in _portnames:
+                _port = client.port_status(_bridgename, _portname)
+                if _port is None:
+                    continue
+                _bridges.setdefault(_bridgename, {'ifaces': {}})[
+                    'ifaces'][_portname] = _port
+                _ifaces.setdefault(_portname, {})[_bridgename] = _port
+            if _portnames and not _bridges.get(_bridgename, {}).get('ifaces'):
+                if self.portname:
+                    # unknown port or rejected request. mstpd knows the
+                    # members of bridges it runs STP on, so an error for
+                    # one of them means it does not accept the port
+                    # status struct. the bridge status probe raises if
+                    # it does not accept the bridge status struct
+                    if client.bridge_status(_bridgename) is not None and \
+                            port_bridge(self.portname) == _bridgename:
+                        client.disabled = True
+                        raise MstpdException(
+                            'mstpd rejected the port status request of '
+                            '%s' % (self.portname))
+                else:
+                    # mstpd knows the ports of its bridges, unless they
+                    # were just added. not disabled, so only this query
+                    # falls back to mstpctl
+                    raise MstpdException(
+                        'mstpd rejected the port status requests of %s' % (
+                            _bridgename))
+        return self.bridgehash
 
-    def create_iface_bridge_hash_to_write_to(self):
+    def parse_mstpctl(self):
         """
-        determine whether to print iface info  or bridge info and use the right class/hash for the job.
+        execute mstpctl and parse it. return hash of most of the mstpctl output.
+        mstpctl needs to have JSON output. would do away with this class.
+
+        Single pass over the output. Each line is split once and handled
+        by kind: ``BRIDGE`` line, bridge section header (``br0 CIST info``),
+        port section header (``br0:swp3 CIST info``) or attribute line.
         """
-        if not self.bridge_loc:
-            if self.iface:
-                self.bridgehash['bridge'][self.bridgename]['ifaces'][self.iface] = {}
-                self.bridge_loc = self.bridgehash['bridge'][self.bridgename]['ifaces'][self.iface]
-                if not self.bridgehash.get('iface').get(self.iface):
-                    self.bridgehash['iface'][self.iface] = {}
-                master_iface = self.iface
-                self.bridgehash['iface'][master_iface][self.bridgename] = self.bridge_loc
+        _bridges = self.bridgehash['bridge']
+        _ifaces = self.bridgehash['iface']
+        # scoped queries have no BRIDGE line
+        _bridgename = self.bridgename
+        _newbridgename = None
+        _iface = None
+        # hash attributes are written to
+        _bridge_loc = None
+        _col_at = IFACE_COL_AT
+        for line in io.StringIO(self.mstpctl_output):
+            # skip state machine flag lines and empty lines
+            if line.count(',') > 1:
+                continue
+            _tokens = line.split()
+            if not _tokens:
+                continue
+            # bridge name changes on the line after the BRIDGE line
+            if _newbridgename and _bridgename != _newbridgename:
+                _bridgename = _newbridgename
+                _newbridgename = None
+            if line.startswith('BRIDGE'):
+                _newbridgename = _tokens[1].split(',')[0]
+                _iface = None
+                _bridge_loc = None
+                continue
+            if not _bridgename:
+                continue
+
+            if _tokens[0] == _bridgename and len(_tokens) > 1 and \
+                    _tokens[1] != 'id':
+                _bridges[_bridgename] = {'ifaces': {}}
+                _col_at = BRIDGE_COL_AT
+                _bridge_loc = None
+                _iface = None
+                continue
+            if _tokens[0].count(':') == 1:
+                _iface = _tokens[0].split(':')[1]
+                _col_at = IFACE_COL_AT
+                _bridge_loc = None
+                continue
+
+            if _bridge_loc is None:
+                if _iface:
+                    _bridge_loc = {}
+                    _bridges.setdefault(_bridgename, {'ifaces': {}})[
+                        'ifaces'][_iface] = _bridge_loc
+                    _ifaces.setdefault(_iface, {})[_bridgename] = _bridge_loc
+                else:
+                    _bridge_loc = _bridges.get(_bridgename)
+
+            # col splitting magic. courteous of Jtoppins@cumulus
+            line = line.lower()
+            if len(line) > TWO_COL_LEN:
+                for _col in (line[:_col_at].split(), line[_col_at:].split()):
+                    if _col:
+                        _bridge_loc['_'.join(_col[:-1])] = _col[-1]
             else:
-                self.bridge_loc = self.bridgehash['bridge'].get(self.bridgename)
-
-    def update_stp_attributes(self, line):
-        """
-        decided to stick to scraping mstpctl. so need to do a little magic on the text output
-        """
-        # col splitting magic. courteous of Jtoppins@cumulus
-        if len(line) > 45:
-            col = line[:self.next_col_at].strip().split()
-            subkey = '_'.join(col[0:-1]).lower()
-            value = col[-1]
-            self.bridge_loc[subkey] = value.lower()
-            col = line[self.next_col_at:].strip().split()
-            subkey = '_'.join(col[0:-1]).lower()
-            value = col[-1]
-            self.bridge_loc[subkey] = value.lower()
-        else:
-            line = re.sub(r'\(.*\)', '', line)
-            col = line.strip().split()
-            subkey = '_'.join(col[0:-1]).lower()
-            value = col[-1]
-            self.bridge_loc[subkey] = value.lower()
+                if '(' in line:
+                    _tokens = PARENS_RE.sub('', line).split()
+                else:
+                    _tokens = line.split()
+                _bridge_loc['_'.join(_tokens[:-1])] = _tokens[-1]
+
+        return self.bridgehash
@@ -0,0 +1,188 @@
+"""
+Module for finding the bridge ports that carry each vlan
+"""
+from netshowlib.linux import common as linux_common
+from netshowlib.cumulus import common
+from collections import OrderedDict
+import json
+import os
+
+BRIDGE_VLAN_CMD = '/sbin/bridge -j -c vlan show'
+
+
+def parse_bridge_vlan_json(text):
+    """
+    parse ``bridge -j -c vlan show`` output. Older iproute2 prints a hash of
+    port name -> vlan entries, newer iproute2 a list of hashes with
+    ``ifname`` and ``vlans`` keys. Both are accepted.
+
+    :return: hash of port name -> hash of 'vlans' and 'untagged_vlans' \
+        bitmaps, same as :meth:`common.vlan_aware_vlan_bitmap` returns
+    """
+    _output = json.loads(text)
+    if isinstance(_output, dict):
+        _output = [{'ifname': x, 'vlans': y} for x, y in _output.items()]
+    _bitmaps = {}
+    for _port in _output:
+        _vlans = 0
+        _untagged = 0
+        for _entry in _port.get('vlans', []):
+            _start = int(_entry.get('vlan'))
+            _end = int(_entry.get('vlanEnd', _start))
+            _bits = ((1 << (_end - _start + 1)) - 1) << _start
+            _vlans |= _bits
+            if 'Egress Untagged' in _entry.get('flags', []):
+                _untagged |= _bits
+        _bitmaps[_port.get('ifname')] = {'vlans': _vlans,
+                                         'untagged_vlans': _untagged}
+    return _bitmaps
+
+
+def bridge_vlan_show():
+    """
+    :return: vlan bitmaps of all ports from one ``bridge -j -c vlan show`` \
+        call. ``None`` if iproute2 does not support json vlan output
+    """
+    try:
+        return parse_bridge_vlan_json(
+            linux_common.exec_command(BRIDGE_VLAN_CMD))
+    except (linux_common.ExecCommandException, ValueError):
+        return None
+
+
+def bridge_ports():
+    """
+    :return: names of all interfaces that are bridge ports
+    """
+    return [x for x in os.listdir(linux_common.SYS_PATH_ROOT)
+            if os.path.exists(linux_common.sys_path('brport', x))]
+
+
+def port_vlan_bitmaps(portnames):
+    """
+    vlan bitmaps of vlan aware bridge ports. Uses one ``bridge vlan show``
+    call if possible, otherwise reads the ``brport`` sysfs bitmaps of each
+    port. ``bridge vlan show`` also lists ports of classic bridges with the
+    default vlan, so only ports of vlan aware bridges are kept.
+
+    :param portnames: list of bridge port names
+    :return: hash of port name -> hash of 'vlans' and 'untagged_vlans' bitmaps
+    """
+    _bitmaps = {}
+    _all_bitmaps = bridge_vlan_show()
+    if _all_bitmaps is None:
+        for _name in portnames:
+            _vlans = common.vlan_aware_vlan_bitmap(_name, 'vlans')
+            if _vlans:
+                _bitmaps[_name] = {
+                    'vlans': _vlans,
+                    'untagged_vlans': common.vlan_aware_vlan_bitmap(
+                        _name, 'untagged_vlans')}
+        return _bitmaps
+    # bridge name -> vlan aware or not
+    _vlan_aware = {}
+    for _name in portnames:
+        if not _all_bitmaps.get(_name, {}).get('vlans'):
+            continue
+        _bridgename = linux_common.read_symlink(
+            linux_common.sys_path('brport/bridge', _name))
+        if _bridgename not in _vlan_aware:
+            _vlan_aware[_bridgename] = common.is_vlan_aware_bridge(
+                _bridgename)
+        if _vlan_aware[_bridgename]:
+            _bitmaps[_name] = _all_bitmaps[_name]
+    return _bitmaps
+
+
+def bridge_port_vlans(portnames, bitmaps):
+    """
+    vlans of all bridge ports. Vlan aware ports get theirs from ``bitmaps``.
+    On classic bridges the vlan comes from the subinterface name, so
+    ``swp1.100`` puts vlan 100 on ``swp1`` tagged.
+
+    :param portnames: list of bridge port names
+    :param bitmaps: output of :meth:`port_vlan_bitmaps`
+    :return: list of (port name, 'tagged' or 'untagged', intervals) where \
+        intervals is a sorted list of (start, end) vlan ids
+    """
+    _port_vlans = []
+    for _name in portnames:
+        if _name in bitmaps:
+            _vlans = bitmaps[_name].get('vlans')
+            _untagged = bitmaps[_name].get('untagged_vlans')
+            _port_vlans.append((_name, 'tagged', common.bitmap_to_intervals(
+                _vlans & ~_untagged)))
+            _port_vlans.append((_name, 'untagged',
+                                common.bitmap_to_intervals(_untagged)))
+            continue
+        (_parent, _dot, _vlanid) = _name.rpartition('.')
+        if _parent and _vlanid.isdigit():
+            _port_vlans.append((_parent, 'tagged',
+                                [(int(_vlanid), int(_vlanid))]))
+    return _port_vlans
+
+
+class VlanIndex(object):
+    """
+    Index of vlan id -> tagged and untagged ports. Built with one sweep over
+    the vlan intervals of all ports, so the cost does not grow with the
+    number of vlans times the number of ports. Vlans carried by the same
+    ports share one entry.
+
+    * ``ranges``: sorted list of (start, end, entry)
+    * ``vlans``: hash of vlan id -> entry
+    * ``bitmaps``: vlan bitmaps of vlan aware ports, used by \
+        :meth:`common.vlan_aware_vlan_list`
+    """
+    def __init__(self, port_vlans, bitmaps=None):
+        self.bitmaps = bitmaps or {}
+        self.ranges = []
+        self.vlans = {}
+        # vlan id -> list of (port, kind, 1 to add or -1 to remove)
+        _changes = {}
+        for _port, _kind, _intervals in port_vlans:
+            for _start, _end in _intervals:
+                _changes.setdefault(_start, []).append((_port, _kind, 1))
+                _changes.setdefault(_end + 1, []).append((_port, _kind, -1))
+        # count of (port, kind) intervals covering the current vlan
+        _active = {}
+        _bounds = sorted(_changes.keys())
+        for _idx, _vlanid in enumerate(_bounds[:-1]):
+            for _port, _kind, _change in _changes[_vlanid]:
+                _key = (_port, _kind)
+                _active[_key] = _active.get(_key, 0) + _change
+                if not _active[_key]:
+                    del _active[_key]
+            if not _active:
+                continue
+            _entry = OrderedDict()
+            for _kind in ('tagged', 'untagged'):
+                _entry[_kind] = linux_common.sort_ports(
+                    set([x for x, y in _active.keys() if y == _kind]))
+            _end = _bounds[_idx + 1] - 1
+            # neighbour range with the same ports. happens when a port has
+            # vlans 1-10 and another has 1-5 and 6-10
+            if self.ranges and self.ranges[-1][1] == _vlanid - 1 and \
+                    self.ranges[-1][2] == _entry:
+                _entry = self.ranges[-1][2]
+                self.ranges[-1] = (self.ranges[-1][0], _end, _entry)
+            else:
+                self.ranges.append((_vlanid, _end, _entry))
+            for _vlan in range(_vlanid, _end + 1):
+                self.vlans[_vlan] = _entry
+
+    def get(self, vlanid):
+        """
+        :return: hash of 'tagged' and 'untagged' port lists for the vlan. \
+            ``None`` if no bridge port carries it
+        """
+        return self.vlans.get(int(vlanid))
+
+
+def cacheinfo():
+    """
+    :return: :class:`VlanIndex` of all bridge ports
+    """
+    _portnames = bridge_ports()
+    _bitmaps = port_vlan_bitmaps(_portnames)
+    return VlanIndex(bridge_port_vlans(_portnames, _bitmaps), _bitmaps)
@@ -0,0 +1,65 @@
+# pylint: disable=C0111
+# pylint: disable=F0401
+"""
+Benchmark for parsing ``mstpctl showall`` output.
+Not collected by nose. Run from the top of the source tree::
+
+    python tests/benchmarks/bench_mstpd.py [<bridges>] [<ports per bridge>]
+
+Times :meth:`MstpdInfo.parse_mstpctl` on the bundled fixtures, and on a
+PVST style output built from the classic bridge fixture with many bridges
+and ports.
+"""
+from netshowlib.cumulus import mstpd
+import io
+import mock
+import sys
+import timeit
+
+FIXTURES = ['tests/test_netshowlib/mstpctl_showall',
+            'tests/test_netshowlib/mstpctl_showall_vlanaware']
+
+
+def pvst_output(bridges, ports):
+    """
+    :return: mstpctl showall output with ``bridges`` bridges of ``ports``
+    ports each, made from the first bridge of the classic bridge fixture
+    """
+    _text = io.open(FIXTURES[0]).read()
+    _section = 'BRIDGE:' + _text.split('BRIDGE:')[1]
+    (_bridge_part, _port_part) = _section.split('br0:swp3 CIST info', 1)
+    _port_part = 'br0:swp3 CIST info' + _port_part.split('br0:swp4 CIST info')[0]
+    _output = []
+    for _bridge in range(bridges):
+        _bridgename = 'br%s' % (_bridge)
+        _output.append(_bridge_part.replace('br0', _bridgename))
+        for _port in range(1, ports + 1):
+            _output.append(_port_part.replace('br0', _bridgename).replace(
+                'swp3', 'swp%s.%s' % (_port, _bridge)))
+    return ''.join(_output)
+
+
+def bench(name, text, number):
+    """
+    print the average time to parse ``text``
+    """
+    with mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command') \
+            as mock_exec:
+        mock_exec.return_value = text
+        _seconds = timeit.timeit(lambda: mstpd.MstpdInfo().parse_mstpctl(),
+                                 number=number)
+    print("%-50s %8d lines %10.3f ms" % (
+        name, text.count('\n'), _seconds * 1000 / number))
+
+
+def main():
+    _bridges = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    _ports = int(sys.argv[2]) if len(sys.argv) > 2 else 48
+    for _fixture in FIXTURES:
+        bench(_fixture, io.open(_fixture).read(), 200)
+    bench("pvst %s bridges x %s ports" % (_bridges, _ports),
+          pvst_output(_bridges, _ports), 3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# pylint: disable=C0111
+# pylint: disable=F0401
+"""
+Benchmark for decoding ``brport/vlans`` bitmaps.
+Not collected by nose. Run from the top of the source tree::
+
+    python tests/benchmarks/bench_vlans.py [<ports>]
+
+Times :func:`common.vlan_aware_vlan_list` on the ``all_vlans.txt`` fixture
+and on a trunk with all 4094 vlans, against the old decoder that made one
+string per vlan and grouped them with ``create_range``.
+"""
+from netshowlib.cumulus import common
+from netshowlib.linux import common as linux_common
+import mock
+import sys
+import timeit
+
+FIXTURE = 'tests/test_netshowlib/all_vlans.txt'
+
+
+def old_vlan_list(bitmap_array):
+    """
+    decoder used before vlan lists became ranges
+    """
+    vlan_list = []
+    vlanid = 0
+    for bit32entry in bitmap_array:
+        mod32bit = bin(int(bit32entry.strip(), 16))[2:].zfill(32)
+        for i in reversed(range(32)):
+            if mod32bit[i] == '1':
+                vlan_list.append(str(vlanid))
+            vlanid += 1
+    return linux_common.create_range('', vlan_list)
+
+
+def all_vlans_bitmap():
+    """
+    :return: bitmap lines of a trunk with vlans 1-4094
+    """
+    _bitmap = (1 << 4095) - 2
+    return ['0x%08x\n' % ((_bitmap >> (32 * x)) & 0xffffffff)
+            for x in range(128)]
+
+
+def bench(name, bitmap_array, ports):
+    """
+    print the time to decode ``bitmap_array`` once per port, old and new
+    """
+    _old = timeit.timeit(lambda: old_vlan_list(bitmap_array), number=ports)
+    with mock.patch('netshowlib.linux.common.read_from_sys') as mock_read:
+        mock_read.return_value = bitmap_array
+        _new = timeit.timeit(
+            lambda: common.vlan_aware_vlan_list('swp1', 'vlans'),
+            number=ports)
+    print("%-40s x %d ports  old %8.2f ms  new %8.2f ms" % (
+        name, ports, _old * 1000, _new * 1000))
+
+
+def main():
+    _ports = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    bench(FIXTURE, open(FIXTURE).readlines(), _ports)
+    bench('vlans 1-4094', all_vlans_bitmap(), _ports)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# pylint: disable=C0111
+"""
+Stand-in for the mstpd control socket. Answers bridge and port status
+requests from canned values, so the mstpd client can be tested without
+mstpd running.
+"""
+from netshowlib.cumulus import mstpd
+import os
+import socket
+import struct
+import threading
+
+
+def bridge_id_value(bridge_id):
+    """
+    :return: raw struct value of a bridge id in mstpctl format
+    """
+    (_prio, _sysid, _mac) = bridge_id.split('.')
+    _prio = (int(_prio, 16) << 12) + int(_sysid, 16)
+    _bytes = struct.pack('>H', _prio) + bytes(bytearray(
+        [int(x, 16) for x in _mac.split(':')]))
+    return struct.unpack('@Q', _bytes)[0]
+
+
+def port_id_value(port_id):
+    """
+    :return: raw struct value of a port id in mstpctl format
+    """
+    (_prio, _num) = port_id.split('.')
+    return struct.unpack('@H', struct.pack(
+        '>H', (int(_prio, 16) << 12) + int(_num, 16)))[0]
+
+
+def pack_status(fields, status, values):
+    """
+    :param values: hash of raw struct values. Missing fields are zero
+    :return: status struct as mstpd sends it
+    """
+    _raw = []
+    for _key, _fmt, _decode in fields:
+        if _fmt.startswith('0'):
+            continue
+        if _fmt.endswith('s'):
+            _raw.append(values.get(_key, '').encode('utf-8'))
+        else:
+            _raw.append(values.get(_key, 0))
+    return status.pack(*_raw)
+
+
+class MstpdServer(object):
+    """
+    Checks request sizes and answers errors like mstpd: ``res`` -1, no
+    output, and the reason in the log part of the reply.
+
+    :param bridges: hash of bridge ifindex to raw bridge status values, \
+        or to the status struct as bytes
+    :param ports: hash of (bridge ifindex, port ifindex) to raw \
+        port status values
+    :param bridge_outlen_delta: added to the bridge status struct size, \
+        to fake an mstpd built with a different struct
+    :param port_outlen_delta: same for the port status struct
+    """
+    def __init__(self, bridges=None, ports=None, bridge_outlen_delta=0,
+                 port_outlen_delta=0):
+        self.address = '\0.netshow_test_mstpd_%s' % (os.getpid())
+        self.bridges = bridges or {}
+        self.ports = ports or {}
+        self.bridge_outlen_delta = bridge_outlen_delta
+        self.port_outlen_delta = port_outlen_delta
+        self.requests = []
+        self.running = threading.Event()
+        self.sock = None
+        self.thread = None
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.settimeout(0.05)
+        self.sock.bind(self.address)
+        self.running.set()
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+        self.sock.close()
+
+    @staticmethod
+    def error(cmd, log):
+        _log = log.encode('utf-8')
+        return mstpd.CTL_HEADER.pack(cmd, 0, 0, len(_log), -1) + _log
+
+    def reply(self, message):
+        (_cmd, _lin, _lout, _llog, _res) = mstpd.CTL_HEADER.unpack_from(
+            message)
+        _args = message[mstpd.CTL_HEADER.size:]
+        self.requests.append(_cmd)
+        if _cmd == mstpd.CMD_GET_CIST_BRIDGE_STATUS:
+            (_fields, _status, _lin_ok, _delta) = (
+                mstpd.BRIDGE_STATUS_FIELDS, mstpd.BRIDGE_STATUS, 4,
+                self.bridge_outlen_delta)
+        elif _cmd == mstpd.CMD_GET_CIST_PORT_STATUS:
+            (_fields, _status, _lin_ok, _delta) = (
+                mstpd.PORT_STATUS_FIELDS, mstpd.PORT_STATUS, 8,
+                self.port_outlen_delta)
+        else:
+            return self.error(_cmd, 'CTL: Unknown command %d' % (_cmd))
+        _lout_ok = _status.size + _delta
+        if _lin != _lin_ok or _lout != _lout_ok:
+            return self.error(_cmd, 'Bad sizes: lin %d %d lout %d %d' % (
+                _lin, _lin_ok, _lout, _lout_ok))
+        if _cmd == mstpd.CMD_GET_CIST_BRIDGE_STATUS:
+            _values = self.bridges.get(struct.unpack('@i', _args)[0])
+        else:
+            _values = self.ports.get(struct.unpack('@ii', _args))
+        if _values is None:
+            return self.error(_cmd, "Couldn't find bridge or port")
+        if isinstance(_values, bytes):
+            _data = _values
+        else:
+            _data = pack_status(_fields, _status, _values)
+        return mstpd.CTL_HEADER.pack(_cmd, 0, len(_data), 0, 0) + _data
+
+    def serve(self):
+        while self.running.is_set():
+            try:
+                (_message, _sender) = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            self.sock.sendto(self.reply(_message), _sender)
@@ -0,0 +1,175 @@
+# http://pylint-messages.wikidot.com/all-codes
+# disable unused argument
+# pylint: disable=W0613
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=W0212
+# pylint: disable=F0401
+# pylint: disable=E0611
+
+from asserts import assert_equals
+from netshow.cumulus import exporter
+from netshowlib.cumulus import mstpd
+from collections import OrderedDict
+import io
+import mock
+import socket
+import threading
+
+
+def test_counters_metrics():
+    _output = exporter.counters_metrics({
+        'swp1': {'rx': {'unicast': 100, 'errors': 10, 'buffer_drops': 3,
+                        'octets': 5000},
+                 'tx': {'unicast': 400, 'errors': 20}}})
+    assert_equals(_output[0], '# TYPE netshow_port_packets counter')
+    assert_equals(
+        'netshow_port_packets_total{port="swp1",direction="rx",type="unicast"} 100'
+        in _output, True)
+    assert_equals(
+        'netshow_port_errors_total{port="swp1",direction="tx"} 20'
+        in _output, True)
+    assert_equals(
+        'netshow_port_octets_total{port="swp1",direction="rx"} 5000'
+        in _output, True)
+    assert_equals(
+        'netshow_port_drops_total{port="swp1",direction="rx",type="buffer_drops"} 3'
+        in _output, True)
+
+
+def test_escape_label():
+    assert_equals(exporter.escape_label('a"b\\c\n'), 'a\\"b\\\\c\\n')
+
+
+def test_iface_metrics():
+    _up = mock.MagicMock(linkstate=2, speed='10000')
+    _up.name = 'swp1'
+    _down = mock.MagicMock(linkstate=0)
+    _down.name = 'swp2'
+    _output = exporter.iface_metrics([_up, _down])
+    assert_equals('netshow_port_oper_up{port="swp1"} 1' in _output, True)
+    assert_equals('netshow_port_admin_up{port="swp2"} 0' in _output, True)
+    assert_equals(
+        'netshow_port_speed_bits_per_second{port="swp1"} 10000000000'
+        in _output, True)
+    assert_equals(
+        len([x for x in _output if x.startswith(
+            'netshow_port_speed_bits_per_second{')]), 1)
+
+
+@mock.patch('netshowlib.linux.common.exec_command')
+def test_mstpd_metrics(mock_exec):
+    mock_exec.return_value = io.open(
+        'tests/test_netshowlib/mstpctl_showall').read()
+    _output = exporter.mstpd_metrics(mstpd.cacheinfo())
+    assert_equals(
+        'netshow_stp_topology_changes_total{bridge="br0"} 2' in _output, True)
+    assert_equals(
+        'netshow_stp_port_state{bridge="br0",port="swp4",netshow_stp_port_state="discarding"} 1'
+        in _output, True)
+    assert_equals(
+        'netshow_stp_port_state{bridge="br0",port="swp4",netshow_stp_port_state="forwarding"} 0'
+        in _output, True)
+    assert_equals(
+        'netshow_stp_port_role{bridge="br0",port="swp3",netshow_stp_port_role="root"} 1'
+        in _output, True)
+    assert_equals(
+        'netshow_stp_port_bpdus_total{bridge="br0",port="swp3",direction="rx"} 685772'
+        in _output, True)
+
+
+class TestExporter(object):
+    def setup(self):
+        self.collector = mock.MagicMock(return_value=['swp1_metric 1'])
+        self.broken = mock.MagicMock(side_effect=IOError)
+        # interface went away while it was read
+        self.gone = mock.MagicMock(side_effect=KeyError('swp2'))
+        self.exporter = exporter.Exporter(
+            interval=60,
+            collectors=OrderedDict([('good', self.collector),
+                                    ('broken', self.broken),
+                                    ('gone', self.gone)]))
+
+    def test_collect(self):
+        self.exporter.collect()
+        _output = self.exporter.payload.decode('utf-8').split('\n')
+        assert_equals(_output[0], 'swp1_metric 1')
+        assert_equals('netshow_collector_success{collector="good"} 1'
+                      in _output, True)
+        assert_equals('netshow_collector_success{collector="broken"} 0'
+                      in _output, True)
+        assert_equals('netshow_collector_success{collector="gone"} 0'
+                      in _output, True)
+        assert_equals(len([x for x in _output if x.startswith(
+            'netshow_collector_duration_seconds{')]), 3)
+        assert_equals(_output[-2:], ['# EOF', ''])
+
+    def test_failed_collection_keeps_running(self):
+        self.exporter.interval = 0.01
+        _called = threading.Event()
+
+        def _collect():
+            # still collecting after 2 failures
+            if self.exporter.collect.call_count > 2:
+                _called.set()
+            raise RuntimeError('failed')
+        self.exporter.collect = mock.MagicMock(side_effect=_collect)
+        _thread = threading.Thread(target=self.exporter._run)
+        _thread.start()
+        _called.wait(5)
+        self.exporter.stop()
+        _thread.join()
+        assert_equals(_called.is_set(), True)
+
+    def test_scrape(self):
+        # scrapes return the collected payload, nothing is collected again
+        self.exporter.start()
+        _server = exporter.HTTPServer(('127.0.0.1', 0),
+                                      exporter.MetricsHandler)
+        _server.exporter = self.exporter
+        _thread = threading.Thread(target=_server.handle_request)
+        _thread.start()
+        _sock = socket.create_connection(_server.server_address)
+        _sock.sendall(b'GET /metrics HTTP/1.0\r\n\r\n')
+        _response = b''
+        while True:
+            _data = _sock.recv(4096)
+            if not _data:
+                break
+            _response += _data
+        _sock.close()
+        _thread.join()
+        _server.server_close()
+        self.exporter.stop()
+        assert_equals(_response.startswith(b'HTTP/1.0 200'), True)
+        assert_equals(exporter.CONTENT_TYPE.encode('utf-8') in _response,
+                      True)
+        assert_equals(_response.endswith(self.exporter.payload), True)
+        assert_equals(self.collector.call_count, 1)
+
+
+class TestShowExporter(object):
+    def test_options(self):
+        _show = exporter.ShowExporter({'--port': True, '<port>': '9100',
+                                       '--interval': True, '<seconds>': '5'})
+        assert_equals(_show.check_options(), None)
+        assert_equals(_show.port, 9100)
+        assert_equals(_show.interval, 5.0)
+
+    def test_bad_port(self):
+        _show = exporter.ShowExporter({'--port': True, '<port>': '70000'})
+        assert_equals(_show.run(),
+                      'port must be a number between 1 and 65535')
+
+    def test_bad_interval(self):
+        _show = exporter.ShowExporter({'--interval': True, '<seconds>': 'x'})
+        assert_equals(_show.run(),
+                      'collection interval must be a number of seconds')
+
+    def test_socket(self):
+        _show = exporter.ShowExporter({'--socket': True,
+                                       '<path>': '/run/netshow.sock'})
+        assert_equals(_show.check_options(), None)
+        assert_equals(_show.socket_path, '/run/netshow.sock')
@@ -65,6 +65,8 @@ class TestPrintBond(object):
         assert_equals(_output[1], '(in_clag)')
 
     # GORY mess of a test..but very helpful
+    @mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE',
+                     {'name': 'broadcom'}, clear=True)
     @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
     @mock.patch('netshowlib.linux.common.read_file_oneline')
     @mock.patch('netshowlib.linux.iface.Iface.read_from_sys')
@@ -73,8 +75,7 @@ class TestPrintBond(object):
                              mock_exec):
         values3 = {
             ('/sbin/ethtool -S swp2',): io.open('tests/test_netshowlib/ethtool_swp.txt').read(),
-            ('/sbin/ethtool -S swp3',): io.open('tests/test_netshowlib/ethtool_swp.txt').read(),
-            ('lspci -nn',): io.open('tests/test_netshowlib/lspci_output.txt', 'rb').read()
+            ('/sbin/ethtool -S swp3',): io.open('tests/test_netshowlib/ethtool_swp.txt').read()
         }
 
         mock_exec.side_effect = mod_args_generator(values3)
@@ -110,5 +111,6 @@ class TestPrintBond(object):
             assert_equals(outputtable[2].split(),
                           ['up', 'swp2(P)', '1G(sfp)', '1500',
                            '600', '30', '11'])
+            # asic info is only read once, so swp3 gets it too
             assert_equals(outputtable[3].split(),
-                          ['up', 'swp3(N)', '1G', '1500', '600', '30', '0'])
+                          ['up', 'swp3(N)', '1G(sfp)', '1500', '600', '30', '0'])
@@ -17,6 +17,8 @@
 
 import netshow.cumulus.print_bridge as print_bridge
 import netshowlib.cumulus.bridge as cumulus_bridge
+from netshowlib.cumulus import common
+from netshowlib.cumulus import mstpd
 import mock
 from asserts import assert_equals, mod_args_generator
 import re
@@ -25,6 +27,8 @@ import io
 
 class TestPrintBridge(object):
     def setup(self):
+        mstpd.new_generation()
+        common.new_generation()
         iface = cumulus_bridge.Bridge('br1')
         self.piface = print_bridge.PrintBridge(iface)
 
@@ -33,8 +37,10 @@ class TestPrintBridge(object):
     @mock.patch('netshowlib.linux.common.read_from_sys')
     def test_cli_output(self, mock_read_from_sys, mock_exec,
                         mock_os_listdir):
-        values10 = {('/sbin/mstpctl showall',):
-                    io.open('tests/test_netshowlib/mstpctl_showall').read()}
+        values10 = {('/sbin/mstpctl showbridge br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showbridge_br1').read(),
+            ('/sbin/mstpctl showportdetail br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showportdetail_br1').read()}
         mock_exec.side_effect = mod_args_generator(values10)
         values = {('bridge/vlan_filtering', 'br1'): None,
                   ('bridge/stp_state', 'br1', True): '2',
@@ -167,8 +173,10 @@ class TestPrintBridge(object):
                    ('bridge/vlan_filtering', 'br1'): None}
         mock_read_symlink.side_effect = mod_args_generator(values1)
         mock_read_from_sys.side_effect = mod_args_generator(values2)
-        values3 = {('/sbin/mstpctl showall',): io.open(
-            'tests/test_netshowlib/mstpctl_showall').read(),
+        values3 = {('/sbin/mstpctl showbridge br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showbridge_br1').read(),
+            ('/sbin/mstpctl showportdetail br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showportdetail_br1').read(),
             ('/usr/sbin/lldpctl -f xml',): None}
         mock_exec.side_effect = mod_args_generator(values3)
         self.piface.iface.ip_address.ipv4 = ['10.1.1.1/24']
@@ -184,6 +192,7 @@ class TestPrintBridge(object):
 
         values = {('bridge/vlan_filtering', 'br1'): None}
         mock_read_from_sys.side_effect = mod_args_generator(values)
+        common.new_generation()
         assert_equals(self.piface.is_vlan_aware_bridge(), '')
 
     @mock.patch('netshowlib.linux.common.exec_command')
@@ -194,8 +203,10 @@ class TestPrintBridge(object):
                          mock_symlink,
                          mock_exec):
 
-        values2 = {('/sbin/mstpctl showall',): io.open(
-            'tests/test_netshowlib/mstpctl_showall').read()}
+        values2 = {('/sbin/mstpctl showbridge br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showbridge_br1').read(),
+            ('/sbin/mstpctl showportdetail br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showportdetail_br1').read()}
         mock_exec.side_effect = mod_args_generator(values2)
 
         # vlans are 1-10,20-24,29-30,32,64,4092
@@ -208,6 +219,8 @@ class TestPrintBridge(object):
 
 class TestPrintBridgeMember(object):
     def setup(self):
+        mstpd.new_generation()
+        common.new_generation()
         iface = cumulus_bridge.BridgeMember('swp22')
         self.piface = print_bridge.PrintBridgeMember(iface)
 
@@ -268,8 +281,7 @@ class TestPrintBridgeMember(object):
         mock_exec.return_value = io.open(
             'tests/test_netshowlib/mstpctl_showall').read()
         values = {('bridge/stp_state',): '2',
-                  ('brport/vlans',): None,
-                  ('/sys/class/net/swp3/brport/vlans',): None}
+                  ('/sys/class/net/br0/bridge/vlan_filtering',): None}
         mock_read_oneline.side_effect = mod_args_generator(values)
         values5 = {
             ('/sys/class/net/swp3/brport/bridge',): 'br0',
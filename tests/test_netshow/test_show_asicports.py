@@ -0,0 +1,64 @@
+# http://pylint-messages.wikidot.com/all-codes
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=F0401
+# pylint: disable=E0611
+
+from asserts import assert_equals
+from netshow.cumulus.show_asicports import ShowAsicPorts, ShowAsicResources
+from netshowlib.cumulus import asic
+from collections import OrderedDict
+import mock
+import json
+
+
+class TestShowAsicPorts(object):
+    def setup(self):
+        self.showasicports = ShowAsicPorts({})
+        self.showasicports.asic = mock.MagicMock()
+        self.showasicports.asic.port_map.return_value = [
+            ('swp1', 'xe0.0', '10000'), ('swp2', 'xe1.0', None)]
+
+    def test_cli(self):
+        _output = self.showasicports.run().split('\n')
+        assert_equals(_output[0].split(), ['port', 'asic', 'port', 'initial',
+                                           'speed'])
+        assert_equals(_output[2].split(), ['swp1', 'xe0.0', '10000'])
+        assert_equals(_output[3].split(), ['swp2', 'xe1.0'])
+
+    def test_json(self):
+        self.showasicports.use_json = True
+        _output = json.loads(self.showasicports.run())
+        assert_equals(_output['swp1'], {'asicname': 'xe0.0',
+                                        'initial_speed': '10000'})
+
+    def test_no_asic(self):
+        self.showasicports.asic.port_map.return_value = []
+        assert_equals(self.showasicports.run(), 'asic port names not found')
+
+
+class TestShowAsicResources(object):
+    def setup(self):
+        self.showresources = ShowAsicResources({})
+        self.showresources.asic = mock.MagicMock()
+        self.showresources.asic.resources.return_value = OrderedDict([
+            ('mac_entries', asic.Resource('MAC entries', 16384, 32768, 50.0)),
+            ('ipv4_routes', asic.Resource('IPv4 Routes', 14, None, None))])
+
+    def test_cli(self):
+        _output = self.showresources.run().split('\n')
+        assert_equals(_output[2].split(), ['MAC', 'entries', '16384', '32768',
+                                           '50'])
+        assert_equals(_output[3].split(), ['IPv4', 'Routes', '14'])
+
+    def test_json(self):
+        self.showresources.use_json = True
+        _output = json.loads(self.showresources.run())
+        assert_equals(_output['mac_entries']['maximum'], 32768)
+
+    def test_not_available(self):
+        self.showresources.asic.resources.return_value = OrderedDict()
+        assert_equals(self.showresources.run(),
+                      'asic resource usage not available')
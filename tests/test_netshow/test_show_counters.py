@@ -0,0 +1,218 @@
+# http://pylint-messages.wikidot.com/all-codes
+# pylint: disable=R0913
+# disable unused argument
+# pylint: disable=W0613
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=W0212
+# disable invalid name
+# pylint: disable=C0103
+# pylint: disable=F0401
+# pylint: disable=E0611
+# pylint: disable=W0611
+
+from asserts import assert_equals
+from netshow.cumulus.show_counters import ShowCounters
+from netshowlib.cumulus import counters
+import mock
+import json
+
+
+def mock_piface(name, cache=None):
+    _piface = mock.MagicMock()
+    _piface.name = name
+    _piface.linkstate = 'UP'
+    _piface.speed = '10G'
+    _piface.port_category = 'access/l2'
+    _piface.iface.linkstate = 2
+    _piface.iface.is_phy.return_value = True
+    return _piface
+
+
+class TestShowCounters(object):
+    def setup(self):
+        self.showcounters = ShowCounters({'--rate': True,
+                                          '<interval>': '2'})
+        self.showcounters.cache = mock.MagicMock()
+        self.showcounters.counters = mock.MagicMock()
+        self.showcounters.print_iface = mock.MagicMock()
+        self.showcounters.print_iface.iface.side_effect = mock_piface
+        _first = {'swp1': {'rx': {'unicast': 0, 'multicast': 0,
+                                  'broadcast': 0, 'errors': 0},
+                           'tx': {'unicast': 0, 'multicast': 0,
+                                  'broadcast': 0, 'errors': 0}}}
+        self.showcounters.counters.cacheinfo.return_value = _first
+
+    @mock.patch('netshow.cumulus.show_counters.time.time')
+    @mock.patch('netshow.cumulus.show_counters.time.sleep')
+    @mock.patch('netshow.cumulus.show_counters.nn.portname_list')
+    def test_rate(self, mock_portname_list, mock_sleep, mock_time):
+        mock_portname_list.return_value = ['swp1']
+        # counter reads are 2.5 seconds apart, not the 2 second interval
+        mock_time.side_effect = [100, 102.5, 200, 202.5]
+        self.showcounters.counters.counter_rates.return_value = {
+            'swp1': {'rx': {'unicast': 50.0, 'multicast': 0.0,
+                            'broadcast': 0.0, 'errors': 1.5},
+                     'tx': {'unicast': 25.0, 'multicast': 0.0,
+                            'broadcast': 0.0, 'errors': 0.0}}}
+        _output = self.showcounters.run()
+        mock_sleep.assert_called_with(2.0)
+        # one collection pass per snapshot
+        assert_equals(self.showcounters.counters.cacheinfo.call_count, 2)
+        _first = self.showcounters.counters.cacheinfo.return_value
+        self.showcounters.counters.counter_rates.assert_called_with(
+            _first, _first, 2.5)
+        _outputtable = _output.split('\n')
+        assert_equals(_outputtable[5].split(),
+                      ['UP', 'swp1', '10G', 'access/l2', 'rx',
+                       '50.0', '0.0', '0.0', '1.5'])
+        # json output
+        self.showcounters.use_json = True
+        self.showcounters.ifacelist.clear()
+        _output = json.loads(self.showcounters.run())
+        assert_equals(_output['rates']['swp1']['rx']['errors'], 1.5)
+
+    @mock.patch('netshow.cumulus.show_counters.time.time')
+    def test_refresh(self, mock_time):
+        # watch mode only collects counters again and updates them in place
+        self.showcounters.feature_cache = mock.MagicMock()
+        _display_counters = {'swp1': {'rx': {'unicast': 1}, 'tx': {}}}
+        self.showcounters.feature_cache.counters = _display_counters
+        self.showcounters.snapshot = {'swp1': {'rx': {'unicast': 1}, 'tx': {}}}
+        self.showcounters.snapshot_time = 100
+        mock_time.return_value = 104
+        _new = {'swp1': {'rx': {'unicast': 9}, 'tx': {}}}
+        self.showcounters.counters = mock.MagicMock()
+        self.showcounters.counters.cacheinfo.return_value = _new
+        self.showcounters.ifacelist['swp1'] = mock_piface('swp1')
+        self.showcounters.refresh()
+        assert_equals(_display_counters, _new)
+        self.showcounters.counters.counter_rates.assert_called_with(
+            {'swp1': {'rx': {'unicast': 1}, 'tx': {}}}, _new, 4)
+        assert_equals(self.showcounters.ifacelist['swp1'].iface._speed, None)
+
+    def test_bad_interval(self):
+        self.showcounters.interval = 'abc'
+        assert_equals(self.showcounters.run(),
+                      'rate interval must be a number of seconds')
+
+
+class TestShowCountersSince(object):
+    def setup(self):
+        self.showcounters = ShowCounters({'--since': True,
+                                          '<baseline>': 'before'})
+        self.showcounters.cache = mock.MagicMock()
+        self.showcounters.counter_baseline = mock.MagicMock()
+        self.showcounters.counter_baseline.LAST_BASELINE = 'last'
+        self.feature_cache = self.showcounters.cache.Cache.return_value
+        self.showcounters.counters = mock.MagicMock()
+        self.showcounters.counters.counter_deltas = counters.counter_deltas
+        self.snapshot = {
+            'swp1': {'rx': {'unicast': 10}, 'tx': {'unicast': 20}}}
+        self.showcounters.counters.cacheinfo.return_value = self.snapshot
+
+    def test_baseline_saved(self):
+        self.showcounters.counter_baseline.load.return_value = (None, None)
+        _output = self.showcounters.run()
+        assert_equals(_output, 'counter baseline saved: before')
+        self.showcounters.counter_baseline.save.assert_called_with(
+            'before', self.snapshot)
+
+    @mock.patch('netshow.cumulus.show_counters.nn.portname_list')
+    def test_deltas(self, mock_portname_list):
+        mock_portname_list.return_value = []
+        self.showcounters.counter_baseline.load.return_value = (
+            1000, {'swp1': {'rx': {'unicast': 4}, 'tx': {'unicast': 5}}})
+        self.showcounters.run()
+        # named baselines are not overwritten
+        assert_equals(self.showcounters.counter_baseline.save.call_count, 0)
+        assert_equals(self.feature_cache.counters,
+                      {'swp1': {'rx': {'unicast': 6}, 'tx': {'unicast': 15}}})
+
+    def test_no_baseline_name(self):
+        self.showcounters.baseline_name = None
+        assert_equals(self.showcounters.run(), 'baseline name is required')
+
+
+class TestShowCountersTop(object):
+    def setup(self):
+        self.showcounters = ShowCounters({'--top': True, '<count>': '2',
+                                          '--sort': True, 'ucast': True})
+        self.showcounters.cache = mock.MagicMock()
+        self.showcounters.print_iface = mock.MagicMock()
+        self.showcounters.print_iface.iface.side_effect = mock_piface
+        _counters = {}
+        for i in range(1, 11):
+            _counters['swp%s' % i] = {
+                'rx': {'unicast': i * 10, 'multicast': 0,
+                       'broadcast': 0, 'errors': 10 - i},
+                'tx': {'unicast': i, 'multicast': 0,
+                       'broadcast': 0, 'errors': 0}}
+        self.showcounters.counters = mock.MagicMock()
+        self.showcounters.counters.cacheinfo.return_value = _counters
+
+    def test_top_ucast(self):
+        self.showcounters.run()
+        assert_equals(list(self.showcounters.ifacelist.keys()),
+                      ['swp10', 'swp9'])
+        # print ifaces only created for ports that made the cut
+        assert_equals(self.showcounters.print_iface.iface.call_count, 2)
+
+    def test_top_errors(self):
+        self.showcounters.sort_field = 'errors'
+        self.showcounters.top = '20'
+        self.showcounters.run()
+        # most errors first
+        assert_equals(list(self.showcounters.ifacelist.keys()),
+                      ['swp%s' % x for x in range(1, 11)])
+
+    def test_sort_rate_needs_rate(self):
+        self.showcounters.sort_field = 'rate'
+        assert_equals(self.showcounters.run(),
+                      'sorting by rate requires --rate')
+
+
+class TestShowCountersGroup(object):
+    def setup(self):
+        self.showcounters = ShowCounters({'--group': True, 'drops': True})
+        self.showcounters.cache = mock.MagicMock()
+        self.showcounters.cache.Cache.return_value.feature_list = {
+            'counters': 'cumulus', 'lldp': 'linux'}
+        self.showcounters.counters = mock.MagicMock()
+        self.showcounters.counters.group_counter_names = \
+            counters.group_counter_names
+        self.showcounters.print_iface = mock.MagicMock()
+        self.showcounters.print_iface.iface.side_effect = mock_piface
+
+    @mock.patch('netshow.cumulus.show_counters.nn.portname_list')
+    def test_group(self, mock_portname_list):
+        mock_portname_list.return_value = ['swp1']
+        _piface = mock_piface('swp1')
+        _piface.iface.counters.all = {
+            'rx': {'unicast': 1, 'buffer_drops': 30},
+            'tx': {'unicast': 2, 'queue_drops': 40}}
+        self.showcounters.print_iface.iface.side_effect = None
+        self.showcounters.print_iface.iface.return_value = _piface
+        _output = self.showcounters.run()
+        # counters collected once, including the group statistics
+        _feature_cache = self.showcounters.cache.Cache.return_value
+        _feature_cache.run.assert_called_with({'lldp': 'linux'})
+        self.showcounters.counters.cacheinfo.assert_called_with(
+            groups=['drops'])
+        _outputtable = _output.split('\n')
+        assert_equals(_outputtable[3].split()[3:6],
+                      ['discards', 'l3_drops', 'buffer_drops'])
+        assert_equals(_outputtable[5].split()[4:], ['rx', '30'])
+        assert_equals(_outputtable[6].split(), ['tx', '40'])
+
+    def test_group_required(self):
+        self.showcounters.group = None
+        assert_equals(self.showcounters.run(), 'counter group is required')
+
+    def test_group_with_baseline(self):
+        self.showcounters.use_baseline = True
+        self.showcounters.baseline_name = 'before'
+        assert_equals(self.showcounters.run(),
+                      'counter groups can not be used with a baseline')
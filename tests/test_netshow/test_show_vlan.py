@@ -0,0 +1,55 @@
+# http://pylint-messages.wikidot.com/all-codes
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=F0401
+# pylint: disable=E0611
+
+from asserts import assert_equals
+from netshow.cumulus.show_vlan import ShowVlan
+from netshowlib.cumulus import vlan
+import mock
+import json
+
+
+class TestShowVlan(object):
+    def setup(self):
+        self.showvlan = ShowVlan({})
+        self.showvlan.vlan = mock.MagicMock()
+        self.showvlan.vlan.cacheinfo.return_value = vlan.VlanIndex([
+            ('swp1', 'tagged', [(1, 10)]),
+            ('swp2', 'tagged', [(1, 10)]),
+            ('swp3', 'untagged', [(5, 5)])])
+
+    def test_cli(self):
+        _output = self.showvlan.run().split('\n')
+        assert_equals(_output[0].split(), ['vlan', 'tagged', 'untagged'])
+        assert_equals(_output[2].split(), ['1-4', 'swp1-2'])
+        assert_equals(_output[3].split(), ['5', 'swp1-2', 'swp3'])
+        assert_equals(_output[4].split(), ['6-10', 'swp1-2'])
+
+    def test_single_vlan(self):
+        self.showvlan.vlanid = '5'
+        _output = self.showvlan.run().split('\n')
+        assert_equals(len(_output), 3)
+        assert_equals(_output[2].split(), ['5', 'swp1-2', 'swp3'])
+        self.showvlan.vlanid = '20'
+        assert_equals(self.showvlan.run(), 'vlan 20 is not on any bridge port')
+
+    def test_json(self):
+        self.showvlan.use_json = True
+        _output = json.loads(self.showvlan.run())
+        assert_equals(list(_output.keys()), ['1-4', '5', '6-10'])
+        assert_equals(_output['5'], {'tagged': ['swp1', 'swp2'],
+                                     'untagged': ['swp3']})
+
+    def test_bad_vlanid(self):
+        for _vlanid in ['0', '4095', 'x']:
+            self.showvlan.vlanid = _vlanid
+            assert_equals(self.showvlan.run(),
+                          'vlan id must be a number between 1 and 4094')
+
+    def test_no_vlans(self):
+        self.showvlan.vlan.cacheinfo.return_value = vlan.VlanIndex([])
+        assert_equals(self.showvlan.run(), 'no vlans found on bridge ports')
@@ -15,6 +15,9 @@
 
 from asserts import assert_equals, mod_args_generator
 from netshow.cumulus.show_interfaces import ShowInterfaces
+import netshowlib.cumulus.bridge as cumulus_bridge
+from netshowlib.cumulus import mstpd
+import io
 import mock
 
 class TestCumulusShowInterfaces(object):
@@ -78,3 +81,104 @@ class TestCumulusShowInterfaces(object):
         self.showint.use_json = True
         _output = self.showint.print_single_iface()
         assert_equals(_output, '')
+
+
+class TestShowInterfacesAsicName(object):
+    def setup(self):
+        self.showint = ShowInterfaces({'interface': True, '<iface>': 'xe11'})
+        self.showint.cache = mock.MagicMock()
+        self.showint.cache.Cache.return_value.asic = {
+            'kernelports': {'swp12': {'asicname': 'xe11.0'}},
+            'asicports': {'xe11.0': 'swp12'}}
+        self.showint.print_iface = mock.MagicMock()
+        self.showint.print_iface.iface.side_effect = \
+            lambda name, cache: mock.MagicMock() if name == 'swp12' else None
+
+    def test_asic_name(self):
+        self.showint.single_iface = 'xe11'
+        self.showint.print_single_iface()
+        assert_equals(self.showint.print_iface.iface.call_args_list[-1][0][0],
+                      'swp12')
+
+    def test_unknown_name(self):
+        self.showint.single_iface = 'xe99'
+        assert_equals(self.showint.print_single_iface(),
+                      'interface_does_not_exist')
+
+
+class TestShowInterfacesWatch(object):
+    def setup(self):
+        self.showint = ShowInterfaces({'--watch': True, '<seconds>': '2'})
+        self.showint.counters = mock.MagicMock()
+        self.showint.feature_cache = mock.MagicMock()
+        self.showint.feature_cache.counters = {'swp1': {}, 'swp2': {}}
+
+    def test_refresh_single_iface(self):
+        _printiface = mock.MagicMock()
+        _printiface.iface.name = 'swp1'
+        self.showint._single_printiface = _printiface
+        self.showint.counters.cacheinfo.return_value = {'swp1': {'rx': {}}}
+        self.showint.refresh()
+        # counters of other ports are not read
+        self.showint.counters.cacheinfo.assert_called_with(ifacename='swp1')
+        assert_equals(self.showint.feature_cache.counters,
+                      {'swp1': {'rx': {}}})
+        assert_equals(_printiface.iface._speed, None)
+
+    def test_refresh_all(self):
+        _printiface = mock.MagicMock()
+        self.showint._ifacelist = {'all': {'swp2': _printiface}}
+        self.showint.counters.cacheinfo.return_value = {'swp2': {'rx': {}}}
+        self.showint.refresh()
+        self.showint.counters.cacheinfo.assert_called_with()
+        assert_equals(_printiface.iface._speed, None)
+
+
+class TestShowInterfacesSingleBridgePort(object):
+    def setup(self):
+        mstpd.new_generation()
+        self.showint = ShowInterfaces({'interface': True, '<iface>': 'swp4.1'})
+        self.showint.single_iface = 'swp4.1'
+        self.stp_state = None
+
+        def _piface(name, cache):
+            _member = cumulus_bridge.BridgeMember(name, cache)
+            self.stp_state = cumulus_bridge.MstpctlStpBridgeMember(
+                _member, cache).state
+            _printiface = mock.MagicMock()
+            _printiface.cli_output.return_value = name
+            return _printiface
+        self.showint.print_iface = mock.MagicMock()
+        self.showint.print_iface.iface.side_effect = _piface
+
+    @mock.patch('netshowlib.linux.cache.Cache.run', autospec=True)
+    @mock.patch('netshowlib.linux.bridge.BridgeMember.get_sub_interfaces')
+    @mock.patch('netshowlib.linux.common.exec_command')
+    @mock.patch('netshowlib.linux.common.read_symlink')
+    def test_scoped_stp_query(self, mock_read_symlink, mock_exec,
+                              mock_subints, mock_cache_run):
+        mock_subints.return_value = []
+        mock_read_symlink.return_value = 'br1'
+
+        def _run(cache, features=None):
+            # only STP info is collected. other features are empty
+            for _feature in features or cache.feature_list:
+                setattr(cache, _feature, {})
+                if _feature == 'mstpd':
+                    cache.mstpd = mstpd.cacheinfo()
+        mock_cache_run.side_effect = _run
+        values = {('/sbin/mstpctl showall',): io.open(
+            'tests/test_netshowlib/mstpctl_showall').read(),
+            ('/sbin/mstpctl showbridge br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showbridge_br1').read(),
+            ('/sbin/mstpctl showportdetail br1',): io.open(
+                'tests/test_netshowlib/mstpctl_showportdetail_br1').read()}
+        mock_exec.side_effect = mod_args_generator(values)
+        self.showint.print_single_iface()
+        # the port's bridge is queried, not every bridge
+        assert_equals([x.name for x in self.stp_state.get('designated')],
+                      ['br1'])
+        _cmds = [x[0][0] for x in mock_exec.call_args_list]
+        assert_equals('/sbin/mstpctl showall' in _cmds, False)
+        assert_equals(_cmds, ['/sbin/mstpctl showbridge br1',
+                              '/sbin/mstpctl showportdetail br1'])
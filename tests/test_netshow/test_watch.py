@@ -0,0 +1,51 @@
+# http://pylint-messages.wikidot.com/all-codes
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=W0212
+# disable invalid name
+# pylint: disable=C0103
+# pylint: disable=F0401
+# pylint: disable=E0611
+
+from asserts import assert_equals
+from netshow.cumulus import watch
+import mock
+import io
+
+
+class TestWatch(object):
+    def setup(self):
+        self.output = io.StringIO()
+        self.watch = watch.Watch(2, self.output)
+        self.watch.header = mock.MagicMock(return_value=u'header')
+
+    def test_draw(self):
+        # first draw clears the screen and writes everything
+        self.watch.draw(u'row1\nrow2\nrow3')
+        assert_equals(self.output.getvalue(),
+                      watch.CLEAR_SCREEN + u'header\n\nrow1\nrow2\nrow3')
+        # only changed rows are written
+        self.output.seek(0)
+        self.output.truncate()
+        self.watch.draw(u'row1\nchanged\nrow3')
+        assert_equals(self.output.getvalue(),
+                      u'\033[4;1Hchanged' + watch.CLEAR_TO_EOL)
+        # shorter output blanks out old rows
+        self.output.seek(0)
+        self.output.truncate()
+        self.watch.draw(u'row1\nchanged')
+        assert_equals(self.output.getvalue(),
+                      u'\033[5;1H' + watch.CLEAR_TO_EOL)
+
+    @mock.patch('netshow.cumulus.watch.time.sleep')
+    def test_run(self, mock_sleep):
+        _refresh = mock.MagicMock()
+        _render = mock.MagicMock(return_value=u'output')
+        # stop after the 2nd refresh
+        mock_sleep.side_effect = [None, None, KeyboardInterrupt]
+        assert_equals(self.watch.run(_refresh, _render), '')
+        assert_equals(_refresh.call_count, 2)
+        assert_equals(_render.call_count, 3)
+        mock_sleep.assert_called_with(2)
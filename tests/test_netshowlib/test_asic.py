@@ -9,25 +9,100 @@ from netshowlib.cumulus import asic
 import netshowlib.linux.common as linux_common
 import mock
 import io
+import os
+import shutil
+import tempfile
 from asserts import assert_equals, mock_open_str, mod_args_generator
 
 
 @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-def test_switch_asic(mock_exec_command):
+def test_lspci_asic_name(mock_exec_command):
     mock_exec_command.return_value = open(
         'tests/test_netshowlib/lspci_output.txt', 'rb').read()
-    instance = asic.switching_asic_discovery()
-    assert_equals(isinstance(instance, asic.BroadcomAsic), True)
+    assert_equals(asic.lspci_asic_name(), 'broadcom')
     # no asic found
     mock_exec_command.side_effect = linux_common.ExecCommandException
-    instance = asic.switching_asic_discovery()
-    assert_equals(instance, None)
+    assert_equals(asic.lspci_asic_name(), asic.NO_ASIC)
 
 
-@mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-def test_cacheinfo(mock_exec):
-    mock_exec.return_value = io.open(
-        'tests/test_netshowlib/lspci_output.txt', 'rb').read()
+@mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE', clear=True)
+def test_switch_asic():
+    with mock.patch('netshowlib.cumulus.asic.asic_name') as mock_asic_name:
+        mock_asic_name.return_value = 'broadcom'
+        instance = asic.switching_asic_discovery()
+        assert_equals(isinstance(instance, asic.BroadcomAsic), True)
+        # no asic found
+        mock_asic_name.return_value = asic.NO_ASIC
+        instance = asic.switching_asic_discovery()
+        assert_equals(instance, None)
+
+
+def test_kernel_portname():
+    _cache = {'kernelports': {'swp12': {'asicname': 'xe11.0'},
+                              'swp2': {'asicname': 'xe1.0',
+                                       'initial_speed': '10000'},
+                              'swp10s1': {'asicname': 'xe12.1'}},
+              'asicports': {'xe11.0': 'swp12', 'xe1.0': 'swp2',
+                            'xe12.1': 'swp10s1'}}
+    assert_equals(asic.kernel_portname('xe11', _cache), 'swp12')
+    assert_equals(asic.kernel_portname('XE12.1', _cache), 'swp10s1')
+    assert_equals(asic.kernel_portname('xe99', _cache), None)
+    assert_equals(asic.port_map(_cache),
+                  [('swp2', 'xe1.0', '10000'),
+                   ('swp10s1', 'xe12.1', None),
+                   ('swp12', 'xe11.0', None)])
+
+
+class TestAsicDetection(object):
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pcidir = os.path.join(self.tmpdir, 'devices')
+        # host bridge, then a broadcom ethernet controller
+        for _device, _vendor, _class in (('0000:00:00.0', '0x8086', '0x060000'),
+                                         ('0000:01:00.0', '0x14e4', '0x020000')):
+            os.makedirs(os.path.join(self.pcidir, _device))
+            for _name, _value in (('vendor', _vendor), ('class', _class)):
+                with io.open(os.path.join(self.pcidir, _device, _name), 'w') as _file:
+                    _file.write(u'%s\n' % (_value))
+        self.statefile = os.path.join(self.tmpdir, 'run', 'asic')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pci_asic_name(self):
+        with mock.patch('netshowlib.cumulus.asic.PCI_DEVICES_PATH', self.pcidir):
+            assert_equals(asic.pci_asic_name(), 'broadcom')
+            os.unlink(os.path.join(self.pcidir, '0000:01:00.0', 'vendor'))
+            assert_equals(asic.pci_asic_name(), asic.NO_ASIC)
+
+    @mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE', clear=True)
+    @mock.patch('netshowlib.cumulus.asic.boot_id')
+    @mock.patch('netshowlib.cumulus.asic.pci_asic_name')
+    def test_asic_name(self, mock_pci_asic_name, mock_boot_id):
+        mock_pci_asic_name.return_value = 'broadcom'
+        mock_boot_id.return_value = 'boot1'
+        with mock.patch('netshowlib.cumulus.asic.PCI_DEVICES_PATH', self.pcidir):
+            with mock.patch('netshowlib.cumulus.asic.ASIC_STATE_FILE',
+                            self.statefile):
+                assert_equals(asic.asic_name(), 'broadcom')
+                assert_equals(io.open(self.statefile).read(), 'boot1 broadcom\n')
+                # memoized for the process
+                asic.asic_name()
+                assert_equals(mock_pci_asic_name.call_count, 1)
+                # new process, same boot. state file is used
+                asic.ASIC_CACHE.clear()
+                assert_equals(asic.asic_name(), 'broadcom')
+                assert_equals(mock_pci_asic_name.call_count, 1)
+                # after a reboot the asic is detected again
+                asic.ASIC_CACHE.clear()
+                mock_boot_id.return_value = 'boot2'
+                asic.asic_name()
+                assert_equals(mock_pci_asic_name.call_count, 2)
+
+
+@mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE', {'name': 'broadcom'},
+                 clear=True)
+def test_cacheinfo():
     values = {
         ('/var/lib/cumulus/porttab',): io.open('tests/test_netshowlib/xe_porttab'),
         ('/etc/bcm.d/config.bcm',): io.open('tests/test_netshowlib/config_xe.bcm')
@@ -38,12 +113,14 @@ def test_cacheinfo(mock_exec):
         _output = asic.cacheinfo()
         assert_equals(_output['kernelports']['swp1']['asicname'], 'xe0.0')
         assert_equals(_output['kernelports']['swp1']['initial_speed'], '10000')
+        # only worked out once per process
+        assert_equals(asic.cacheinfo() is _output, True)
+        assert_equals(mock_open.call_count, 2)
 
 
-@mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-def test_rmp_cacheinfo(mock_exec):
-    mock_exec.return_value = io.open(
-        'tests/test_netshowlib/rmp_lspci_output.txt', 'rb').read()
+@mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE', {'name': 'broadcom'},
+                 clear=True)
+def test_rmp_cacheinfo():
     values = {
         ('/var/lib/cumulus/porttab',): io.open('tests/test_netshowlib/rmp_porttab'),
         ('/etc/bcm.d/config.bcm',): io.open('tests/test_netshowlib/rmp_config.bcm')
@@ -56,19 +133,127 @@ def test_rmp_cacheinfo(mock_exec):
         assert_equals(_output['kernelports']['swp41']['initial_speed'], '1000')
 
 
-@mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-def test_cacheinfo_asic_not_detected(mock_exec):
-    mock_exec.side_effect = linux_common.ExecCommandException
+@mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE', {'name': 'none'},
+                 clear=True)
+def test_cacheinfo_asic_not_detected():
     _output = asic.cacheinfo()
     assert_equals(_output,  {'asicports': {}, 'kernelports': {}})
 
 
-@mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-def test_cacheinfo_ports_not_initialized(mock_exec):
-    mock_exec.return_value = open(
-        'tests/test_netshowlib/lspci_output.txt', 'rb').read()
-
+@mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE', {'name': 'broadcom'},
+                 clear=True)
+def test_cacheinfo_ports_not_initialized():
     with mock.patch(mock_open_str()) as mock_open:
         mock_open.side_effect = IOError
         _output = asic.cacheinfo()
         assert_equals(_output,  {'name': 'broadcom', 'asicports': {}, 'kernelports': {}})
+
+
+class TestPortMapCache(object):
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.porttab = os.path.join(self.tmpdir, 'porttab')
+        self.bcmd = os.path.join(self.tmpdir, 'config.bcm')
+        shutil.copy('tests/test_netshowlib/xe_porttab', self.porttab)
+        shutil.copy('tests/test_netshowlib/config_xe.bcm', self.bcmd)
+        self.cachefile = os.path.join(self.tmpdir, 'run', 'portmap.json')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def broadcom_asic(self):
+        _asic = asic.BroadcomAsic()
+        _asic.porttab = self.porttab
+        _asic.bcmd = self.bcmd
+        return _asic
+
+    def test_port_map_cache(self):
+        with mock.patch('netshowlib.cumulus.asic.PORTMAP_CACHE_FILE',
+                        self.cachefile):
+            _output = self.broadcom_asic().parse_speed_and_name_info()
+            assert_equals(_output['kernelports']['swp1']['initial_speed'],
+                          '10000')
+            assert_equals(os.path.exists(self.cachefile), True)
+            # files did not change. nothing is parsed
+            _asic = self.broadcom_asic()
+            with mock.patch.object(_asic, 'parse_ports_file') as mock_parse:
+                assert_equals(_asic.parse_speed_and_name_info(), _output)
+                assert_equals(mock_parse.call_count, 0)
+            # porttab changed. parsed again
+            with io.open(self.porttab, 'a') as _file:
+                _file.write(u'swp99\txe99\t0\t0\n')
+            _output = self.broadcom_asic().parse_speed_and_name_info()
+            assert_equals(_output['asicports']['xe99.0'], 'swp99')
+
+    def test_parse_initial_speed_file(self):
+        with io.open(self.bcmd, 'w') as _file:
+            _file.write(u'serdes_preemphasis_xe0=0x5a0c\n'
+                        u'# port_init_speed_xe1=1000\n'
+                        u'port_init_speed_xe0=10000\n'
+                        u'port_init_speed_xe2.1 = 40000\n')
+        _asic = self.broadcom_asic()
+        _asic.asichash['asicports'] = {'xe0.0': 'swp1', 'xe1.0': 'swp2',
+                                       'xe2.1': 'swp3s1'}
+        _asic.asichash['kernelports'] = {'swp1': {}, 'swp2': {}, 'swp3s1': {}}
+        _asic.parse_initial_speed_file()
+        assert_equals(_asic.asichash['kernelports'],
+                      {'swp1': {'initial_speed': '10000'}, 'swp2': {},
+                       'swp3s1': {'initial_speed': '40000'}})
+        # empty file
+        io.open(self.bcmd, 'w').close()
+        assert_equals(_asic.parse_initial_speed_file(), None)
+
+    def test_source_missing(self):
+        os.unlink(self.bcmd)
+        with mock.patch('netshowlib.cumulus.asic.PORTMAP_CACHE_FILE',
+                        self.cachefile):
+            _output = self.broadcom_asic().parse_speed_and_name_info()
+            assert_equals(_output['kernelports']['swp1']['asicname'], 'xe0.0')
+            # no cache file without both source files
+            assert_equals(os.path.exists(self.cachefile), False)
+
+
+def test_parse_resources():
+    _output = asic.parse_resources(
+        io.open('tests/test_netshowlib/cl_resource_query.txt').read())
+    assert_equals(_output['host_entries'],
+                  asic.Resource('Host entries', 3, 8192, 0.0))
+    assert_equals(_output['mac_entries'].percent, 50.0)
+    assert_equals(_output['ipv4_routes'],
+                  asic.Resource('IPv4 Routes', 14, None, None))
+    assert_equals(list(_output.keys())[-1], 'egress_acl_slices')
+
+
+class TestResources(object):
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachefile = os.path.join(self.tmpdir, 'resources.json')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @mock.patch('netshowlib.cumulus.asic.time.time')
+    @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
+    def test_resources_ttl(self, mock_exec, mock_time):
+        mock_exec.return_value = io.open(
+            'tests/test_netshowlib/cl_resource_query.txt', 'rb').read()
+        mock_time.return_value = 1000.0
+        with mock.patch('netshowlib.cumulus.asic.RESOURCES_CACHE_FILE',
+                        self.cachefile):
+            _output = asic.resources()
+            assert_equals(_output['total_routes'].count, 24)
+            # within the ttl the saved output is used
+            mock_time.return_value = 1005.0
+            assert_equals(asic.resources(), _output)
+            assert_equals(mock_exec.call_count, 1)
+            # ttl expired, query again
+            mock_time.return_value = 1011.0
+            asic.resources()
+            assert_equals(mock_exec.call_count, 2)
+
+    @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
+    def test_resources_not_available(self, mock_exec):
+        mock_exec.side_effect = linux_common.ExecCommandException
+        with mock.patch('netshowlib.cumulus.asic.RESOURCES_CACHE_FILE',
+                        self.cachefile):
+            assert_equals(asic.resources(), {})
@@ -20,9 +20,9 @@ class TestBondMember(object):
         """ setup function """
         self.iface = cumulus_bond.BondMember('swp1')
 
-    @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-    def test_connector_type(self, mock_exec):
-        mock_exec.return_value = io.open('tests/test_netshowlib/lspci_output.txt', 'rb').read()
+    @mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE',
+                     {'name': 'broadcom'}, clear=True)
+    def test_connector_type(self):
         values = {
             ('/var/lib/cumulus/porttab',): io.open('tests/test_netshowlib/xe_porttab'),
             ('/etc/bcm.d/config.bcm',): io.open('tests/test_netshowlib/config_xe.bcm')
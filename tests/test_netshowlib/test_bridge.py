@@ -6,6 +6,8 @@
 # pylint: disable=W0201
 # pylint: disable=F0401
 import netshowlib.cumulus.bridge as cumulus_bridge
+from netshowlib.cumulus import common
+from netshowlib.cumulus import mstpd
 from netshowlib.linux import bridge as linux_bridge
 import mock
 from asserts import assert_equals, mod_args_generator
@@ -14,6 +16,8 @@ import io
 class TestCumulusBridgeMember(object):
 
     def setup(self):
+        mstpd.new_generation()
+        common.new_generation()
         self.iface = cumulus_bridge.BridgeMember('swp1')
 
     @mock.patch('netshowlib.linux.iface.Iface.read_from_sys')
@@ -78,17 +82,52 @@ class TestCumulusBridgeMember(object):
         # vlans are 1-10,20-24,29-30,32,64,4092
         mock_read_from_sys.return_value = open(
             'tests/test_netshowlib/all_vlans.txt').readlines()
-        vlan_list = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10',
-                     '20', '21', '22', '23', '24', '29', '30', '32',
-                     '64', '4092']
+        vlan_list = ['1-10', '20-24', '29-30', '32', '64', '4092']
         assert_equals(self.iface.vlan_aware_vlan_list('vlans'), vlan_list)
         mock_read_from_sys.assert_called_with('brport/vlans',
                                               oneline=False)
 
 
+    @mock.patch('netshowlib.linux.bridge.BridgeMember.get_sub_interfaces')
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    @mock.patch('netshowlib.linux.common.read_symlink')
+    def test_port_state_scoped_query(self, mock_read_symlink, mock_exec,
+                                     mock_subints):
+        # without a feature cache only the port's own bridge is queried
+        mock_subints.return_value = []
+        values = {('/sys/class/net/swp4.1/brport/bridge',): 'br1',
+                  ('/sys/class/net/swp3.1/brport/bridge',): 'br1'}
+        mock_read_symlink.side_effect = mod_args_generator(values)
+        values2 = {('/sbin/mstpctl showbridge br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showbridge_br1').read(),
+            ('/sbin/mstpctl showportdetail br1',): io.open(
+                'tests/test_netshowlib/mstpctl_showportdetail_br1').read()}
+        mock_exec.side_effect = mod_args_generator(values2)
+        _stp = cumulus_bridge.MstpctlStpBridgeMember(
+            cumulus_bridge.BridgeMember('swp4.1'))
+        _output = _stp.state
+        assert_equals([x.name for x in _output.get('designated')], ['br1'])
+        assert_equals([x.name for x in _output.get('forwarding')], ['br1'])
+        assert_equals(_output.get('disabled'), [])
+        # other members of the bridge, and the bridge, share the query
+        _stp = cumulus_bridge.MstpctlStpBridgeMember(
+            cumulus_bridge.BridgeMember('swp3.1'))
+        assert_equals([x.name for x in _stp.state.get('forwarding')], ['br1'])
+        _stp.state
+        assert_equals(cumulus_bridge.MstpctlStpBridge(
+            cumulus_bridge.Bridge('br1')).stpdetails.get('root_port'), 'none')
+        assert_equals(mock_exec.call_count, 2)
+        # until a new generation
+        mstpd.new_generation()
+        _stp.state
+        assert_equals(mock_exec.call_count, 4)
+
+
 class TestCumulusBridge(object):
 
     def setup(self):
+        mstpd.new_generation()
+        common.new_generation()
         self.iface = cumulus_bridge.Bridge('br0')
 
     @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
@@ -104,6 +143,7 @@ class TestCumulusBridge(object):
         values = {('bridge/vlan_filtering', 'br0'): None,
                   ('bridge/stp_state', 'br0', True): '2'}
         mock_read_from_sys.side_effect = mod_args_generator(values)
+        common.new_generation()
         # PSVT RSTP
         assert_equals(self.iface.stp.mode, 2)
 
@@ -114,6 +154,10 @@ class TestCumulusBridge(object):
         assert_equals(self.iface.vlan_filtering, 1)
         values = {('bridge/vlan_filtering', 'br0'): None}
         mock_read_from_sys.side_effect = mod_args_generator(values)
+        # read once per generation, and shared with other objects
+        assert_equals(cumulus_bridge.Bridge('br0').vlan_filtering, 1)
+        assert_equals(mock_read_from_sys.call_count, 1)
+        common.new_generation()
         assert_equals(self.iface.vlan_filtering, 0)
 
     @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
@@ -182,3 +226,26 @@ class TestCumulusBridge(object):
         assert_equals(self.alternate, ['swp4'])
         assert_equals(self.discarding, ['swp4'])
         assert_equals(self.forwarding, ['swp3'])
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    @mock.patch('netshowlib.linux.common.read_from_sys')
+    @mock.patch('netshowlib.linux.bridge.os.listdir')
+    def test_member_state_index(self, mock_listdir,
+                                mock_read_from_sys, mock_exec):
+        mock_listdir.return_value = ['swp3', 'swp4']
+        mock_exec.return_value = io.open('tests/test_netshowlib/mstpctl_showall').read()
+        values = {('bridge/stp_state', 'br0', True): '2'}
+        mock_read_from_sys.side_effect = mod_args_generator(values)
+        _stp = self.iface.stp
+        assert_equals([x.name for x in _stp.members_in_role('root')], ['swp3'])
+        assert_equals([x.name for x in _stp.members_in_state('discarding')],
+                      ['swp4'])
+        assert_equals(_stp.members_in_role('backup'), ())
+        # index is built once per snapshot. members are listed once
+        _stp.member_state
+        self.iface.stp.member_state.get('designated')
+        assert_equals(self.iface.stp is _stp, True)
+        assert_equals(mock_listdir.call_count, 1)
+        # new snapshot after a new generation
+        mstpd.new_generation()
+        assert_equals(self.iface.stp is _stp, False)
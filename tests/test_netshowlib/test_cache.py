@@ -20,3 +20,4 @@ class TestCumulusCache(object):
         assert_equals(self.cache.feature_list.get('counters'), 'cumulus')
         assert_equals(self.cache.feature_list.get('mstpd'), 'cumulus')
         assert_equals(self.cache.feature_list.get('asic'), 'cumulus')
+        assert_equals(self.cache.feature_list.get('vlan'), 'cumulus')
@@ -5,3 +5,112 @@
 # pylint: disable=W0212
 # pylint: disable=W0201
 # pylint: disable=F0401
+from netshowlib.cumulus import common
+from asserts import assert_equals
+import json
+import mock
+
+
+def test_parallel_map():
+    _items = ['swp%s' % x for x in range(20)]
+    _output = common.parallel_map(lambda x: x.upper(), _items, 4)
+    assert_equals(sorted(_output.keys()), sorted(_items))
+    assert_equals(_output.get('swp3'), 'SWP3')
+    # single worker runs in the calling thread
+    _output = common.parallel_map(lambda x: x.upper(), _items, 1)
+    assert_equals(_output.get('swp19'), 'SWP19')
+    assert_equals(common.parallel_map(len, [], 4), {})
+
+
+@mock.patch('netshowlib.linux.common.read_from_sys')
+def test_vlan_aware_vlan_list(mock_read_from_sys):
+    # vlans are 1-10,20-24,29-30,32,64,4092
+    mock_read_from_sys.return_value = open(
+        'tests/test_netshowlib/all_vlans.txt').readlines()
+    _vlans = common.vlan_aware_vlan_list('swp1', 'vlans')
+    mock_read_from_sys.assert_called_with('brport/vlans', 'swp1',
+                                          oneline=False)
+    assert_equals(_vlans, ['1-10', '20-24', '29-30', '32', '64', '4092'])
+    assert_equals(_vlans.intervals, [(1, 10), (20, 24), (29, 30), (32, 32),
+                                     (64, 64), (4092, 4092)])
+    assert_equals(len(list(_vlans.vlans())), 20)
+    # still a list
+    assert_equals(_vlans.count('32'), 1)
+    assert_equals(json.dumps(_vlans), json.dumps(list(_vlans)))
+    assert_equals(5 in _vlans, True)
+    assert_equals('24' in _vlans, True)
+    assert_equals(25 in _vlans, False)
+    assert_equals(0 in _vlans, False)
+    assert_equals(list(_vlans.vlans())[8:12], [9, 10, 20, 21])
+
+
+@mock.patch('netshowlib.linux.common.read_from_sys')
+def test_vlan_aware_vlan_list_empty(mock_read_from_sys):
+    mock_read_from_sys.return_value = None
+    _vlans = common.vlan_aware_vlan_list('swp1', 'untagged_vlans')
+    assert_equals(_vlans, [])
+    assert_equals(list(_vlans.vlans()), [])
+
+
+@mock.patch('netshowlib.linux.common.read_from_sys')
+def test_vlan_aware_vlan_count(mock_read_from_sys):
+    # vlans are 1-10,20-24,29-30,32,64,4092
+    mock_read_from_sys.return_value = open(
+        'tests/test_netshowlib/all_vlans.txt').readlines()
+    assert_equals(common.vlan_aware_vlan_count('swp1', 'vlans'), 20)
+    # stops counting at the limit
+    assert_equals(common.vlan_aware_vlan_count('swp1', 'vlans', limit=2), 2)
+    mock_read_from_sys.return_value = None
+    assert_equals(common.vlan_aware_vlan_count('swp1', 'vlans', limit=2), 0)
+
+
+@mock.patch('netshowlib.linux.common.read_from_sys')
+def test_vlan_aware_vlans_from_cache(mock_read_from_sys):
+    _cache = mock.MagicMock()
+    _cache.vlan.bitmaps = {'swp1': {'vlans': 0b1110110,
+                                    'untagged_vlans': 0b10}}
+    assert_equals(common.vlan_aware_vlan_list('swp1', 'vlans', _cache),
+                  ['1-2', '4-6'])
+    assert_equals(common.vlan_aware_vlan_list(
+        'swp1', 'untagged_vlans', _cache), ['1'])
+    assert_equals(common.vlan_aware_vlan_count(
+        'swp1', 'vlans', cache=_cache), 5)
+    assert_equals(common.vlan_aware_vlan_count(
+        'swp1', 'vlans', limit=2, cache=_cache), 2)
+    assert_equals(mock_read_from_sys.call_count, 0)
+    # port not in the cache is read from sysfs
+    mock_read_from_sys.return_value = None
+    assert_equals(common.vlan_aware_vlan_list('swp2', 'vlans', _cache), [])
+    assert_equals(mock_read_from_sys.call_count, 1)
+
+
+def test_bitmap_to_intervals():
+    assert_equals(common.bitmap_to_intervals(0), [])
+    assert_equals(common.bitmap_to_intervals(0b1011), [(0, 1), (3, 3)])
+    # all vlans, 1-4094
+    assert_equals(common.bitmap_to_intervals((1 << 4095) - 2), [(1, 4094)])
+
+
+@mock.patch('netshowlib.linux.common.read_symlink')
+@mock.patch('netshowlib.linux.common.read_from_sys')
+def test_is_vlan_aware_port(mock_read_from_sys, mock_symlink):
+    common.new_generation()
+    values = {('/sys/class/net/swp1/brport/bridge',): 'bridge',
+              ('/sys/class/net/swp2/brport/bridge',): 'bridge',
+              ('/sys/class/net/swp3/brport/bridge',): 'br0',
+              ('/sys/class/net/eth0/brport/bridge',): None}
+    mock_symlink.side_effect = lambda x: values[(x,)]
+    mock_read_from_sys.side_effect = lambda x, y: {
+        'bridge': '1', 'br0': '0'}[y]
+    assert_equals(common.is_vlan_aware_port('swp1'), True)
+    assert_equals(common.is_vlan_aware_port('swp2'), True)
+    assert_equals(common.is_vlan_aware_port('swp3'), False)
+    assert_equals(common.is_vlan_aware_port('eth0'), False)
+    # one vlan_filtering read per bridge, one symlink read per port
+    assert_equals(common.is_vlan_aware_bridge('bridge'), True)
+    assert_equals(common.is_vlan_aware_port('swp1'), True)
+    assert_equals(mock_read_from_sys.call_count, 2)
+    assert_equals(mock_symlink.call_count, 4)
+    common.new_generation()
+    assert_equals(common.is_vlan_aware_port('swp1'), True)
+    assert_equals(mock_read_from_sys.call_count, 3)
@@ -0,0 +1,54 @@
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=W0212
+# pylint: disable=W0201
+# pylint: disable=F0401
+from netshowlib.cumulus import counter_baseline
+from asserts import assert_equals, assert_raises
+import shutil
+import tempfile
+import os
+
+
+class TestCounterBaseline(object):
+
+    def setup(self):
+        self.orig_dir = counter_baseline.BASELINE_DIR
+        self.tmpdir = tempfile.mkdtemp()
+        counter_baseline.BASELINE_DIR = os.path.join(self.tmpdir, 'netshow')
+
+    def teardown(self):
+        counter_baseline.BASELINE_DIR = self.orig_dir
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_and_load(self):
+        _counters = {
+            'swp1': {'rx': {'unicast': 100, 'broadcast': 200,
+                            'multicast': 300, 'errors': 10},
+                     'tx': {'unicast': 400, 'broadcast': 600,
+                            'multicast': 500, 'errors': 2 ** 63}},
+            # no counters for this port. not saved
+            'swp2': {'rx': {}, 'tx': {}}
+        }
+        assert_equals(counter_baseline.save('last', _counters, 1000.5), True)
+        (_timestamp, _output) = counter_baseline.load('last')
+        assert_equals(_timestamp, 1000.5)
+        assert_equals(_output, {'swp1': _counters['swp1']})
+        # one fixed size record per port
+        assert_equals(os.path.getsize(counter_baseline.baseline_path('last')),
+                      20 + 80)
+
+    def test_load_missing_or_invalid(self):
+        assert_equals(counter_baseline.load('nothere'), (None, None))
+        os.makedirs(counter_baseline.BASELINE_DIR)
+        with open(counter_baseline.baseline_path('empty'), 'wb'):
+            pass
+        assert_equals(counter_baseline.load('empty'), (None, None))
+        with open(counter_baseline.baseline_path('junk'), 'wb') as _file:
+            _file.write(b'x' * 100)
+        assert_equals(counter_baseline.load('junk'), (None, None))
+
+    def test_invalid_name(self):
+        assert_raises(ValueError, counter_baseline.baseline_path, '../etc')
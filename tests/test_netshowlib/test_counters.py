@@ -7,9 +7,10 @@
 # pylint: disable=F0401
 import netshowlib.linux.common as linux_common
 from netshowlib.cumulus import counters
+from netshowlib.cumulus import ethtool
 import mock
 import io
-from asserts import assert_equals
+from asserts import assert_equals, assert_raises, mod_args_generator
 
 
 @mock.patch('netshowlib.linux.common.exec_command')
@@ -48,6 +49,105 @@ def test_cacheinfo(mock_exec_command,
     # single interface
     _output = counters.cacheinfo('swp2')
     assert_equals(sorted(_output.keys()), ['swp2'])
+    # sequential collection gives the same result
+    _output = counters.cacheinfo(workers=1)
+    assert_equals(sorted(_output.keys()), ['swp1', 'swp2s0', 'swp3'])
+    assert_equals(_output['swp3']['rx']['unicast'], 100)
+
+
+def test_stats_to_counters():
+    _output = counters.stats_to_counters({'HwIfInUcastPkts': 100,
+                                          'HwIfOutErrors': 20,
+                                          'rx_queue_0_packets': 5})
+    assert_equals(_output, {'rx': {'unicast': 100}, 'tx': {'errors': 20}})
+
+
+@mock.patch('netshowlib.linux.common.exec_command')
+@mock.patch('netshowlib.cumulus.counters.ethtool.get_stats')
+def test_get_port_counters(mock_get_stats, mock_exec):
+    # ioctl works. ethtool is not run
+    mock_get_stats.return_value = {'HwIfInUcastPkts': 100}
+    _output = counters.get_port_counters('swp1', sock=mock.MagicMock())
+    assert_equals(_output['rx'], {'unicast': 100})
+    assert_equals(mock_exec.call_count, 0)
+    # ioctl not permitted. fall back to ethtool -S
+    mock_get_stats.side_effect = ethtool.EthtoolException
+    mock_exec.return_value = io.open('tests/test_netshowlib/ethtool_swp.txt').read()
+    _output = counters.get_port_counters('swp1', sock=mock.MagicMock())
+    assert_equals(_output['rx']['broadcast'], 200)
+    mock_exec.assert_called_with('/sbin/ethtool -S swp1')
+
+
+def test_get_kernel_counters():
+    values = {('/proc/net/dev',): io.open('tests/test_netshowlib/proc_net_dev.txt')}
+    with mock.patch('io.open') as mock_open:
+        mock_open.side_effect = mod_args_generator(values)
+        _output = counters.get_kernel_counters()
+    assert_equals(sorted(_output.keys()), ['swp1', 'swp2s0'])
+    assert_equals(_output['swp1'], {
+        'rx': {'unicast': 750, 'broadcast': 0,
+               'multicast': 250, 'errors': 3},
+        'tx': {'unicast': 800, 'broadcast': 0,
+               'multicast': 0, 'errors': 4}})
+
+
+@mock.patch('netshowlib.cumulus.counters.get_kernel_counters')
+@mock.patch('netshowlib.cumulus.counters.os.listdir')
+@mock.patch('netshowlib.linux.common.exec_command')
+def test_cacheinfo_kernel_counters(mock_exec, mock_listdir, mock_kernel):
+    # ethtool does not work, like on cumulus VX
+    mock_exec.side_effect = linux_common.ExecCommandException
+    mock_listdir.return_value = ['swp1', 'eth0']
+    _kernel_counters = {'swp1': {'rx': {'unicast': 1}, 'tx': {'unicast': 2}}}
+    mock_kernel.return_value = _kernel_counters
+    assert_equals(counters.cacheinfo(), _kernel_counters)
+    # only the kernel counters are read
+    mock_exec.reset_mock()
+    assert_equals(counters.cacheinfo(kernel_only=True), _kernel_counters)
+    assert_equals(mock_exec.call_count, 0)
+
+
+def test_counter_delta():
+    assert_equals(counters.counter_delta(100, 150), 50)
+    # 32 bit counter wrapped
+    assert_equals(counters.counter_delta(2 ** 32 - 10, 5), 15)
+    # 64 bit counter wrapped
+    assert_equals(counters.counter_delta(2 ** 64 - 10, 5), 15)
+    # counters were cleared
+    assert_equals(counters.counter_delta(1000, 5), 5)
+
+
+def test_counter_deltas():
+    _old = {'swp1': {'rx': {'unicast': 100, 'errors': 1},
+                     'tx': {'unicast': 1000}}}
+    _new = {'swp1': {'rx': {'unicast': 300, 'errors': 4},
+                     'tx': {'unicast': 1001}},
+            'swp2': {'rx': {'unicast': 7}, 'tx': {}}}
+    _output = counters.counter_deltas(_old, _new)
+    assert_equals(_output, {'swp1': {'rx': {'unicast': 200, 'errors': 3},
+                                     'tx': {'unicast': 1}},
+                            'swp2': {'rx': {'unicast': 7}, 'tx': {}}})
+
+
+def test_counter_rates():
+    _old = {'swp1': {'rx': {'unicast': 100, 'errors': 0},
+                     'tx': {'unicast': 1000, 'errors': 2}},
+            'swp2': {'rx': {'unicast': 100}, 'tx': {}}}
+    _new = {'swp1': {'rx': {'unicast': 300, 'errors': 4},
+                     'tx': {'unicast': 1001, 'errors': 2}},
+            'swp3': {'rx': {'unicast': 100}, 'tx': {}}}
+    _output = counters.counter_rates(_old, _new, 2)
+    assert_equals(_output, {'swp1': {'rx': {'unicast': 100.0, 'errors': 2.0},
+                                     'tx': {'unicast': 0.5, 'errors': 0.0}}})
+
+
+@mock.patch('netshowlib.linux.common.exec_command')
+def test_ethtool_output_timeout(mock_exec):
+    mock_exec.return_value = u'output'
+    counters.get_ethtool_output('swp1', timeout=3)
+    mock_exec.assert_called_with('/usr/bin/timeout -s KILL 3 /sbin/ethtool -S swp1')
+    counters.get_ethtool_output('swp1')
+    mock_exec.assert_called_with('/sbin/ethtool -S swp1')
 
 
 class TestCumulusCounters(object):
@@ -83,6 +183,41 @@ class TestCumulusCounters(object):
         assert_equals(_output['rx'].get('unicast'), 100)
         assert_equals(_output['tx'].get('errors'), 20)
 
+    @mock.patch('netshowlib.cumulus.counters.cacheinfo')
+    def test_snapshot_generation(self, mock_cacheinfo):
+        mock_cacheinfo.return_value = {'swp10': {
+            'rx': {'unicast': 1, 'multicast': 0, 'broadcast': 0, 'errors': 0},
+            'tx': {'unicast': 2, 'multicast': 0, 'broadcast': 0, 'errors': 0}}}
+        self.counters.run()
+        self.counters.run()
+        # counters only read once per generation
+        assert_equals(mock_cacheinfo.call_count, 1)
+        assert_equals(self.counters.total_rx, 1)
+        mock_cacheinfo.return_value = {'swp10': {
+            'rx': {'unicast': 5, 'multicast': 0, 'broadcast': 0, 'errors': 0},
+            'tx': {'unicast': 6, 'multicast': 0, 'broadcast': 0, 'errors': 0}}}
+        self.counters.refresh()
+        assert_equals(mock_cacheinfo.call_count, 2)
+        assert_equals(self.counters.total_rx, 5)
+        # new generation, read again on next use
+        counters.new_generation()
+        self.counters.run()
+        assert_equals(mock_cacheinfo.call_count, 3)
+
+    def test_feature_cache_generation(self):
+        _feature_cache = mock.MagicMock()
+        _feature_cache.counters = {'swp10': {'rx': {'unicast': 1},
+                                             'tx': {'unicast': 2}}}
+        _counters = counters.Counters(name='swp10', cache=_feature_cache)
+        _counters.run()
+        _feature_cache.counters['swp10'] = {'rx': {'unicast': 3},
+                                            'tx': {'unicast': 4}}
+        _counters.run()
+        assert_equals(_counters.rx, {'unicast': 1})
+        counters.new_generation()
+        _counters.run()
+        assert_equals(_counters.rx, {'unicast': 3})
+
     def test_total_rx(self):
         # has RX counters by default its 0
         assert_equals(self.counters.total_rx, 0)
@@ -119,3 +254,33 @@ class TestCumulusCounters(object):
 
 
 
+
+
+def test_get_physical_port_counters_groups():
+    mock_file = 'tests/test_netshowlib/ethtool_swp.txt'
+    _output = counters.get_physical_port_counters(io.open(mock_file).read(),
+                                                  ['octets', 'drops'])
+    assert_equals(_output['rx']['octets'], 0)
+    assert_equals(_output['rx']['buffer_drops'], 0)
+    assert_equals(_output['tx']['queue_drops'], 0)
+    assert_equals(_output['rx']['unicast'], 100)
+    # groups not asked for are not kept
+    assert_equals('pause' in _output['rx'], False)
+    assert_equals(sorted(_output['tx'].keys()),
+                  ['broadcast', 'discards', 'errors', 'multicast',
+                   'non_queue_drops', 'octets', 'queue_drops',
+                   'soft_drops', 'tx_fifo_full', 'unicast'])
+
+
+def test_counter_groups():
+    _output = counters.stats_to_counters({'HwIfInPfc3Pkt': 7,
+                                          'HwIfOutPausePkt': 2,
+                                          'HwIfInOctets': 1000},
+                                         ['pfc'])
+    assert_equals(_output, {'rx': {'pfc3': 7}, 'tx': {'pause': 2}})
+    # lookup table is built once per set of groups
+    assert_equals(counters.lookup_table(['pfc']) is
+                  counters.lookup_table(['pfc']), True)
+    assert_equals(counters.group_counter_names('octets'),
+                  (['octets'], ['octets']))
+    assert_raises(ValueError, counters.lookup_table, ['nosuchgroup'])
@@ -0,0 +1,82 @@
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=W0212
+# pylint: disable=W0201
+# pylint: disable=F0401
+from netshowlib.cumulus import ethtool
+import ctypes
+import errno
+import mock
+import struct
+from asserts import assert_equals, assert_raises
+
+
+FAKE_STATS = [('HwIfInUcastPkts', 100), ('HwIfInErrors', 10),
+              ('HwIfOutUcastPkts', 400), ('HwIfOutErrors', 20)]
+FAKE_CMDS = []
+
+
+def fake_kernel(_fd, _request, ifreq):
+    """ fill in the ethtool buffer pointed to by ifreq like the kernel would """
+    (_name, _addr) = struct.unpack('16sP', ifreq[:struct.calcsize('16sP')])
+    _cmd = ctypes.c_uint32.from_address(_addr).value
+    FAKE_CMDS.append(_cmd)
+    if _cmd == ethtool.ETHTOOL_GDRVINFO:
+        ctypes.memmove(_addr + 4, b'fake\0', 5)
+    elif _cmd == ethtool.ETHTOOL_GSSET_INFO:
+        ctypes.memmove(_addr + 16, struct.pack('I', len(FAKE_STATS)), 4)
+    elif _cmd == ethtool.ETHTOOL_GSTRINGS:
+        for _idx, (_statname, _) in enumerate(FAKE_STATS):
+            ctypes.memmove(_addr + 12 + _idx * ethtool.ETH_GSTRING_LEN,
+                           _statname.encode('utf-8'), len(_statname))
+    elif _cmd == ethtool.ETHTOOL_GSTATS:
+        _values = struct.pack('%dQ' % len(FAKE_STATS),
+                              *[x[1] for x in FAKE_STATS])
+        ctypes.memmove(_addr + 4, struct.pack('I', len(FAKE_STATS)), 4)
+        ctypes.memmove(_addr + 8, _values, len(_values))
+    return ifreq
+
+
+@mock.patch('netshowlib.cumulus.ethtool.fcntl.ioctl')
+def test_get_stats(mock_ioctl):
+    ethtool.STRINGS_CACHE.clear()
+    ethtool.PORT_STRINGS_CACHE.clear()
+    mock_ioctl.side_effect = fake_kernel
+    _output = ethtool.get_stats('swp1')
+    assert_equals(_output, dict(FAKE_STATS))
+    assert_equals(ethtool.STRINGS_CACHE.get(('fake', 4)),
+                  [x[0] for x in FAKE_STATS])
+    # string set is not fetched again for the same driver
+    del FAKE_CMDS[:]
+    ethtool.get_stats('swp2')
+    assert_equals(ethtool.ETHTOOL_GSTRINGS in FAKE_CMDS, False)
+    assert_equals(ethtool.ETHTOOL_GSTATS in FAKE_CMDS, True)
+    # repeat read of a port is a single GSTATS ioctl
+    del FAKE_CMDS[:]
+    assert_equals(ethtool.get_stats('swp2'), dict(FAKE_STATS))
+    assert_equals(FAKE_CMDS, [ethtool.ETHTOOL_GSTATS])
+
+
+@mock.patch('netshowlib.cumulus.ethtool.ethtool_socket')
+@mock.patch('netshowlib.cumulus.ethtool.fcntl.ioctl')
+def test_get_stats_closes_socket(mock_ioctl, mock_socket):
+    mock_ioctl.side_effect = fake_kernel
+    ethtool.get_stats('swp1')
+    assert_equals(mock_socket.return_value.close.call_count, 1)
+    # failed ioctl also closes it
+    mock_ioctl.side_effect = IOError(errno.EPERM, 'Operation not permitted')
+    assert_raises(ethtool.EthtoolException, ethtool.get_stats, 'swp1')
+    assert_equals(mock_socket.return_value.close.call_count, 2)
+    # a socket passed in is left open
+    _sock = mock.MagicMock()
+    assert_raises(ethtool.EthtoolException, ethtool.get_stats, 'swp1', _sock)
+    assert_equals(_sock.close.call_count, 0)
+
+
+@mock.patch('netshowlib.cumulus.ethtool.fcntl.ioctl')
+def test_get_stats_not_permitted(mock_ioctl):
+    ethtool.PORT_STRINGS_CACHE.clear()
+    mock_ioctl.side_effect = IOError(errno.EPERM, 'Operation not permitted')
+    assert_raises(ethtool.EthtoolException, ethtool.get_stats, 'swp1')
@@ -6,6 +6,7 @@
 # pylint: disable=W0201
 # pylint: disable=F0401
 import netshowlib.cumulus.iface as cumulus_iface
+from netshowlib.cumulus import common
 import mock
 from asserts import assert_equals, mod_args_generator
 import io
@@ -37,6 +38,7 @@ def test_portname_list(mock_portnamelist):
 class TestCumulusIface(object):
 
     def setup(self):
+        common.new_generation()
         self.iface = cumulus_iface.Iface('swp10')
 
     @mock.patch('netshowlib.linux.common.exec_command')
@@ -66,6 +68,7 @@ class TestCumulusIface(object):
         assert_equals(self.iface.is_svi(), False)
 
         # is subint but bridge parent does have vlan filtering
+        common.new_generation()
         self.iface._name = 'br10.100'
         mock_subint.return_value = True
         values = {('bridge/vlan_filtering', 'br10'): '1'}
@@ -93,9 +96,9 @@ class TestCumulusIface(object):
         self.iface._name = 'swp10.100'
         assert_equals(self.iface.is_phy(), False)
 
-    @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-    def test_initial_speed(self, mock_exec):
-        mock_exec.return_value = io.open('tests/test_netshowlib/lspci_output.txt', 'rb').read()
+    @mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE',
+                     {'name': 'broadcom'}, clear=True)
+    def test_initial_speed(self):
         values = {
             ('/var/lib/cumulus/porttab',): io.open('tests/test_netshowlib/xe_porttab'),
             ('/etc/bcm.d/config.bcm',): io.open('tests/test_netshowlib/config_xe.bcm')
@@ -105,9 +108,9 @@ class TestCumulusIface(object):
             iface = cumulus_iface.Iface('swp1')
             assert_equals(iface.initial_speed(), 10000)
 
-    @mock.patch('netshowlib.cumulus.asic.linux_common.exec_command')
-    def test_connector_type(self, mock_exec):
-        mock_exec.return_value = io.open('tests/test_netshowlib/lspci_output.txt', 'rb').read()
+    @mock.patch.dict('netshowlib.cumulus.asic.ASIC_CACHE',
+                     {'name': 'broadcom'}, clear=True)
+    def test_connector_type(self):
         values = {
             ('/var/lib/cumulus/porttab',): io.open('tests/test_netshowlib/xe_porttab'),
             ('/etc/bcm.d/config.bcm',): io.open('tests/test_netshowlib/config_xe.bcm')
@@ -136,3 +139,21 @@ class TestCumulusIface(object):
         values = {('operstate',): 'up', ('carrier',): '1', ('speed',): '1000'}
         mock_read_from_sys.side_effect = mod_args_generator(values)
         assert_equals(self.iface.speed, '1000')
+
+    @mock.patch('netshowlib.cumulus.common.is_vlan_aware_port')
+    @mock.patch('netshowlib.linux.iface.Iface.is_subint')
+    @mock.patch('netshowlib.linux.common.read_from_sys')
+    def test_bridgemem_port_type_vlan_aware(self, mock_read_from_sys,
+                                            mock_subint, mock_vlan_aware):
+        mock_subint.return_value = True
+        mock_vlan_aware.return_value = True
+        # vlans are 1-10,20-24,29-30,32,64,4092
+        _all_vlans = open('tests/test_netshowlib/all_vlans.txt').readlines()
+        mock_read_from_sys.return_value = _all_vlans
+        assert_equals(self.iface.get_bridgemem_port_type(), 2)
+        assert_equals(self.iface.vlan_count, 20)
+        # access port. only vlan 9
+        mock_read_from_sys.return_value = open(
+            'tests/test_netshowlib/brport_untagged_vlans.txt').readlines()
+        assert_equals(self.iface.get_bridgemem_port_type(), 1)
+        assert_equals(self.iface.native_vlan_count, 1)
@@ -6,10 +6,13 @@
 # pylint: disable=W0201
 # pylint: disable=F0401
 from netshowlib.cumulus import mstpd
+from netshowlib.linux import common as linux_common
 import mock
-from asserts import assert_equals
+from asserts import assert_equals, mod_args_generator
 from nose.tools import set_trace
+import binascii
 import io
+import mstpd_server
 
 @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
 def test_cacheinfo_classic_bridge(mock_exec):
@@ -53,3 +56,265 @@ def test_cacheinfo_no_stp(mock_exec):
     _output = mstpd.cacheinfo()
     assert_equals(_output.get('bridge'), {})
     assert_equals(_output.get('iface'), {})
+
+
+@mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+def test_cacheinfo_attributes(mock_exec):
+    mock_exec.return_value = io.open('tests/test_netshowlib/mstpctl_showall').read()
+    _output = mstpd.cacheinfo()
+    _br0 = _output['bridge']['br0']
+    # short line. text in brackets is dropped
+    assert_equals(_br0.get('root_port'), 'swp3')
+    # bridge lines have 2 attributes, 2nd one at column 26
+    assert_equals(_br0.get('internal_path_cost'), '0')
+    # port lines have 2 attributes, 2nd one at column 45
+    assert_equals(_br0['ifaces']['swp4'].get('role'), 'alternate')
+    assert_equals(_br0['ifaces']['swp4'].get('num_transition_blk'), '4')
+    # state machine flag lines are skipped
+    assert_equals('agree' in _br0['ifaces']['swp4'], False)
+    # bridge and iface views share the same port hash
+    assert_equals(_output['iface']['swp4']['br0'] is _br0['ifaces']['swp4'],
+                  True)
+
+
+@mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+def test_cacheinfo_one_bridge(mock_exec):
+    values = {('/sbin/mstpctl showbridge br1',): io.open(
+        'tests/test_netshowlib/mstpctl_showbridge_br1').read(),
+        ('/sbin/mstpctl showportdetail br1',): io.open(
+            'tests/test_netshowlib/mstpctl_showportdetail_br1').read()}
+    mock_exec.side_effect = mod_args_generator(values)
+    _output = mstpd.cacheinfo('br1')
+    _full = mstpd.MstpdInfo()
+    mock_exec.side_effect = None
+    mock_exec.return_value = io.open(
+        'tests/test_netshowlib/mstpctl_showall').read()
+    _full = _full.run()
+    # same result as showall, for only one bridge
+    assert_equals(list(_output['bridge'].keys()), ['br1'])
+    assert_equals(_output['bridge']['br1'], _full['bridge']['br1'])
+    assert_equals(sorted(_output['iface'].keys()), ['swp3.1', 'swp4.1'])
+
+
+@mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+def test_cacheinfo_one_port(mock_exec):
+    values = {('/sbin/mstpctl showportdetail br1 swp4.1',): io.open(
+        'tests/test_netshowlib/mstpctl_showportdetail_br1_swp4.1').read()}
+    mock_exec.side_effect = mod_args_generator(values)
+    _output = mstpd.cacheinfo('br1', 'swp4.1')
+    assert_equals(_output['iface']['swp4.1']['br1'].get('role'), 'designated')
+    assert_equals(_output['iface']['swp4.1']['br1'] is
+                  _output['bridge']['br1']['ifaces']['swp4.1'], True)
+
+
+@mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+def test_cacheinfo_bridge_not_running_stp(mock_exec):
+    mock_exec.side_effect = linux_common.ExecCommandException
+    _output = mstpd.cacheinfo('br100', 'swp100')
+    assert_equals(_output, {'bridge': {}, 'iface': {}})
+
+
+@mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+def test_memoized_cacheinfo(mock_exec):
+    mock_exec.return_value = io.open(
+        'tests/test_netshowlib/mstpctl_showall').read()
+    mstpd.new_generation()
+    _output = mstpd.memoized_cacheinfo()
+    # query of all bridges answers bridge and port queries
+    assert_equals(mstpd.memoized_cacheinfo('br1') is _output, True)
+    assert_equals(mstpd.memoized_cacheinfo('br1', 'swp3.1') is _output, True)
+    assert_equals(mock_exec.call_count, 1)
+    mstpd.new_generation()
+    assert_equals(mstpd.memoized_cacheinfo() is _output, False)
+    assert_equals(mock_exec.call_count, 2)
+
+
+class TestMstpdClient(object):
+    def setup(self):
+        _root = mstpd_server.bridge_id_value('8.000.00:02:00:00:00:02')
+        _bridge = {
+            'bridge_id': mstpd_server.bridge_id_value('8.000.00:02:00:00:00:0f'),
+            'designated_root': _root,
+            'time_since_topology_change': 1370472,
+            'topology_change_count': 2,
+            'topology_change_port': 'swp3',
+            'force_protocol_version': 2,
+            'enabled': True,
+            'max_hops': 20,
+            'root_port': 'swp3'}
+        _swp3 = {'state': 3, 'role': 1,
+                 'port_id': mstpd_server.port_id_value('8.001'),
+                 'designated_root': _root,
+                 'network_port': True,
+                 'num_rx_bpdu': 685772}
+        _swp4 = {'state': 4, 'role': 3, 'oper_edge_port': True}
+        self.server = mstpd_server.MstpdServer(
+            bridges={8: _bridge}, ports={(8, 3): _swp3, (8, 4): _swp4})
+        self.server.start()
+        self.client = mstpd.MstpdClient(self.server.address)
+        self.ifindex = {('br0',): 8, ('swp3',): 3, ('swp4',): 4,
+                        ('br1',): 9, ('swp100',): 100}
+
+    def teardown(self):
+        self.client.close()
+        self.server.stop()
+
+    def cacheinfo(self, *args):
+        with mock.patch('netshowlib.cumulus.mstpd.CLIENT', self.client), \
+                mock.patch('netshowlib.cumulus.mstpd.mstp_bridges') as \
+                mock_bridges, \
+                mock.patch('netshowlib.cumulus.mstpd.bridge_ports') as \
+                mock_ports, \
+                mock.patch('netshowlib.cumulus.mstpd.ifindex') as mock_index, \
+                mock.patch('netshowlib.cumulus.mstpd.is_mstp_bridge') as \
+                mock_is_mstp, \
+                mock.patch('netshowlib.cumulus.mstpd.port_bridge') as \
+                mock_port_bridge:
+            mock_bridges.return_value = ['br0']
+            # br1 is a bridge with STP not run by mstpd
+            mock_is_mstp.side_effect = lambda x: x == 'br0'
+            mock_ports.return_value = ['swp3', 'swp4']
+            mock_port_bridge.side_effect = lambda x: 'br0' \
+                if x in ('swp3', 'swp4') else None
+            mock_index.side_effect = mod_args_generator(self.ifindex)
+            return mstpd.cacheinfo(*args)
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_cacheinfo(self, mock_exec):
+        _output = self.cacheinfo()
+        assert_equals(mock_exec.call_count, 0)
+        assert_equals(list(_output['bridge'].keys()), ['br0'])
+        _br0 = _output['bridge']['br0']
+        # same values and format as the mstpctl parser
+        assert_equals(_br0.get('bridge_id'), '8.000.00:02:00:00:00:0f')
+        assert_equals(_br0.get('designated_root'), '8.000.00:02:00:00:00:02')
+        assert_equals(_br0.get('root_port'), 'swp3')
+        assert_equals(_br0.get('force_protocol_version'), 'rstp')
+        assert_equals(_br0.get('time_since_topology_change'), '1370472s')
+        assert_equals(_br0.get('topology_change_count'), '2')
+        assert_equals(_br0.get('topology_change'), 'no')
+        assert_equals(_br0.get('max_hops'), '20')
+        _swp3 = _br0['ifaces']['swp3']
+        assert_equals(_swp3.get('role'), 'root')
+        assert_equals(_swp3.get('state'), 'forwarding')
+        assert_equals(_swp3.get('port_id'), '8.001')
+        assert_equals(_swp3.get('network_port'), 'yes')
+        assert_equals(_swp3.get('num_rx_bpdu'), '685772')
+        assert_equals(_output['iface']['swp4']['br0'].get('role'),
+                      'alternate')
+        assert_equals(_output['iface']['swp4']['br0'].get('state'),
+                      'discarding')
+        assert_equals(_output['iface']['swp3']['br0'] is _swp3, True)
+        # connection is closed after the query
+        assert_equals(self.client.sock, None)
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_cacheinfo_one_port(self, mock_exec):
+        _output = self.cacheinfo('br0', 'swp4')
+        assert_equals(list(_output['iface'].keys()), ['swp4'])
+        assert_equals(self.server.requests, [mstpd.CMD_GET_CIST_PORT_STATUS])
+        # unknown port, nothing to fall back to mstpctl for
+        _output = self.cacheinfo('br0', 'swp100')
+        assert_equals(_output, {'bridge': {}, 'iface': {}})
+        assert_equals(mock_exec.call_count, 0)
+        assert_equals(self.client.disabled, False)
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_cacheinfo_bridge_without_mstpd(self, mock_exec):
+        # mstpd does not know br1, and br1 does not have stp_state 2
+        _output = self.cacheinfo('br1')
+        assert_equals(_output, {'bridge': {}, 'iface': {}})
+        assert_equals(mock_exec.call_count, 0)
+        assert_equals(self.client.disabled, False)
+
+    @mock.patch('netshowlib.cumulus.mstpd.ifindex')
+    def test_bridge_status_mstpd_bytes(self, mock_index):
+        # status struct laid out from the mstpd C structs, not from
+        # the field tables of the module
+        _hex = ''.join([x.split('#')[0] for x in io.open(
+            'tests/test_netshowlib/mstpd_cist_bridge_status.hex')
+                        if not x.startswith('#')])
+        self.server.bridges[8] = binascii.unhexlify(''.join(_hex.split()))
+        mock_index.side_effect = mod_args_generator(self.ifindex)
+        _bridge = self.client.bridge_status('br0')
+        assert_equals(_bridge.get('bridge_id'), '8.000.00:02:00:00:00:0f')
+        assert_equals(_bridge.get('designated_root'),
+                      '8.000.00:02:00:00:00:02')
+        assert_equals(_bridge.get('regional_root'), '8.000.00:02:00:00:00:0f')
+        assert_equals(_bridge.get('time_since_topology_change'), '1370472s')
+        assert_equals(_bridge.get('topology_change'), 'no')
+        assert_equals(_bridge.get('topology_change_port'), 'swp3')
+        assert_equals(_bridge.get('last_topology_change_port'), 'swp4')
+        assert_equals(_bridge.get('path_cost'), '2000')
+        assert_equals(_bridge.get('max_age'), '20')
+        assert_equals(_bridge.get('bridge_forward_delay'), '15')
+        assert_equals(_bridge.get('tx_hold_count'), '6')
+        assert_equals(_bridge.get('force_protocol_version'), 'rstp')
+        assert_equals(_bridge.get('enabled'), 'yes')
+        assert_equals(_bridge.get('ageing_time'), '300')
+        assert_equals(_bridge.get('max_hops'), '20')
+        assert_equals(_bridge.get('hello_time'), '2')
+        assert_equals(_bridge.get('root_port'), 'swp3')
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_keep_connection_open(self, mock_exec):
+        self.client.keep_open = True
+        self.cacheinfo('br0')
+        _sock = self.client.sock
+        self.cacheinfo('br0')
+        assert_equals(self.client.sock is _sock, True)
+        assert_equals(_sock is None, False)
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_fallback_mstpd_not_running(self, mock_exec):
+        mock_exec.return_value = io.open(
+            'tests/test_netshowlib/mstpctl_showall').read()
+        self.client.address = '\0.netshow_test_no_mstpd'
+        _output = self.cacheinfo()
+        assert_equals(sorted(_output['bridge'].keys()), ['br0', 'br1', 'br2'])
+        # mstpd may be started later
+        assert_equals(self.client.disabled, False)
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_fallback_unexpected_layout(self, mock_exec):
+        mock_exec.return_value = io.open(
+            'tests/test_netshowlib/mstpctl_showall').read()
+        # mstpd answers requests with other struct sizes with an error
+        self.server.bridge_outlen_delta = 8
+        self.server.port_outlen_delta = 8
+        _output = self.cacheinfo()
+        assert_equals(sorted(_output['bridge'].keys()), ['br0', 'br1', 'br2'])
+        assert_equals(mock_exec.call_count, 1)
+        assert_equals(self.client.disabled, True)
+        # mstpctl is used from now on
+        self.cacheinfo()
+        assert_equals(mock_exec.call_count, 2)
+        assert_equals(self.server.requests, [mstpd.CMD_GET_CIST_BRIDGE_STATUS])
+        # scoped queries too
+        self.cacheinfo('br0', 'swp100')
+        assert_equals(self.server.requests, [mstpd.CMD_GET_CIST_BRIDGE_STATUS])
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_fallback_rejected_port_struct(self, mock_exec):
+        mock_exec.return_value = io.open(
+            'tests/test_netshowlib/mstpctl_showportdetail_br1_swp4.1').read()
+        # mstpd accepts the bridge status struct, not the port status one
+        self.server.port_outlen_delta = 8
+        _output = self.cacheinfo('br0', 'swp4')
+        mock_exec.assert_called_with('/sbin/mstpctl showportdetail br0 swp4')
+        assert_equals(_output['iface'] != {}, True)
+        assert_equals(self.server.requests,
+                      [mstpd.CMD_GET_CIST_PORT_STATUS,
+                       mstpd.CMD_GET_CIST_BRIDGE_STATUS])
+        assert_equals(self.client.disabled, True)
+
+    @mock.patch('netshowlib.cumulus.mstpd.linux_common.exec_command')
+    def test_fallback_rejected_ports(self, mock_exec):
+        mock_exec.return_value = io.open(
+            'tests/test_netshowlib/mstpctl_showall').read()
+        # none of the ports of br0 get an answer
+        self.server.ports = {}
+        _output = self.cacheinfo()
+        assert_equals(sorted(_output['bridge'].keys()), ['br0', 'br1', 'br2'])
+        # only this query falls back
+        assert_equals(self.client.disabled, False)
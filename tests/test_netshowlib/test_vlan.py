@@ -0,0 +1,138 @@
+# disable docstring checking
+# pylint: disable=C0111
+# disable checking no-self-use
+# pylint: disable=R0201
+# pylint: disable=W0212
+# pylint: disable=W0201
+# pylint: disable=F0401
+from netshowlib.cumulus import vlan
+from netshowlib.linux import common as linux_common
+import mock
+from asserts import assert_equals, mod_args_generator
+
+
+@mock.patch('netshowlib.cumulus.vlan.os.path.exists')
+@mock.patch('netshowlib.cumulus.vlan.os.listdir')
+def test_bridge_ports(mock_listdir, mock_exists):
+    mock_listdir.return_value = ['swp1', 'swp2.100', 'eth0', 'bridge']
+    values = {('/sys/class/net/swp1/brport',): True,
+              ('/sys/class/net/swp2.100/brport',): True,
+              ('/sys/class/net/eth0/brport',): False,
+              ('/sys/class/net/bridge/brport',): False}
+    mock_exists.side_effect = mod_args_generator(values)
+    assert_equals(vlan.bridge_ports(), ['swp1', 'swp2.100'])
+
+
+def test_parse_bridge_vlan_json():
+    # iproute2 4.x prints a hash of port name -> vlans
+    _output = vlan.parse_bridge_vlan_json(open(
+        'tests/test_netshowlib/bridge_vlan_show.json').read())
+    assert_equals(_output.get('swp1'), {'vlans': 0b11111111110,
+                                        'untagged_vlans': 0b10})
+    assert_equals(_output.get('swp2'), {'vlans': 1 << 4094,
+                                        'untagged_vlans': 0})
+    # newer iproute2 prints a list of hashes with ifname and vlans keys
+    assert_equals(vlan.parse_bridge_vlan_json(open(
+        'tests/test_netshowlib/bridge_vlan_show_ifname.json').read()), _output)
+
+
+@mock.patch('netshowlib.cumulus.vlan.linux_common.exec_command')
+def test_bridge_vlan_show(mock_exec):
+    mock_exec.return_value = '{"swp1": [{"vlan": 5}]}'
+    assert_equals(vlan.bridge_vlan_show(), {
+        'swp1': {'vlans': 1 << 5, 'untagged_vlans': 0}})
+    mock_exec.assert_called_with('/sbin/bridge -j -c vlan show')
+    # iproute2 without json vlan output
+    mock_exec.return_value = 'port\tvlan ids\nswp1\t 5\n'
+    assert_equals(vlan.bridge_vlan_show(), None)
+    mock_exec.side_effect = linux_common.ExecCommandException
+    assert_equals(vlan.bridge_vlan_show(), None)
+
+
+@mock.patch('netshowlib.cumulus.common.is_vlan_aware_bridge')
+@mock.patch('netshowlib.cumulus.vlan.linux_common.read_symlink')
+@mock.patch('netshowlib.cumulus.vlan.bridge_vlan_show')
+def test_port_vlan_bitmaps(mock_vlan_show, mock_symlink, mock_vlan_aware):
+    mock_vlan_show.return_value = {
+        'swp1': {'vlans': 0b110, 'untagged_vlans': 0b10},
+        'swp2': {'vlans': 0b10, 'untagged_vlans': 0b10},
+        'swp3': {'vlans': 0b100, 'untagged_vlans': 0},
+        'bridge': {'vlans': 0b10, 'untagged_vlans': 0b10}}
+    values = {('/sys/class/net/swp1/brport/bridge',): 'bridge',
+              ('/sys/class/net/swp2/brport/bridge',): 'br0',
+              ('/sys/class/net/swp3/brport/bridge',): 'bridge'}
+    mock_symlink.side_effect = mod_args_generator(values)
+    mock_vlan_aware.side_effect = lambda x: x == 'bridge'
+    # swp2 is on a classic bridge, swp4 has no vlans
+    assert_equals(vlan.port_vlan_bitmaps(['swp1', 'swp2', 'swp3', 'swp4']), {
+        'swp1': {'vlans': 0b110, 'untagged_vlans': 0b10},
+        'swp3': {'vlans': 0b100, 'untagged_vlans': 0}})
+    # vlan awareness is checked once per bridge
+    assert_equals(mock_vlan_aware.call_count, 2)
+
+
+@mock.patch('netshowlib.linux.common.read_from_sys')
+@mock.patch('netshowlib.cumulus.vlan.bridge_vlan_show')
+def test_port_vlan_bitmaps_from_sysfs(mock_vlan_show, mock_read_from_sys):
+    mock_vlan_show.return_value = None
+    values = {('brport/vlans', 'swp1', False): open(
+        'tests/test_netshowlib/all_vlans.txt').readlines(),
+        ('brport/untagged_vlans', 'swp1', False): open(
+            'tests/test_netshowlib/brport_untagged_vlans.txt').readlines(),
+        ('brport/vlans', 'swp2.100', False): None}
+    mock_read_from_sys.side_effect = lambda x, y, oneline: values[
+        (x, y, oneline)]
+    _bitmaps = vlan.port_vlan_bitmaps(['swp1', 'swp2.100'])
+    assert_equals(list(_bitmaps.keys()), ['swp1'])
+    assert_equals(_bitmaps['swp1']['untagged_vlans'], 1 << 9)
+
+
+def test_bridge_port_vlans():
+    _bitmaps = {'swp1': {'vlans': 0b11110, 'untagged_vlans': 0b100}}
+    assert_equals(vlan.bridge_port_vlans(['swp1', 'swp2.100', 'swp3'],
+                                         _bitmaps), [
+        ('swp1', 'tagged', [(1, 1), (3, 4)]),
+        ('swp1', 'untagged', [(2, 2)]),
+        ('swp2', 'tagged', [(100, 100)])])
+
+
+@mock.patch('netshowlib.cumulus.vlan.port_vlan_bitmaps')
+@mock.patch('netshowlib.cumulus.vlan.bridge_ports')
+def test_cacheinfo(mock_bridge_ports, mock_bitmaps):
+    mock_bridge_ports.return_value = ['swp1', 'swp2.100']
+    mock_bitmaps.return_value = {'swp1': {'vlans': 0b110,
+                                          'untagged_vlans': 0b10}}
+    _index = vlan.cacheinfo()
+    assert_equals(_index.bitmaps, mock_bitmaps.return_value)
+    assert_equals(_index.get(1), {'tagged': [], 'untagged': ['swp1']})
+    assert_equals(_index.get(100), {'tagged': ['swp2'], 'untagged': []})
+
+
+class TestVlanIndex(object):
+    def setup(self):
+        self.index = vlan.VlanIndex([
+            ('swp1', 'tagged', [(1, 10), (20, 20)]),
+            ('swp10', 'tagged', [(1, 5), (6, 10)]),
+            ('swp2', 'untagged', [(5, 5)]),
+            ('swp3', 'tagged', [(4094, 4094)])])
+
+    def test_get(self):
+        assert_equals(self.index.get(1), {'tagged': ['swp1', 'swp10'],
+                                          'untagged': []})
+        assert_equals(self.index.get('5'), {'tagged': ['swp1', 'swp10'],
+                                            'untagged': ['swp2']})
+        assert_equals(self.index.get(11), None)
+        assert_equals(self.index.get(4094), {'tagged': ['swp3'],
+                                             'untagged': []})
+
+    def test_ranges(self):
+        assert_equals([(x, y) for x, y, z in self.index.ranges],
+                      [(1, 4), (5, 5), (6, 10), (20, 20), (4094, 4094)])
+        # vlans with the same ports share one entry
+        assert_equals(self.index.get(1) is self.index.get(4), True)
+        assert_equals(self.index.get(6) is self.index.get(10), True)
+
+    def test_empty(self):
+        _index = vlan.VlanIndex([])
+        assert_equals(_index.ranges, [])
+        assert_equals(_index.get(1), None)